@@ -0,0 +1,176 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import stat
+
+"""
+ArtifactCache is a content-addressed cache of generated topology and flow files.
+
+The key of an entry is the SHA-256 of all inputs of a generation run
+(topology type, builder parameters, link/flow attributes, strategy classes, generator version)
+together with a digest of the generator sources, so any code change invalidates the cache.
+Every entry is a directory named by its key, holding one file per artifact.
+
+Artifacts are hardlinked into and out of the cache when possible, and copied otherwise.
+Since a hardlinked output shares its data with the cache entry,
+callers must remove an output file before regenerating it instead of truncating it (see replace_outputs).
+The artifacts are made read-only, and the size and modification time of every artifact are recorded
+in the STAT_FILE of its entry, so an entry whose files were still changed in place through an output,
+e.g. by root or after a chmod, is dropped on the next hit instead of being served.
+
+Entries are evicted least recently used first once the cache grows beyond max_bytes.
+A hit refreshes the modification time of the entry.
+"""
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "network-builder")
+DEFAULT_CACHE_SIZE = 10 << 30
+STAT_FILE = "stat.json"
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def source_digest(directory=os.path.dirname(os.path.abspath(__file__))):
+    digest = hashlib.sha256()
+    for file_name in sorted(glob.glob(os.path.join(directory, "*.py"))):
+        digest.update(os.path.basename(file_name).encode())
+        with open(file_name, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def file_stat(file_name):
+    info = os.stat(file_name)
+    return [info.st_size, info.st_mtime_ns]
+
+
+"""
+This function returns whether an output can be removed and replaced by an artifact:
+a missing file, a regular file or a link to one.
+Other outputs, e.g. /dev/null or /dev/stdout, are written in place and never removed,
+so runs that write to them are not cached.
+"""
+
+
+def replaceable(file_name):
+    try:
+        return stat.S_ISREG(os.stat(file_name).st_mode)
+    except FileNotFoundError:
+        return True
+
+
+def replace_outputs(*file_names):
+    for file_name in file_names:
+        if os.path.lexists(file_name) and replaceable(file_name):
+            os.remove(file_name)
+
+
+class ArtifactCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, **inputs):
+        inputs["source"] = source_digest()
+        text = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.directory, key)
+
+    """
+    This method links the artifacts of the entry to the target files, e.g. {"topology": "topology.txt"}.
+    It returns False if the entry is missing, or a target is not a regular file.
+    """
+
+    def fetch(self, key, targets):
+        entry = self.entry(key)
+        if not all(os.path.exists(os.path.join(entry, name)) for name in targets):
+            return False
+        if not all(replaceable(target) for target in targets.values()):
+            return False
+
+        if not self.intact(entry, targets):
+            shutil.rmtree(entry, ignore_errors=True)
+            return False
+
+        for name, target in targets.items():
+            replace_outputs(target)
+            link_or_copy(os.path.join(entry, name), target)
+
+        os.utime(entry)
+        return True
+
+    """
+    This method stores the source files as the artifacts of the entry, e.g. {"topology": "topology.txt"}.
+    The entry is built in a temporary directory and renamed, so readers never see a partial entry.
+    Nothing is stored if a source is not a regular file.
+    """
+
+    def store(self, key, sources):
+        entry = self.entry(key)
+        if not all(os.path.isfile(source) for source in sources.values()):
+            return
+        if os.path.exists(entry):
+            os.utime(entry)
+            return
+
+        staging = f"{entry}.tmp-{os.getpid()}"
+        os.makedirs(staging, exist_ok=True)
+        stats = {}
+        for name, source in sources.items():
+            artifact = os.path.join(staging, name)
+            link_or_copy(source, artifact)
+            os.chmod(artifact, READ_ONLY)
+            stats[name] = file_stat(artifact)
+        with open(os.path.join(staging, STAT_FILE), "w") as file:
+            json.dump(stats, file)
+
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self.evict()
+
+    """
+    This method checks that the artifacts of an entry still have the size and modification time they were stored with.
+    """
+
+    def intact(self, entry, names):
+        try:
+            with open(os.path.join(entry, STAT_FILE)) as file:
+                stats = json.load(file)
+            return all(
+                file_stat(os.path.join(entry, name)) == stats[name] for name in names
+            )
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def entry_size(self, entry):
+        return sum(
+            os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry)
+        )
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if os.path.isdir(entry) and ".tmp-" not in name:
+                entries.append((os.path.getmtime(entry), self.entry_size(entry), entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
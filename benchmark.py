@@ -0,0 +1,363 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import logger
+import link_strategy
+import flow_strategy
+import output_strategy
+import registry
+import topogen
+
+"""
+This script benchmarks the builders, connectors and writers across scale.
+
+For every builder configuration, it runs the build phases one by one
+and reports the wall time per phase, links/sec, flows/sec, output bytes and peak RSS.
+Every configuration runs in a fresh worker process, so the peak RSS belongs to that configuration.
+The output is written to a counting sink unless --output_dir is given.
+
+Builders are created through the registry, so registered builders can be benchmarked with --config,
+and the link, host and flow counts and the connector chain come from the builder spec.
+
+For every configuration, it also runs the levels of the connector chain standalone
+and compares the loop path (connect), the vectorized path (connect_vectorized)
+and the pure index computation (connect_array).
+
+The results are printed as a table and can be written as JSON with --json.
+"""
+
+LINK_KWARGS = {
+    "bandwidth": "100Gbps",
+    "delay": "0.001ms",
+    "error_rate": "0",
+}
+
+FLOW_KWARGS = {
+    "payload": 1024,
+    "initial_time": 0,
+    "pfc_priority": 1,
+    "port": 100,
+}
+
+PHASES = ["build_nodes", "build_switches", "build_links", "build_flow"]
+
+SPINE_LEAF_CONFIGS = ["2,4,8", "4,16,16", "8,32,32", "16,64,32"]
+FAT_TREE_K = [4, 8, 16, 32, 64]
+FAT_TREE_HOST_PER_EDGE = 3
+BCUBE_N = [4, 8, 16, 32]
+MAX_FLOWS = 5_000_000
+
+
+"""
+CountingOutputStrategy discards the data and only counts the written bytes and lines.
+"""
+
+
+class CountingOutputStrategy(output_strategy.OutputStrategy):
+    def __init__(self):
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, data: str):
+        self.bytes += len(data)
+        self.lines += data.count("\n")
+
+
+"""
+This function creates the registered builder of a configuration.
+The params are topogen options, e.g. host, which are mapped to the constructor parameters
+through the PARAMETERS of the builder, and other constructor parameters, e.g. of a plugin builder.
+"""
+
+
+def make_builder(topology, params, link, flow, workers):
+    cls = registry.load(registry.BUILDER, topology)
+    keywords = {option: keyword for keyword, option in cls.PARAMETERS.items()}
+    kwargs = {keywords.get(name, name): value for name, value in params.items()}
+    return cls(link, flow, **kwargs, workers=workers)
+
+
+"""
+This function returns the standalone connector runs of a builder:
+(connector class, higher level nodes, lower level nodes, group).
+They mirror the connector chain of its spec.
+"""
+
+
+def connector_levels(builder):
+    levels = builder.levels()
+    return [
+        (cls, higher, lower, group)
+        for (cls, group), (_, higher), (_, lower) in zip(
+            builder.chain(), levels, levels[1:]
+        )
+    ]
+
+
+def rate(count, seconds):
+    return count / seconds if seconds else None
+
+
+def run_builder(task):
+    topology, params, workers, max_flows, output_dir = task
+    logger.set_log_mode(logger.QUIET)
+
+    if output_dir:
+        name = "_".join(f"{key}{value}" for key, value in params.items())
+        topo_file = os.path.join(output_dir, f"{topology}_{name}_topology.txt")
+        flow_file = os.path.join(output_dir, f"{topology}_{name}_flow.txt")
+        topo_output = output_strategy.FileOutputStrategy(topo_file)
+        flow_output = output_strategy.FileOutputStrategy(flow_file)
+    else:
+        topo_output = CountingOutputStrategy()
+        flow_output = CountingOutputStrategy()
+
+    link = link_strategy.DefaultLinkStrategy(topo_output)
+    flow = flow_strategy.DefaultFlowStrategy(flow_output)
+    builder = make_builder(topology, params, link, flow, workers)
+
+    plan = builder.plan()
+    flows = plan.num_flows
+    phases = PHASES if flows <= max_flows else PHASES[:-1]
+
+    times = {}
+    for phase in phases:
+        start = time.perf_counter()
+        getattr(builder, phase)(**LINK_KWARGS, **FLOW_KWARGS)
+        times[phase] = time.perf_counter() - start
+
+    topo_output.close()
+    flow_output.close()
+
+    if output_dir:
+        topo_bytes = os.path.getsize(topo_file)
+        flow_bytes = os.path.getsize(flow_file)
+    else:
+        topo_bytes = topo_output.bytes
+        flow_bytes = flow_output.bytes
+
+    links = plan.num_links
+    has_flows = "build_flow" in times
+
+    result = {
+        "topology": topology,
+        "params": params,
+        "phases": times,
+        "links": links,
+        "links_per_sec": rate(links, times["build_links"]),
+        "flows": flows if has_flows else None,
+        "flows_per_sec": rate(flows, times["build_flow"]) if has_flows else None,
+        "wall_time": sum(times.values()),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        # the largest flow or link worker process of the configuration
+        "children_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        "topo_bytes": topo_bytes,
+        "flow_bytes": flow_bytes if has_flows else None,
+    }
+
+    return result
+
+
+def run_connectors(task):
+    topology, params = task
+    logger.set_log_mode(logger.QUIET)
+
+    builder = make_builder(
+        topology,
+        params,
+        link_strategy.DefaultLinkStrategy(CountingOutputStrategy()),
+        flow_strategy.DefaultFlowStrategy(CountingOutputStrategy()),
+        1,
+    )
+
+    results = []
+    for cls, higher, lower, group in connector_levels(builder):
+        for path in ("loop", "vectorized", "array"):
+            link = link_strategy.DefaultLinkStrategy(CountingOutputStrategy())
+            connector = cls(link, higher, lower, 0, group, **LINK_KWARGS)
+
+            start = time.perf_counter()
+            if path == "loop":
+                connector.connect()
+            elif path == "vectorized":
+                connector.connect_vectorized()
+            else:
+                src, dst = connector.connect_array()
+            seconds = time.perf_counter() - start
+
+            links = connector.link_count()
+            results.append(
+                {
+                    "topology": topology,
+                    "params": params,
+                    "connector": cls.__name__,
+                    "path": path,
+                    "links": links,
+                    "seconds": seconds,
+                    "links_per_sec": rate(links, seconds),
+                }
+            )
+
+    return results
+
+
+def configurations(args):
+    configs = []
+    if "spine_leaf" in args.topology:
+        for config in args.spine_leaf:
+            spine, leaf, host = (int(value) for value in config.split(","))
+            configs.append(("spine_leaf", {"spine": spine, "leaf": leaf, "host": host}))
+    if "fat_tree" in args.topology:
+        for k in args.k:
+            configs.append(("fat_tree", {"k": k, "host": args.host}))
+    if "bcube" in args.topology:
+        for n in args.n:
+            configs.append(("bcube", {"n": n}))
+    for config in args.config:
+        topology, _, items = config.partition(":")
+        params = dict(topogen.parse_builder_param(item) for item in items.split(","))
+        configs.append((topology, params))
+    return configs
+
+
+def print_table(results, connectors):
+    print(
+        f"{'topology':<11}{'params':<28}{'links':>10}{'links/s':>13}"
+        f"{'flows':>12}{'flows/s':>13}{'wall s':>9}{'RSS MB':>9}{'child MB':>10}"
+    )
+    for result in results:
+        params = ",".join(f"{key}={value}" for key, value in result["params"].items())
+        flows = result["flows"] if result["flows"] is not None else "skipped"
+        flows_per_sec = result["flows_per_sec"] or 0
+        print(
+            f"{result['topology']:<11}{params:<28}{result['links']:>10}"
+            f"{result['links_per_sec'] or 0:>13.0f}{flows:>12}{flows_per_sec:>13.0f}"
+            f"{result['wall_time']:>9.3f}{result['peak_rss_kb'] / 1024:>9.1f}"
+            f"{result['children_peak_rss_kb'] / 1024:>10.1f}"
+        )
+
+    print()
+    print(f"{'topology':<11}{'params':<28}{'connector':<26}{'path':<12}{'links/s':>14}")
+    for result in connectors:
+        params = ",".join(f"{key}={value}" for key, value in result["params"].items())
+        print(
+            f"{result['topology']:<11}{params:<28}{result['connector']:<26}"
+            f"{result['path']:<12}{result['links_per_sec'] or 0:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the builders, connectors and writers across scale."
+    )
+    parser.add_argument(
+        "-t",
+        "--topology",
+        nargs="+",
+        default=["spine_leaf", "fat_tree", "bcube"],
+        choices=registry.names(registry.BUILDER),
+        help="Built-in topologies to benchmark with --spine_leaf, --k and --n.",
+    )
+    parser.add_argument(
+        "--config",
+        nargs="+",
+        default=[],
+        help="Configurations of any registered builder as TOPOLOGY:NAME=VALUE,..., e.g. fat_tree:k=8,host=2. NAME is a topogen option in the PARAMETERS of the builder or a constructor parameter.",
+    )
+    parser.add_argument(
+        "--spine_leaf",
+        nargs="+",
+        default=SPINE_LEAF_CONFIGS,
+        help="Spine-Leaf configurations as spine,leaf,host.",
+    )
+    parser.add_argument(
+        "--k",
+        nargs="+",
+        type=int,
+        default=FAT_TREE_K,
+        help="Fat-Tree parameters k.",
+    )
+    parser.add_argument(
+        "--host",
+        type=int,
+        default=FAT_TREE_HOST_PER_EDGE,
+        help="Hosts per edge switch of the Fat-Trees.",
+    )
+    parser.add_argument(
+        "--n",
+        nargs="+",
+        type=int,
+        default=BCUBE_N,
+        help="BCube parameters n.",
+    )
+    parser.add_argument(
+        "--max_flows",
+        type=int,
+        default=MAX_FLOWS,
+        help="Skip the flow phase of configurations with more all-to-all flows.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes generating the flows.",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default=None,
+        help="Write the output files to this directory instead of counting the bytes.",
+    )
+    parser.add_argument(
+        "--no_connectors",
+        action="store_true",
+        help="Skip the connector path comparison.",
+    )
+    parser.add_argument(
+        "--json",
+        type=str,
+        default=None,
+        help="Write the results as JSON to this file.",
+    )
+
+    args = parser.parse_args()
+    configs = configurations(args)
+
+    results = []
+    connectors = []
+
+    # a fresh worker per configuration, so ru_maxrss is the peak of that configuration,
+    # and not a daemonic one, so the builders can start their own worker pools
+    with ProcessPoolExecutor(1, max_tasks_per_child=1) as executor:
+        tasks = [
+            (topology, params, args.workers, args.max_flows, args.output_dir)
+            for topology, params in configs
+        ]
+        results = list(executor.map(run_builder, tasks))
+
+        if not args.no_connectors:
+            for runs in executor.map(run_connectors, configs):
+                connectors.extend(runs)
+
+    print_table(results, connectors)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(
+                {
+                    "time": datetime.now().isoformat(),
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "platform": platform.platform(),
+                    "results": results,
+                    "connectors": connectors,
+                },
+                file,
+                indent=2,
+            )
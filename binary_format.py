@@ -0,0 +1,198 @@
+import re
+import numpy as np
+
+"""
+This module defines the compact binary format for topology and flow files.
+
+A binary file starts with a fixed-size header, followed by the text metadata
+(the lines the builders write before the records, e.g. the node counts and the switch list),
+padded to 8 bytes, followed by a fixed-width record array.
+Link records hold (src, dst, bandwidth, delay, error rate),
+flow records hold (src, dst, priority, port, payload, start time).
+Bandwidth is stored in bits per second and delay in seconds.
+
+The load_binary function memory-maps a file and returns the records as a NumPy view without copying.
+"""
+
+VERSION = 1
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("record_size", "<u4"),
+        ("count", "<u8"),
+        ("metadata_size", "<u8"),
+    ]
+)
+
+LINK_DTYPE = np.dtype(
+    [
+        ("src", "<u4"),
+        ("dst", "<u4"),
+        ("bandwidth", "<f8"),
+        ("delay", "<f8"),
+        ("error_rate", "<f8"),
+    ]
+)
+
+FLOW_DTYPE = np.dtype(
+    [
+        ("src", "<u4"),
+        ("dst", "<u4"),
+        ("priority", "<u2"),
+        ("port", "<u2"),
+        ("payload", "<u8"),
+        ("start_time", "<f8"),
+    ]
+)
+
+RECORD_TYPES = {
+    b"NBLINKS": LINK_DTYPE,
+    b"NBFLOWS": FLOW_DTYPE,
+}
+
+RATE_UNITS = {
+    "": 1,
+    "bps": 1,
+    "kbps": 1e3,
+    "Kbps": 1e3,
+    "Mbps": 1e6,
+    "Gbps": 1e9,
+    "Tbps": 1e12,
+}
+
+TIME_UNITS = {
+    "": 1,
+    "s": 1,
+    "ms": 1e-3,
+    "us": 1e-6,
+    "ns": 1e-9,
+}
+
+VALUE_PATTERN = re.compile(r"^\s*([-+0-9.eE]+)\s*([A-Za-z]*)\s*$")
+
+
+def parse_value(value, units):
+    if not isinstance(value, (str, bytes)):
+        return float(value)
+
+    if isinstance(value, bytes):
+        value = value.decode()
+
+    match = VALUE_PATTERN.match(value)
+    if match is None or match.group(2) not in units:
+        raise ValueError(f"Cannot parse value: {value}")
+
+    return float(match.group(1)) * units[match.group(2)]
+
+
+def parse_rate(value):
+    return parse_value(value, RATE_UNITS)
+
+
+def parse_time(value):
+    return parse_value(value, TIME_UNITS)
+
+
+"""
+This function formats a rate in bit/s with the largest unit that keeps it at least 1, e.g. 33.3333Gbps.
+"""
+
+
+def format_rate(value):
+    for unit in ("Tbps", "Gbps", "Mbps", "Kbps"):
+        if value >= RATE_UNITS[unit]:
+            return f"{value / RATE_UNITS[unit]:g}{unit}"
+    return f"{value:g}bps"
+
+
+"""
+This function parses a scalar or per-record column with the given parser.
+Per-record columns are parsed once per distinct value.
+"""
+
+
+def parse_column(column, parser):
+    if np.ndim(column) == 0:
+        return parser(column)
+
+    values, inverse = np.unique(np.asarray(column), return_inverse=True)
+    parsed = np.array([parser(value) for value in values.tolist()], dtype=np.float64)
+
+    return parsed[inverse]
+
+
+def magic_of(dtype):
+    for magic, record_dtype in RECORD_TYPES.items():
+        if record_dtype == dtype:
+            return magic
+
+    raise ValueError(f"Unknown record type: {dtype}")
+
+
+def records_offset(metadata_size):
+    offset = HEADER_DTYPE.itemsize + metadata_size
+    return (offset + 7) // 8 * 8
+
+
+def pack_header(dtype, count, metadata):
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = magic_of(dtype)
+    header["version"] = VERSION
+    header["record_size"] = dtype.itemsize
+    header["count"] = count
+    header["metadata_size"] = len(metadata)
+
+    padding = records_offset(len(metadata)) - HEADER_DTYPE.itemsize - len(metadata)
+
+    return header.tobytes() + metadata + b"\0" * padding
+
+
+"""
+BinaryData is the result of load_binary.
+metadata is the text written before the records, records is a read-only memory-mapped record array.
+"""
+
+
+class BinaryData:
+    def __init__(self, metadata, records):
+        self.metadata = metadata
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, field):
+        return self.records[field]
+
+
+def load_binary(file_name):
+    header = np.fromfile(file_name, dtype=HEADER_DTYPE, count=1)
+    if len(header) == 0 or header["magic"][0] not in RECORD_TYPES:
+        raise ValueError(f"{file_name} is not a binary topology or flow file.")
+
+    header = header[0]
+    if header["version"] != VERSION:
+        raise ValueError(f"Unsupported binary format version: {header['version']}")
+
+    dtype = RECORD_TYPES[header["magic"]]
+    count = int(header["count"])
+    metadata_size = int(header["metadata_size"])
+
+    with open(file_name, "rb") as file:
+        file.seek(HEADER_DTYPE.itemsize)
+        metadata = file.read(metadata_size).decode()
+
+    if count == 0:
+        records = np.empty(0, dtype=dtype)
+    else:
+        records = np.memmap(
+            file_name,
+            dtype=dtype,
+            mode="r",
+            offset=records_offset(metadata_size),
+            shape=(count,),
+        )
+
+    return BinaryData(metadata, records)
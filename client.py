@@ -0,0 +1,50 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+"""
+This module is the thin client of the generation server (see server):
+
+    python3 client.py -t fat_tree --k 16 -tf topology.txt -ff flow.txt
+
+It takes the same flags as topogen.py, plus --socket, and sends them to the server with its working directory,
+so relative file names are written where topogen would write them.
+It only uses the standard library, so it starts much faster than topogen itself.
+It prints the output of the run and exits with status 1 if the run failed.
+"""
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "network-builder.sock")
+
+
+def request(argv, socket_path=DEFAULT_SOCKET):
+    message = json.dumps({"argv": argv, "cwd": os.getcwd()}).encode() + b"\n"
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(message)
+        with connection.makefile("rb") as reader:
+            line = reader.readline()
+
+    if not line:
+        raise ConnectionError("The server closed the connection.")
+    return json.loads(line)
+
+
+def main(argv):
+    # -h and every other flag are passed through to the topogen parser of the server
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--socket", type=str, default=DEFAULT_SOCKET)
+    args, topogen_argv = parser.parse_known_args(argv)
+
+    response = request(topogen_argv, args.socket)
+    print(response["output"], end="")
+
+    if response["status"] != "done":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+from collections import deque
+import multiprocessing
+import numpy as np
+import logger
+from flow_strategy import all_to_all
+from output_strategy import MemoryOutputStrategy
+
+"""
+This module generates all-to-all flows shard by shard.
+
+The sources are split into shards of about SHARD_FLOWS flows.
+Every shard is generated by its own copy of the flow strategy (FlowStrategy.shard),
+so random flow attributes come from a per-shard RNG stream.
+With one worker the shards are written in place,
+with more workers they are formatted in a process pool and written back in shard order,
+so the output is byte-identical either way.
+At most SHARDS_PER_WORKER shards per worker are in flight, so finished shards waiting
+for an earlier one to be written do not pile up in the parent.
+"""
+
+SHARD_FLOWS = 1 << 20
+SHARDS_PER_WORKER = 2
+
+
+def shard_ranges(count, shard_flows=SHARD_FLOWS):
+    step = max(1, shard_flows // max(count, 1))
+    return [(first, min(first + step, count)) for first in range(0, count, step)]
+
+
+def init_worker(log_mode):
+    logger.set_log_mode(log_mode)
+
+
+def run_shard(task):
+    strategy, hosts, first, stop, kwargs = task
+
+    for src, dst in all_to_all(hosts, first=first, stop=stop):
+        strategy.flow_many(src, dst, **kwargs)
+
+    counts = dict(logger.item_counts)
+    logger.item_counts.clear()
+
+    return strategy.get_output(), counts
+
+
+"""
+This function yields the results of func over the tasks in order, like Pool.imap,
+but submits a task only when fewer than limit results are pending.
+"""
+
+
+def bounded_imap(pool, func, tasks, limit):
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= limit:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (task,)))
+
+    while pending:
+        yield pending.popleft().get()
+
+
+def generate_all_to_all(flow_strategy, hosts, workers=1, **kwargs):
+    hosts = np.fromiter(hosts, dtype=np.int64, count=len(hosts))
+    ranges = shard_ranges(len(hosts), SHARD_FLOWS)
+
+    if workers <= 1 or len(ranges) <= 1:
+        for index, (first, stop) in enumerate(ranges):
+            strategy = flow_strategy.shard(index, flow_strategy.get_output())
+            for src, dst in all_to_all(hosts, first=first, stop=stop):
+                strategy.flow_many(src, dst, **kwargs)
+        return
+
+    tasks = (
+        (flow_strategy.shard(index, MemoryOutputStrategy()), hosts, first, stop, kwargs)
+        for index, (first, stop) in enumerate(ranges)
+    )
+    output = flow_strategy.get_output()
+
+    with multiprocessing.Pool(
+        workers, initializer=init_worker, initargs=(logger.log_mode,)
+    ) as pool:
+        limit = SHARDS_PER_WORKER * workers
+        for shard_output, counts in bounded_imap(pool, run_shard, tasks, limit):
+            shard_output.replay(output)
+            logger.item_counts.update(counts)
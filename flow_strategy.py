@@ -1,27 +1,119 @@
 from abc import ABC, abstractmethod
+import copy
+import glob
+import os
 import random
-from logger import log_write
+import shutil
+import tempfile
+import weakref
+import numpy as np
+import binary_format
+from workload import FlowSizeDistribution
+from formatter import format_rows, format_size, to_list
+from logger import LogMessage, log_item
 
 """
 FlowStrategy is the abstraction for creating flows between two nodes.
 We can implement different flow strategies for different flow generation logic.
+
+Strategies that draw random flow attributes use self.rng.
+Flows are generated in shards, and every shard gets its own RNG stream seeded by (seed, shard index),
+so the output is reproducible no matter how many workers generate the shards.
 """
 
 
 class FlowStrategy(ABC):
-    def __init__(self, output):
+    def __init__(self, output, seed=None):
         self.output = output
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
 
     @abstractmethod
     def flow(self, **kwargs):
         pass
 
+    """
+    The flow_many method generates a whole block of src and dst arrays at once.
+    Attributes in kwargs are either scalars or per-flow arrays.
+    By default, it falls back to the single-item flow method.
+    """
+
+    def flow_many(self, src, dst, **kwargs):
+        columns = {
+            key: to_list(value) for key, value in kwargs.items() if np.ndim(value) > 0
+        }
+
+        for i, (s, d) in enumerate(zip(to_list(src), to_list(dst))):
+            row = {key: value[i] for key, value in columns.items()}
+            self.flow(s, d, **{**kwargs, **row})
+
+    """
+    The rows_size method returns the output size in bytes of count flows,
+    whose src and dst IDs have id_digits decimal digits in total.
+    """
+
+    def rows_size(self, count, id_digits, **kwargs):
+        raise NotImplementedError(
+            f"{self.__class__.__name__} cannot estimate its output size."
+        )
+
+    """
+    The file_size method returns the size of a file with text_size bytes of text followed by rows_size bytes of rows.
+    """
+
+    def file_size(self, text_size, rows_size):
+        return text_size + rows_size
+
     def get_output(self):
         return self.output
 
+    """
+    This method is called once after the last flow of a pattern, with the same attributes,
+    for strategies that write their flows at the end.
+    """
+
+    def finish(self, **kwargs):
+        pass
+
+    """
+    This method returns a copy of the strategy for one shard of the flows,
+    writing to the given output with the RNG stream of the shard.
+    """
+
+    def shard(self, index, output):
+        strategy = copy.copy(self)
+        strategy.output = output
+        if self.seed is None:
+            strategy.rng = np.random.default_rng()
+        else:
+            strategy.rng = np.random.default_rng([self.seed, index])
+        return strategy
+
+
+"""
+This function yields the all-to-all host pairs as blocks of src and dst arrays.
+The pairs keep the order of the nested loops over hosts, skipping src == dst,
+and each block holds at most about block_size pairs.
+Only the sources hosts[first:stop] are generated.
+"""
+
+
+def all_to_all(hosts, block_size=1 << 20, first=0, stop=None):
+    hosts = np.fromiter(hosts, dtype=np.int64, count=len(hosts))
+    count = len(hosts)
+    stop = count if stop is None else min(stop, count)
+    step = max(1, block_size // max(count, 1))
+
+    for start in range(first, stop, step):
+        sources = hosts[start : min(start + step, stop)]
+        src = np.repeat(sources, count)
+        dst = np.tile(hosts, len(sources))
+        keep = src != dst
+        yield src[keep], dst[keep]
+
 
 class DefaultFlowStrategy(FlowStrategy):
-    @log_write
+    @log_item
     def flow(self, src, dst, **kwargs):
         pfc_priority = kwargs.get("pfc_priority", 0)
         port = kwargs.get("port", 0)
@@ -31,4 +123,276 @@ class DefaultFlowStrategy(FlowStrategy):
 
         self.output.write(output)
 
-        return f"Flow from {src} to {dst} with PFC priority {pfc_priority}, port {port}, payload {payload}, and initial time {initial_time}.\n"
+        return LogMessage(
+            "Flow from {} to {} with PFC priority {}, port {}, payload {}, and initial time {}.\n",
+            src,
+            dst,
+            pfc_priority,
+            port,
+            payload,
+            initial_time,
+        )
+
+    @log_item
+    def flow_many(self, src, dst, **kwargs):
+        pfc_priority = kwargs.get("pfc_priority", 0)
+        port = kwargs.get("port", 0)
+        payload = kwargs.get("payload", 0)
+        initial_time = kwargs.get("initial_time", 0)
+
+        output = format_rows(src, dst, pfc_priority, port, payload, initial_time)
+
+        self.output.write(output)
+
+        return LogMessage("Generated {} flows.\n", len(src), count=len(src))
+
+    def rows_size(self, count, id_digits, **kwargs):
+        pfc_priority = kwargs.get("pfc_priority", 0)
+        port = kwargs.get("port", 0)
+        payload = kwargs.get("payload", 0)
+        initial_time = kwargs.get("initial_time", 0)
+
+        return id_digits + format_size(
+            count, "", "", pfc_priority, port, payload, initial_time
+        )
+
+
+"""
+BinaryFlowStrategy writes flows as fixed-width records to a BinaryOutputStrategy.
+"""
+
+
+class BinaryFlowStrategy(FlowStrategy):
+    def __init__(self, output, seed=None):
+        super().__init__(output, seed)
+        self.output.set_dtype(binary_format.FLOW_DTYPE)
+
+    @log_item
+    def flow(self, src, dst, **kwargs):
+        self.output.write_records(self.make_records([src], [dst], **kwargs))
+
+        return LogMessage("Flow from {} to {}.\n", src, dst)
+
+    @log_item
+    def flow_many(self, src, dst, **kwargs):
+        self.output.write_records(self.make_records(src, dst, **kwargs))
+
+        return LogMessage("Generated {} flows.\n", len(src), count=len(src))
+
+    def rows_size(self, count, id_digits, **kwargs):
+        return count * binary_format.FLOW_DTYPE.itemsize
+
+    def file_size(self, text_size, rows_size):
+        return binary_format.records_offset(text_size) + rows_size
+
+    def make_records(self, src, dst, **kwargs):
+        records = np.empty(len(src), dtype=binary_format.FLOW_DTYPE)
+        records["src"] = src
+        records["dst"] = dst
+        records["priority"] = kwargs.get("pfc_priority", 0)
+        records["port"] = kwargs.get("port", 0)
+        records["payload"] = kwargs.get("payload", 0)
+        records["start_time"] = kwargs.get("initial_time", 0)
+
+        return records
+
+
+"""
+PoissonFlowStrategy gives the flows Poisson start times and flow sizes drawn from a workload CDF,
+and writes them in start time order through another flow strategy, e.g. DefaultFlowStrategy.
+
+Every source host is a stream: its flows start one after another, in the order of the pattern,
+with exponential gaps at the rate that loads its link of the given bandwidth by load.
+The streams of every block of flows are merged into a time-ordered run and spilled to a temporary file
+in a run directory under spill_dir. topogen passes --spill_dir or the directory of the flow file,
+and without a spill_dir the system temporary directory is used.
+Single flows are buffered into blocks of SPILL_FLOWS flows first, so every run holds many flows.
+finish() then merges the runs with a k-way merge, reading at most MERGE_FLOWS flows of every run at a time,
+so many millions of flows are written in global time order without holding them in memory.
+The run directory is removed by finish(), or when the strategy is garbage collected or the interpreter exits.
+The initial_time attribute is the start of every stream, and payload is replaced by the flow sizes.
+"""
+
+MERGE_FLOWS = 1 << 16
+SPILL_FLOWS = 1 << 16
+RUN_DTYPE = np.dtype(
+    [
+        ("src", np.int64),
+        ("dst", np.int64),
+        ("payload", np.int64),
+        ("initial_time", np.float64),
+    ]
+)
+
+
+class PoissonFlowStrategy(FlowStrategy):
+    def __init__(
+        self,
+        strategy,
+        workload="web_search",
+        load=0.3,
+        bandwidth="100Gbps",
+        seed=None,
+        spill_dir=None,
+    ):
+        self.strategy = strategy
+        super().__init__(strategy.get_output(), seed)
+
+        self.sizes = FlowSizeDistribution.named(workload)
+        rate = binary_format.parse_rate(bandwidth) * load / (8 * self.sizes.mean())
+        self.interval = 1 / rate
+        self.clock = {}
+        self.spill_dir = spill_dir
+        self.run_dir = None
+        self.remove_runs = None
+        self.pending = ([], [])
+        self.shard_index = 0
+        self.runs = 0
+
+    @property
+    def output(self):
+        return self.strategy.output
+
+    @output.setter
+    def output(self, output):
+        self.strategy.output = output
+
+    def flow(self, src, dst, **kwargs):
+        pending_src, pending_dst = self.pending
+        pending_src.append(src)
+        pending_dst.append(dst)
+        if len(pending_src) >= SPILL_FLOWS:
+            self.flush()
+
+    def flush(self):
+        pending_src, pending_dst = self.pending
+        if pending_src:
+            self.pending = ([], [])
+            self.flow_many(pending_src, pending_dst)
+
+    def flow_many(self, src, dst, **kwargs):
+        # buffered single flows come first in the pattern order of their hosts
+        self.flush()
+
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+
+        # group the flows by source host, keeping the pattern order of every host
+        order = np.argsort(src, kind="stable")
+        src, dst = src[order], dst[order]
+        hosts, first, counts = np.unique(src, return_index=True, return_counts=True)
+
+        gaps = self.rng.exponential(self.interval, len(src))
+        times = np.cumsum(gaps)
+        before = np.repeat(times[first] - gaps[first], counts)
+        clock = np.array([self.clock.get(host, 0.0) for host in hosts.tolist()])
+        times = times - before + np.repeat(clock, counts)
+        self.clock.update(zip(hosts.tolist(), times[first + counts - 1].tolist()))
+
+        run = np.empty(len(src), dtype=RUN_DTYPE)
+        run["src"] = src
+        run["dst"] = dst
+        run["payload"] = self.sizes.sample(self.rng, len(src))
+        run["initial_time"] = times
+        self.spill(run[np.argsort(times, kind="stable")])
+
+    def make_run_dir(self):
+        if self.run_dir is None:
+            self.run_dir = tempfile.mkdtemp(
+                prefix="network-builder-", dir=self.spill_dir
+            )
+            # only the strategy that made the directory removes it, shard copies do not
+            self.remove_runs = weakref.finalize(
+                self, shutil.rmtree, self.run_dir, ignore_errors=True
+            )
+
+    def spill(self, run):
+        self.make_run_dir()
+
+        name = f"{self.shard_index:08d}-{self.runs:08d}.npy"
+        np.save(os.path.join(self.run_dir, name), run)
+        self.runs += 1
+
+    def shard(self, index, output):
+        self.make_run_dir()
+
+        strategy = copy.copy(self)
+        strategy.strategy = copy.copy(self.strategy)
+        strategy = FlowStrategy.shard(strategy, index, output)
+        strategy.clock = {}
+        strategy.remove_runs = None
+        strategy.pending = ([], [])
+        strategy.shard_index = index
+        strategy.runs = 0
+        return strategy
+
+    def finish(self, **kwargs):
+        self.flush()
+        if self.run_dir is None:
+            return
+
+        start = kwargs.get("initial_time", 0)
+        files = sorted(glob.glob(os.path.join(self.run_dir, "*.npy")))
+        try:
+            for flows in merge_runs(files, MERGE_FLOWS):
+                self.strategy.flow_many(
+                    flows["src"],
+                    flows["dst"],
+                    **{
+                        **kwargs,
+                        "payload": flows["payload"],
+                        "initial_time": np.round(start + flows["initial_time"], 9),
+                    },
+                )
+        finally:
+            self.remove_runs()
+            self.run_dir = None
+            self.remove_runs = None
+            self.clock = {}
+            self.runs = 0
+
+    """
+    Flow sizes and start times vary per flow, so text sizes are estimated with the mean flow size.
+    """
+
+    def rows_size(self, count, id_digits, **kwargs):
+        kwargs = {
+            **kwargs,
+            "payload": round(self.sizes.mean()),
+            "initial_time": f"{self.interval:.9f}",
+        }
+        return self.strategy.rows_size(count, id_digits, **kwargs)
+
+    def file_size(self, text_size, rows_size):
+        return self.strategy.file_size(text_size, rows_size)
+
+
+"""
+This function merges time-ordered runs into time-ordered blocks.
+Every round reads the next batch flows of every run, and emits all flows up to the earliest last time of a batch,
+which no flow left in any run can precede.
+"""
+
+
+def merge_runs(files, batch):
+    runs = [np.load(file_name, mmap_mode="r") for file_name in files]
+    positions = [0] * len(runs)
+
+    while True:
+        chunks = [
+            (i, run[positions[i] : positions[i] + batch])
+            for i, run in enumerate(runs)
+            if positions[i] < len(run)
+        ]
+        if not chunks:
+            return
+
+        bound = min(chunk["initial_time"][-1] for _, chunk in chunks)
+        pieces = []
+        for i, chunk in chunks:
+            take = int(np.searchsorted(chunk["initial_time"], bound, side="right"))
+            pieces.append(chunk[:take])
+            positions[i] += take
+
+        flows = np.concatenate(pieces)
+        yield flows[np.argsort(flows["initial_time"], kind="stable")]
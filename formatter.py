@@ -0,0 +1,53 @@
+import numpy as np
+
+"""
+This module formats columnar data into whitespace-separated text rows.
+It is shared by the bulk link_many and flow_many strategies.
+
+Each column is either a scalar, which is repeated on every row,
+or an array-like with one value per row.
+Scalar columns are rendered only once and baked into the row template,
+so a whole block is formatted in a single pass.
+"""
+
+
+def is_scalar(column):
+    return isinstance(column, (str, bytes)) or np.ndim(column) == 0
+
+
+def to_list(column):
+    if hasattr(column, "tolist"):
+        return column.tolist()
+    return list(column)
+
+
+def format_rows(*columns):
+    if all(is_scalar(column) for column in columns):
+        return " ".join(str(column) for column in columns) + "\n"
+
+    fields = []
+    arrays = []
+
+    for column in columns:
+        if is_scalar(column):
+            fields.append(str(column).replace("{", "{{").replace("}", "}}"))
+        else:
+            fields.append("{}")
+            arrays.append(to_list(column))
+
+    template = " ".join(fields) + "\n"
+
+    return "".join(map(template.format, *arrays))
+
+
+"""
+This function returns the length of format_rows(*columns) for count rows.
+With scalar columns only, a single row is formatted.
+"""
+
+
+def format_size(count, *columns):
+    if all(is_scalar(column) for column in columns):
+        return count * len(format_rows(*columns))
+
+    return len(format_rows(*columns))
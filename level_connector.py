@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
+import numpy as np
 from logger import log_write
 
-
 """
 LevelConnector is the abstraction for connecting nodes in different levels of the topology.
 The abstract method connect will connect the nodes between the levels.
@@ -17,17 +17,16 @@ class LevelConnector(ABC):
         higher_level_nodes,
         lower_level_nodes,
         start_id,
+        vectorized=False,
         **kwargs,
     ):
         self.link_strategy = link_strategy
         self.higher_level_nodes = higher_level_nodes
         self.lower_level_nodes = lower_level_nodes
         self.start_id = start_id
+        self.vectorized = vectorized
         self.kwargs = kwargs
 
-    def __del__(self):
-        self.final_info()
-
     """
     This method is the connection logic for the nodes between two levels.
     It will return the first index of the lower level nodes for the next level connection.
@@ -37,6 +36,51 @@ class LevelConnector(ABC):
     def connect(self):
         pass
 
+    """
+    This method is the array mode of the connection logic.
+    It will return the (src, dst) index pairs of the whole level as NumPy int arrays,
+    in the same order as connect() would link them.
+    """
+
+    @abstractmethod
+    def connect_array(self):
+        pass
+
+    """
+    This method links the pairs computed by connect_array() in one link_many call.
+    It will return the first index of the lower level nodes for the next level connection.
+    """
+
+    def connect_vectorized(self):
+        src, dst = self.connect_array()
+
+        self.link_strategy.link_many(src, dst, **self.kwargs)
+
+        return self.start_id + self.higher_level_nodes
+
+    """
+    This method returns the (first, stop, links) node ranges of the higher and the lower level,
+    where every node in [first, stop) has links links in this level.
+    Ranges of one side may overlap, the links of a node then add up.
+    It describes the level in closed form, without computing the links.
+    """
+
+    @abstractmethod
+    def endpoints(self):
+        pass
+
+    def link_count(self):
+        higher, _ = self.endpoints()
+        return sum((stop - first) * links for first, stop, links in higher)
+
+    def run(self):
+        if self.vectorized:
+            next_id = self.connect_vectorized()
+        else:
+            next_id = self.connect()
+        self.final_info()
+        return next_id
+
     @log_write
     def final_info(self):
         name = self.__class__.__name__
@@ -44,10 +88,11 @@ class LevelConnector(ABC):
 
     """
     This method is for method chaining.
+    The next level inherits the link attributes of this level, updated with kwargs.
     """
 
-    def connectTo(self, cls, next_level_nodes, group=1):
-        next_id = self.connect()
+    def connectTo(self, cls, next_level_nodes, group=1, **kwargs):
+        next_id = self.run()
         typeof = cls.__name__
 
         instance = cls(
@@ -56,21 +101,27 @@ class LevelConnector(ABC):
             next_level_nodes,
             next_id,
             group,
-            **self.kwargs,
+            vectorized=self.vectorized,
+            **{**self.kwargs, **kwargs},
         )
 
         return instance
 
+    """
+    Set vectorized to True to run the chain with connect_array() instead of connect().
+    """
+
     @staticmethod
-    def START(link_strategy, nodes, **kwargs):
+    def START(link_strategy, nodes, vectorized=False, **kwargs):
         return BaseConnector(
             link_strategy,
             nodes,
+            vectorized=vectorized,
             **kwargs,
         )
 
     def END(self):
-        self.connect()
+        self.run()
 
 
 """
@@ -91,6 +142,15 @@ class BaseConnector(LevelConnector):
     def connect(self):
         return 0
 
+    def connect_array(self):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    def connect_vectorized(self):
+        return 0
+
+    def endpoints(self):
+        return [], []
+
 
 """
 upper level: connected by all nodes
@@ -145,6 +205,46 @@ class OneOverStepConnector(LevelConnector):
 
         return lower_level_first_index
 
+    def connect_array(self):
+        lower_level_first_index = self.start_id + self.higher_level_nodes
+
+        higher_node_group, higher_node, group = np.indices(
+            (
+                self.higher_level_nodes_group,
+                self.higher_level_nodes_per_group,
+                self.group,
+            ),
+            dtype=np.int64,
+        )
+        src = (
+            self.start_id
+            + higher_node_group * self.higher_level_nodes_per_group
+            + higher_node
+        )
+        dst = (
+            lower_level_first_index
+            + group * self.lower_level_nodes_per_group
+            + higher_node_group
+        )
+
+        return src.ravel(), dst.ravel()
+
+    def endpoints(self):
+        lower_level_first_index = self.start_id + self.higher_level_nodes
+        higher_nodes = self.higher_level_nodes_group * self.higher_level_nodes_per_group
+        lower_nodes = self.group * self.lower_level_nodes_per_group
+
+        return (
+            [(self.start_id, self.start_id + higher_nodes, self.group)],
+            [
+                (
+                    lower_level_first_index,
+                    lower_level_first_index + lower_nodes,
+                    self.higher_level_nodes_per_group,
+                )
+            ],
+        )
+
 
 """
 upper level: connected one by one
@@ -187,6 +287,32 @@ class OneOverGroupConnector(LevelConnector):
 
         return lower_level_first_index
 
+    def connect_array(self):
+        lower_level_first_index = self.start_id + self.higher_level_nodes
+
+        higher_node, lower_node = np.indices(
+            (self.higher_level_nodes, self.host_per_leaf), dtype=np.int64
+        )
+        src = self.start_id + higher_node
+        dst = lower_level_first_index + higher_node * self.host_per_leaf + lower_node
+
+        return src.ravel(), dst.ravel()
+
+    def endpoints(self):
+        lower_level_first_index = self.start_id + self.higher_level_nodes
+        lower_nodes = self.higher_level_nodes * self.host_per_leaf
+
+        return (
+            [
+                (
+                    self.start_id,
+                    self.start_id + self.higher_level_nodes,
+                    self.host_per_leaf,
+                )
+            ],
+            [(lower_level_first_index, lower_level_first_index + lower_nodes, 1)],
+        )
+
 
 """
 upper level: connected group by group
@@ -230,6 +356,55 @@ class GroupOverGroupConnector(LevelConnector):
 
         return lower_level_first_index
 
+    def connect_array(self):
+        group, higher_node, lower_node = np.indices(
+            (
+                self.group,
+                self.higher_level_nodes_per_group,
+                self.lower_level_nodes_per_group,
+            ),
+            dtype=np.int64,
+        )
+        higher_node_index = self.start_id + group * self.higher_level_nodes_per_group
+        src = higher_node_index + higher_node
+        dst = self.higher_level_nodes + higher_node_index + lower_node
+
+        return src.ravel(), dst.ravel()
+
+    def endpoints(self):
+        higher_nodes = self.group * self.higher_level_nodes_per_group
+        higher = [
+            (
+                self.start_id,
+                self.start_id + higher_nodes,
+                self.lower_level_nodes_per_group,
+            )
+        ]
+
+        # the lower nodes of a group start after the higher nodes of the same group
+        lower_first = self.start_id + self.higher_level_nodes
+        if self.lower_level_nodes_per_group == self.higher_level_nodes_per_group:
+            lower = [
+                (
+                    lower_first,
+                    lower_first + higher_nodes,
+                    self.higher_level_nodes_per_group,
+                )
+            ]
+        else:
+            lower = [
+                (
+                    lower_first + group * self.higher_level_nodes_per_group,
+                    lower_first
+                    + group * self.higher_level_nodes_per_group
+                    + self.lower_level_nodes_per_group,
+                    self.higher_level_nodes_per_group,
+                )
+                for group in range(self.group)
+            ]
+
+        return higher, lower
+
 
 """
 upper level: connected all nodes
@@ -266,6 +441,37 @@ class FullMeshConnector(LevelConnector):
 
         return lower_level_first_index
 
+    def connect_array(self):
+        lower_level_first_index = self.start_id + self.higher_level_nodes
+
+        higher_node, lower_node = np.indices(
+            (self.higher_level_nodes, self.lower_level_nodes), dtype=np.int64
+        )
+        src = self.start_id + higher_node
+        dst = lower_level_first_index + lower_node
+
+        return src.ravel(), dst.ravel()
+
+    def endpoints(self):
+        lower_level_first_index = self.start_id + self.higher_level_nodes
+
+        return (
+            [
+                (
+                    self.start_id,
+                    self.start_id + self.higher_level_nodes,
+                    self.lower_level_nodes,
+                )
+            ],
+            [
+                (
+                    lower_level_first_index,
+                    lower_level_first_index + self.lower_level_nodes,
+                    self.higher_level_nodes,
+                )
+            ],
+        )
+
 
 """
 upper level: connected group by group
@@ -307,3 +513,29 @@ class GroupOverOneConnector(LevelConnector):
                 )
 
         return lower_level_first_index
+
+    def connect_array(self):
+        lower_level_first_index = self.start_id + self.higher_level_nodes
+
+        group, higher_node = np.indices(
+            (self.group, self.higher_level_nodes_per_group), dtype=np.int64
+        )
+        src = self.start_id + group * self.higher_level_nodes_per_group + higher_node
+        dst = lower_level_first_index + group
+
+        return src.ravel(), dst.ravel()
+
+    def endpoints(self):
+        lower_level_first_index = self.start_id + self.higher_level_nodes
+        higher_nodes = self.group * self.higher_level_nodes_per_group
+
+        return (
+            [(self.start_id, self.start_id + higher_nodes, 1)],
+            [
+                (
+                    lower_level_first_index,
+                    lower_level_first_index + self.group,
+                    self.higher_level_nodes_per_group,
+                )
+            ],
+        )
@@ -0,0 +1,82 @@
+import binary_format
+from topology import HOST, SWITCH
+
+"""
+LinkAttributes is a table of link attributes per connector level and per role,
+e.g. 400Gbps between the core and aggregation levels and 100Gbps between switches and hosts.
+
+A level is named by its higher and lower level, e.g. "core-aggregation",
+and a role by the roles of the two levels, "switch-switch", "switch-host" or "host-switch".
+For every connector level, the attributes passed to construct() are overridden by the role attributes,
+and those by the level attributes.
+
+oversubscription maps a level name to the ratio of its downlink to its uplink capacity, e.g. {"edge": 3}.
+The uplink bandwidth of the level is then derived from the links and bandwidth of its downlinks.
+Ratios are applied from the bottom of the chain up, so stacked ratios multiply.
+
+The table is resolved once per connector level into one scalar per attribute,
+so a heterogeneous fabric is generated as fast as a uniform one.
+"""
+
+
+ROLES = (f"{SWITCH}-{SWITCH}", f"{SWITCH}-{HOST}", f"{HOST}-{SWITCH}")
+
+
+def role_of(level_name):
+    return HOST if level_name == HOST else SWITCH
+
+
+class LinkAttributes:
+    def __init__(self, levels=None, roles=None, oversubscription=None):
+        self.levels = levels or {}
+        self.roles = roles or {}
+        self.oversubscription = oversubscription or {}
+
+    """
+    This method returns the attributes of every level of a TopologyPlan, in chain order.
+    """
+
+    def resolve(self, level_plans, **kwargs):
+        self.check(level_plans)
+
+        attributes = []
+        for level in level_plans:
+            role = f"{role_of(level.higher)}-{role_of(level.lower)}"
+            name = f"{level.higher}-{level.lower}"
+            attributes.append(
+                {**kwargs, **self.roles.get(role, {}), **self.levels.get(name, {})}
+            )
+
+        for i in reversed(range(len(level_plans) - 1)):
+            ratio = self.oversubscription.get(level_plans[i].lower)
+            if ratio is None or level_plans[i].links == 0:
+                continue
+
+            down = level_plans[i + 1]
+            capacity = down.links * binary_format.parse_rate(
+                attributes[i + 1].get("bandwidth", "0Gbps")
+            )
+            attributes[i]["bandwidth"] = binary_format.format_rate(
+                capacity / (level_plans[i].links * ratio)
+            )
+
+        return attributes
+
+    def check(self, level_plans):
+        names = {f"{level.higher}-{level.lower}" for level in level_plans}
+        roles = {
+            f"{role_of(level.higher)}-{role_of(level.lower)}" for level in level_plans
+        }
+        # a level needs uplinks and downlinks to be oversubscribed
+        middle = {level.lower for level in level_plans[:-1]}
+
+        for table, known, kind in (
+            (self.levels, names, "link level"),
+            (self.roles, roles, "link role"),
+            (self.oversubscription, middle, "oversubscribed level"),
+        ):
+            unknown = sorted(set(table) - known)
+            if unknown:
+                raise ValueError(
+                    f"Unknown {kind} {', '.join(unknown)}, expected one of {', '.join(sorted(known))}."
+                )
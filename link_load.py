@@ -0,0 +1,323 @@
+import multiprocessing
+import numpy as np
+import binary_format
+import output_strategy
+import topology_loader
+from routing import BATCH_ENTRIES, bfs_distances, destination_groups
+
+"""
+This module estimates the load of every link under ECMP from the flows alone, before a simulation runs.
+
+The bytes of every flow are split evenly over all of its shortest paths.
+Splitting a flow over its paths is the same as splitting the traffic of a node towards a destination
+over its next hops in proportion to their shortest path counts to the destination,
+so the loads are computed per destination group instead of per flow or per path:
+
+- the flows are summed into the bytes every node sends to every group, with one bincount,
+  so millions of flows cost a few vectorized passes over their columns,
+- for a batch of groups, the distances come from the BFS of the routing module
+  and the path counts of every node from one pass per hop distance, closest nodes first,
+- the traffic is then pushed from the farthest nodes to the neighbors of the group,
+  one hop distance at a time, over the (group, adjacency entry) pairs that lead one hop closer.
+  The batches are independent and are spread in a process pool with more than one worker.
+
+Hosts with the same neighbors, e.g. the hosts of one edge switch of a pod, form one group as in the routing module,
+and the last hop to every host carries the bytes sent to it.
+Hosts with several neighbors, e.g. in a BCube, are a group of their own,
+and so is every other node flows are sent to, e.g. the switches among the first n^2 node IDs of the BCube flows.
+
+The loads are in bytes per link direction. The utilization of a link direction is its load in bits
+over its bandwidth times the time window of the flows, by default the span of their start times.
+"""
+
+FLOW_COLUMNS = 6
+
+
+"""
+This function reads the src, dst, payload and start_time columns of a text or binary flow file.
+"""
+
+
+def load_flows(file_name):
+    if topology_loader.is_binary(file_name):
+        records = binary_format.load_binary(file_name).records
+        return (
+            records["src"].astype(np.int64),
+            records["dst"].astype(np.int64),
+            records["payload"].astype(np.int64),
+            records["start_time"].astype(np.float64),
+        )
+
+    with output_strategy.open_input(file_name) as file:
+        file.readline()
+        rows = np.fromstring(file.read().decode(), sep=" ")
+
+    if len(rows) % FLOW_COLUMNS:
+        raise ValueError(f"{file_name} is not a flow file.")
+    rows = rows.reshape(-1, FLOW_COLUMNS)
+
+    return (
+        rows[:, 0].astype(np.int64),
+        rows[:, 1].astype(np.int64),
+        rows[:, 4].astype(np.int64),
+        rows[:, 5],
+    )
+
+
+"""
+This function returns the destination groups of the load estimation:
+the routing groups, with the hosts of groups that have several neighbors split into groups of one,
+and a group of one for every other destination node.
+"""
+
+
+def load_groups(topology, destinations):
+    groups = []
+    for hosts in destination_groups(topology):
+        if len(hosts) > 1 and topology.degree(int(hosts[0])) > 1:
+            groups.extend(hosts[i : i + 1] for i in range(len(hosts)))
+        else:
+            groups.append(hosts)
+
+    others = np.setdiff1d(destinations, topology.hosts)
+    groups.extend(others[i : i + 1] for i in range(len(others)))
+
+    return groups
+
+
+"""
+This function returns the adjacency entry of the other direction of every adjacency entry.
+"""
+
+
+def reverse_entries(topology, owners):
+    order = np.lexsort((owners, topology.edge_ids))
+    reverse = np.empty_like(order)
+    reverse[order[0::2]] = order[1::2]
+    reverse[order[1::2]] = order[0::2]
+    return reverse
+
+
+"""
+This function returns the bytes of every link direction as a (links, 2) array,
+column 0 from src to dst of the link and column 1 from dst to src.
+The batches of groups are spread in a pool of workers if there are more than one.
+"""
+
+
+def link_loads(topology, src, dst, payload, workers=1):
+    num_nodes = topology.num_nodes
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    payload = np.asarray(payload, dtype=np.float64)
+    if len(src) and max(src.max(), dst.max()) >= num_nodes:
+        raise ValueError(
+            f"Flows must go between the {num_nodes} nodes of the topology."
+        )
+
+    groups = load_groups(topology, np.unique(dst))
+    host_group = np.full(num_nodes, -1, dtype=np.int64)
+    shared = np.zeros(num_nodes, dtype=bool)
+    for group, hosts in enumerate(groups):
+        host_group[hosts] = group
+        shared[hosts] = len(hosts) > 1
+
+    sent = np.bincount(
+        host_group[dst] * num_nodes + src,
+        weights=payload,
+        minlength=len(groups) * num_nodes,
+    ).reshape(len(groups), num_nodes)
+    # hosts that share a group have a single neighbor, which forwards all of their bytes
+    received = np.bincount(dst, weights=payload, minlength=num_nodes)
+    direct = np.where(shared, received, -1)
+
+    batch = max(1, BATCH_ENTRIES // max(len(topology.indices), 1))
+    tasks = []
+    for first in range(0, len(groups), batch):
+        traffic = sent[first : first + batch]
+        keep = np.flatnonzero(traffic.any(axis=1))
+        if len(keep):
+            batch_groups = [groups[first + row] for row in keep.tolist()]
+            tasks.append((batch_groups, traffic[keep]))
+
+    moved = np.zeros(len(topology.indices), dtype=np.float64)
+    delivered = np.zeros(len(topology.indices), dtype=np.float64)
+    if workers <= 1 or len(tasks) <= 1:
+        init_worker(topology, direct)
+        for batch_moved, batch_delivered in map(run_batch, tasks):
+            moved += batch_moved
+            delivered += batch_delivered
+    else:
+        with multiprocessing.Pool(
+            workers, initializer=init_worker, initargs=(topology, direct)
+        ) as pool:
+            for batch_moved, batch_delivered in pool.imap(run_batch, tasks):
+                moved += batch_moved
+                delivered += batch_delivered
+
+    degree = topology.degree()
+    owners = np.repeat(np.arange(num_nodes), degree)
+    moved += delivered[reverse_entries(topology, owners)]
+
+    loads = np.zeros((topology.num_links, 2), dtype=np.float64)
+    direction = (owners != topology.src[topology.edge_ids]).astype(np.int64)
+    np.add.at(loads, (topology.edge_ids, direction), moved)
+    return loads
+
+
+# the topology and the bytes of the last hop of hosts that share a group, set once per worker
+context = None
+
+
+def init_worker(topology, direct):
+    global context
+    context = topology, direct
+
+
+"""
+This function spreads a batch of groups, with one row of sent bytes per group.
+It returns the bytes of every adjacency entry up to the neighbors of the groups,
+and the last hop bytes of every host, on the adjacency entries from the host to its neighbors.
+"""
+
+
+def run_batch(task):
+    topology, direct = context
+    groups, traffic = task
+
+    moved, arrived = spread(topology, groups, traffic)
+
+    hosts = np.concatenate(groups)
+    rows = np.repeat(np.arange(len(groups)), [len(group) for group in groups])
+    counts = topology.degree()[hosts]
+    starts = np.repeat(topology.indptr[hosts] - np.cumsum(counts) + counts, counts)
+    entries = starts + np.arange(int(counts.sum()))
+    hosts = np.repeat(hosts, counts)
+
+    shares = np.where(
+        direct[hosts] >= 0,
+        direct[hosts],
+        arrived[np.repeat(rows, counts), topology.indices[entries]],
+    )
+    delivered = np.bincount(entries, weights=shares, minlength=len(moved))
+
+    return moved, delivered
+
+
+"""
+This function pushes the traffic of a batch of groups, one (groups, nodes) row of sent bytes per group,
+towards the neighbors of the groups.
+It returns the bytes of every adjacency entry, and the bytes that arrive at every neighbor of every group.
+"""
+
+
+def spread(topology, groups, traffic):
+    num_nodes = topology.num_nodes
+    degree = topology.degree()
+    owners = np.repeat(np.arange(num_nodes), degree)
+    distances = bfs_distances(topology, [hosts[0] for hosts in groups])
+    for row, hosts in enumerate(groups):
+        # the hosts of a group reach each other over their neighbors
+        distances[row, hosts] = 2
+
+    own = np.repeat(distances, degree, axis=1)
+    closer = (distances[:, topology.indices] == own - 1) & (own >= 2)
+
+    # the (group, adjacency entry) pairs towards every group, by decreasing hop distance
+    pairs = np.flatnonzero(closer)
+    levels = own.ravel()[pairs]
+    order = np.argsort(levels, kind="stable")[::-1]
+    pairs, levels = pairs[order], levels[order]
+    rows, entries = np.divmod(pairs, len(topology.indices))
+    nodes = rows * num_nodes + owners[entries]
+    next_hops = rows * num_nodes + topology.indices[entries]
+
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(levels)) + 1, [len(levels)]))
+    parts = [
+        (entries[first:stop], nodes[first:stop], next_hops[first:stop])
+        for first, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+        if stop > first
+    ]
+
+    # the shortest path counts to every group, from its neighbors outwards
+    paths = (distances == 1).astype(np.float64).ravel()
+    for _, nodes, next_hops in reversed(parts):
+        paths += np.bincount(nodes, weights=paths[next_hops], minlength=len(paths))
+
+    # the traffic of every node, split over its next hops by their path counts
+    loads = traffic.astype(np.float64).ravel()
+    moved = np.zeros(len(topology.indices), dtype=np.float64)
+    for entries, nodes, next_hops in parts:
+        shares = loads[nodes] * paths[next_hops] / paths[nodes]
+        moved += np.bincount(entries, weights=shares, minlength=len(moved))
+        loads += np.bincount(next_hops, weights=shares, minlength=len(loads))
+
+    arrived = np.where(distances == 1, loads.reshape(distances.shape), 0)
+    return moved, arrived
+
+
+"""
+This function returns the name of every link level, e.g. "core - aggregation",
+and the level of every link, from the levels of its two ends, higher level first.
+"""
+
+
+def link_levels(topology, names=None, node_level=None):
+    if names is None:
+        names, node_level = topology.level_names, topology.node_level
+
+    ends = np.sort(
+        np.stack((node_level[topology.src], node_level[topology.dst]), axis=1), axis=1
+    )
+    pairs, levels = np.unique(ends[:, 0] * len(names) + ends[:, 1], return_inverse=True)
+    level_names = [
+        f"{names[pair // len(names)]} - {names[pair % len(names)]}"
+        for pair in pairs.tolist()
+    ]
+
+    return level_names, levels.reshape(-1)
+
+
+"""
+This function returns the bandwidth of every link in bit/s, or None if a link has none.
+"""
+
+
+def link_bandwidths(topology):
+    bandwidth = topology.attribute("bandwidth")
+    if len(bandwidth) != topology.num_links or any(
+        value is None for value in bandwidth.tolist()
+    ):
+        return None
+    return binary_format.parse_column(bandwidth, binary_format.parse_rate)
+
+
+"""
+This function reports the maximum and mean load of the link directions of every link level,
+as utilizations if the bandwidths and the time window in seconds are known, and in bytes otherwise.
+"""
+
+
+def report(topology, loads, bandwidth=None, window=None, names=None, node_level=None):
+    level_names, levels = link_levels(topology, names, node_level)
+    utilization = None
+    if bandwidth is not None and window:
+        utilization = loads * 8 / (np.asarray(bandwidth)[:, None] * window)
+
+    lines = []
+    for level, name in enumerate(level_names):
+        links = levels == level
+        level_loads = loads[links]
+        line = (
+            f"  {name:<24}{np.count_nonzero(links):>16} links"
+            f"  max {level_loads.max():.0f}  mean {level_loads.mean():.0f} bytes"
+        )
+        if utilization is not None:
+            level_utilization = utilization[links]
+            line += (
+                f"  max {level_utilization.max():.1%}"
+                f"  mean {level_utilization.mean():.1%} utilization"
+            )
+        lines.append(line)
+
+    return "\n".join(lines)
@@ -0,0 +1,87 @@
+import multiprocessing
+import logger
+from flow_shards import SHARDS_PER_WORKER, bounded_imap
+from output_strategy import MemoryOutputStrategy
+
+"""
+This module generates the links of a connector chain level by level in parallel.
+
+The first node ID of every level is known from the builder spec (TopologyPlan.level_offsets),
+so every connector can be created up front instead of waiting for the previous level to return its next ID.
+The links of every level are computed with connect_array and split into shards of at most SHARD_LINKS links.
+Every shard is formatted by its own copy of the link strategy (LinkStrategy.shard) in a process pool,
+and the shards are written back in chain order, so the topology file is byte-identical to a sequential run.
+As for flow shards, at most SHARDS_PER_WORKER shards per worker are in flight.
+
+Processes are used rather than threads, as the formatting holds the GIL.
+"""
+
+SHARD_LINKS = 1 << 20
+
+
+# the workers log nothing, their log messages are logged by the parent in chain order
+def init_worker():
+    logger.set_log_mode(logger.QUIET)
+
+
+def run_shard(task):
+    strategy, src, dst, kwargs = task
+
+    message = strategy.link_many(src, dst, **kwargs)
+
+    return strategy.get_output(), message
+
+
+"""
+This function yields the shards of every level as (level index, first link, src, dst),
+where first link is the index of the first link of the shard in the whole chain.
+"""
+
+
+def level_shards(connectors, shard_links=SHARD_LINKS):
+    offset = 0
+    for index, connector in enumerate(connectors):
+        src, dst = connector.connect_array()
+        for first in range(0, len(src), shard_links):
+            stop = first + shard_links
+            yield index, offset + first, src[first:stop], dst[first:stop]
+        offset += len(src)
+
+
+"""
+This function links the levels of connectors, with the link attributes of every level, in a pool of workers.
+Every connector logs that its level is connected once all of its shards are written.
+"""
+
+
+def connect_parallel(link_strategy, connectors, attributes, workers):
+    shards = list(level_shards(connectors))
+    tasks = (
+        (
+            link_strategy.shard(first, MemoryOutputStrategy()),
+            src,
+            dst,
+            attributes[index],
+        )
+        for index, first, src, dst in shards
+    )
+    output = link_strategy.get_output()
+    key = f"{link_strategy.__class__.__name__}.link_many"
+
+    # the position of the last shard of every level with links
+    last = {index: position for position, (index, _, _, _) in enumerate(shards)}
+    connected = 0
+
+    def log_connected(position):
+        nonlocal connected
+        while connected < len(connectors) and last.get(connected, -1) <= position:
+            connectors[connected].final_info()
+            connected += 1
+
+    log_connected(-1)
+    with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+        results = bounded_imap(pool, run_shard, tasks, SHARDS_PER_WORKER * workers)
+        for position, (shard_output, message) in enumerate(results):
+            shard_output.replay(output)
+            logger.log_result(key, message)
+            log_connected(position)
@@ -1,5 +1,9 @@
 from abc import ABC, abstractmethod
-from logger import log_write
+import copy
+import numpy as np
+import binary_format
+from formatter import format_rows, format_size, to_list
+from logger import LogMessage, log_item
 
 """
 LinkStrategy is the abstraction for creating links between two nodes.
@@ -18,9 +22,52 @@ class LinkStrategy(ABC):
     def link(self, **kwargs):
         pass
 
+    """
+    The link_many method links a whole block of src and dst arrays at once.
+    Attributes in kwargs are either scalars or per-link arrays.
+    By default, it falls back to the single-item link method.
+    """
+
+    def link_many(self, src, dst, **kwargs):
+        columns = {
+            key: to_list(value) for key, value in kwargs.items() if np.ndim(value) > 0
+        }
+
+        for i, (s, d) in enumerate(zip(to_list(src), to_list(dst))):
+            row = {key: value[i] for key, value in columns.items()}
+            self.link(s, d, **{**kwargs, **row})
+
+    """
+    The rows_size method returns the output size in bytes of count links,
+    whose src and dst IDs have id_digits decimal digits in total.
+    It is used to size a run before generating it (see topology_plan).
+    """
+
+    def rows_size(self, count, id_digits, **kwargs):
+        raise NotImplementedError(
+            f"{self.__class__.__name__} cannot estimate its output size."
+        )
+
+    """
+    The file_size method returns the size of a file with text_size bytes of text followed by rows_size bytes of rows.
+    """
+
+    def file_size(self, text_size, rows_size):
+        return text_size + rows_size
+
     def get_output(self):
         return self.output
 
+    """
+    This method returns a copy of the strategy for one shard of a level,
+    writing to the given output, whose links start at the first-th link of the chain.
+    """
+
+    def shard(self, first, output):
+        strategy = copy.copy(self)
+        strategy.output = output
+        return strategy
+
 
 """
 DefaultLinkStrategy is the default strategy for creating links between nodes.
@@ -30,7 +77,7 @@ It will create a link with the given bandwidth, delay, and error rate.
 
 class DefaultLinkStrategy(LinkStrategy):
 
-    @log_write
+    @log_item
     def link(self, src, dst, **kwargs):
         bandwidth = kwargs.get("bandwidth", "0Gbps")
         delay = kwargs.get("delay", "0ms")
@@ -40,7 +87,39 @@ class DefaultLinkStrategy(LinkStrategy):
 
         self.output.write(output)
 
-        return f"Connected {src} to {dst} with {bandwidth} bandwidth, {delay} delay, and {error_rate} error rate.\n"
+        return LogMessage(
+            "Connected {} to {} with {} bandwidth, {} delay, and {} error rate.\n",
+            src,
+            dst,
+            bandwidth,
+            delay,
+            error_rate,
+        )
+
+    @log_item
+    def link_many(self, src, dst, **kwargs):
+        bandwidth = kwargs.get("bandwidth", "0Gbps")
+        delay = kwargs.get("delay", "0ms")
+        error_rate = kwargs.get("error_rate", 0)
+
+        output = format_rows(src, dst, bandwidth, delay, error_rate)
+
+        self.output.write(output)
+
+        return LogMessage("Connected {} links.\n", len(src), count=len(src))
+
+    def rows_size(self, count, id_digits, **kwargs):
+        bandwidth = kwargs.get("bandwidth", "0Gbps")
+        delay = kwargs.get("delay", "0ms")
+        error_rate = kwargs.get("error_rate", 0)
+
+        # empty src and dst columns leave their separators
+        return id_digits + format_size(count, "", "", bandwidth, delay, error_rate)
+
+
+"""
+HalfLinkStrategy overrides every other link with a lossy, slow link.
+"""
 
 
 class HalfLinkStrategy(LinkStrategy):
@@ -54,7 +133,7 @@ class HalfLinkStrategy(LinkStrategy):
         self.flow_strategy = flow_strategy
         self.id = 0
 
-    @log_write
+    @log_item
     def link(self, src, dst, **kwargs):
 
         bandwidth = kwargs.get("bandwidth", "0Gbps")
@@ -71,4 +150,101 @@ class HalfLinkStrategy(LinkStrategy):
         output = f"{src} {dst} {bandwidth} {delay} {error_rate}\n"
         self.output.write(output)
 
-        return f"Connected {src} to {dst} with {bandwidth} bandwidth, {delay} delay, and {error_rate} error rate.\n"
+        return LogMessage(
+            "Connected {} to {} with {} bandwidth, {} delay, and {} error rate.\n",
+            src,
+            dst,
+            bandwidth,
+            delay,
+            error_rate,
+        )
+
+    @log_item
+    def link_many(self, src, dst, **kwargs):
+        bandwidth = kwargs.get("bandwidth", "0Gbps")
+        delay = kwargs.get("delay", "0ms")
+        error_rate = kwargs.get("error_rate", 0)
+
+        # skip every other link, counting from the links already generated
+        count = len(src)
+        skipped = (self.id + np.arange(count)) % 2 == 0
+        self.id += count
+
+        bandwidth = override(bandwidth, count, skipped, "5Gbps")
+        delay = override(delay, count, skipped, "10ms")
+        error_rate = override(error_rate, count, skipped, 0.5)
+
+        output = format_rows(src, dst, bandwidth, delay, error_rate)
+        self.output.write(output)
+
+        return LogMessage("Connected {} links.\n", count, count=count)
+
+    # the shard continues counting from the links generated before it
+    def shard(self, first, output):
+        strategy = super().shard(first, output)
+        strategy.id = self.id + first
+        return strategy
+
+
+"""
+BinaryLinkStrategy writes links as fixed-width records to a BinaryOutputStrategy.
+Bandwidth and delay strings are converted to bits per second and seconds.
+"""
+
+
+class BinaryLinkStrategy(LinkStrategy):
+    def __init__(
+        self,
+        output,
+    ):
+        super().__init__(output)
+        self.output.set_dtype(binary_format.LINK_DTYPE)
+
+    @log_item
+    def link(self, src, dst, **kwargs):
+        self.output.write_records(self.make_records([src], [dst], **kwargs))
+
+        return LogMessage("Connected {} to {}.\n", src, dst)
+
+    @log_item
+    def link_many(self, src, dst, **kwargs):
+        self.output.write_records(self.make_records(src, dst, **kwargs))
+
+        return LogMessage("Connected {} links.\n", len(src), count=len(src))
+
+    def rows_size(self, count, id_digits, **kwargs):
+        return count * binary_format.LINK_DTYPE.itemsize
+
+    def file_size(self, text_size, rows_size):
+        return binary_format.records_offset(text_size) + rows_size
+
+    def make_records(self, src, dst, **kwargs):
+        bandwidth = kwargs.get("bandwidth", "0Gbps")
+        delay = kwargs.get("delay", "0ms")
+        error_rate = kwargs.get("error_rate", 0)
+
+        records = np.empty(len(src), dtype=binary_format.LINK_DTYPE)
+        records["src"] = src
+        records["dst"] = dst
+        records["bandwidth"] = binary_format.parse_column(
+            bandwidth, binary_format.parse_rate
+        )
+        records["delay"] = binary_format.parse_column(delay, binary_format.parse_time)
+        records["error_rate"] = binary_format.parse_column(error_rate, float)
+
+        return records
+
+
+"""
+This function replaces the values of a scalar or per-link column where mask is set.
+It keeps the Python objects as they are, so the formatted text matches the link method.
+"""
+
+
+def override(column, count, mask, value):
+    if np.ndim(column) == 0:
+        result = np.full(count, column, dtype=object)
+    else:
+        result = np.array(column, dtype=object)
+    result[mask] = value
+    return result
@@ -1,4 +1,5 @@
 import logging
+from collections import Counter
 from functools import wraps
 
 """
@@ -9,12 +10,24 @@ The debug function is used to configure the logger with the DEBUG level.
 It uses the decorator pattern to log the information of the functions.
 We just need to add the @log_write or @log_debug decorator to the function,
 and return the message we want to log.
+
+Functions in the hot path, such as link and flow, use the @log_item decorator
+and return a LogMessage, which is only formatted when it is actually logged.
+How @log_item logs depends on the log mode:
+- EDGE logs one line per call.
+- SUMMARY counts the items and logs the counts when the next @log_write phase ends.
+- QUIET logs nothing below WARNING.
 """
 
+EDGE = "edge"
+SUMMARY = "summary"
+QUIET = "quiet"
+LOG_MODES = (EDGE, SUMMARY, QUIET)
+
 
-def log_config():
+def log_config(level=logging.INFO):
     logger = logging.getLogger(__name__)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(level)
 
     console_handler = logging.StreamHandler()
     formatter = logging.Formatter("%(levelname)s - %(message)s")
@@ -27,6 +40,45 @@ def log_config():
 
 LOG = log_config()
 
+log_mode = EDGE
+item_counts = Counter()
+
+
+def set_log_mode(mode):
+    global log_mode
+
+    if mode not in LOG_MODES:
+        raise ValueError(f"Unknown log mode: {mode}")
+
+    log_mode = mode
+    item_counts.clear()
+    LOG.setLevel(logging.WARNING if mode == QUIET else logging.INFO)
+
+
+"""
+LogMessage holds a format string and its arguments.
+The message is only built when str() is called, e.g. by the logging handler.
+count is the number of items the message stands for in SUMMARY mode.
+"""
+
+
+class LogMessage:
+    __slots__ = ("template", "args", "count")
+
+    def __init__(self, template, *args, count=1):
+        self.template = template
+        self.args = args
+        self.count = count
+
+    def __str__(self):
+        return self.template.format(*self.args)
+
+
+def log_summary():
+    for name, count in item_counts.items():
+        LOG.info(f"Summary - {name}: {count} items.\n")
+    item_counts.clear()
+
 
 def log_write(func):
     @wraps(func)
@@ -34,7 +86,34 @@ def log_write(func):
         func_name = f"{func.__name__} - "
         obj_name = args[0].__class__.__name__
         result = func(*args, **kwargs)
+        if log_mode == SUMMARY and item_counts:
+            log_summary()
         LOG.info(result)
         return result
 
     return wrapper
+
+
+"""
+This function logs the LogMessage of an item as @log_item does, counted under key in SUMMARY mode.
+It is also used to log the items of worker processes in the parent, in order.
+"""
+
+
+def log_result(key, result):
+    if log_mode == EDGE:
+        LOG.info(result)
+    elif log_mode == SUMMARY:
+        item_counts[key] += result.count
+
+
+def log_item(func):
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        log_result(f"{args[0].__class__.__name__}.{name}", result)
+        return result
+
+    return wrapper
@@ -1,7 +1,13 @@
 from abc import ABC, abstractmethod
 from logger import log_write
+from traffic_pattern import AllToAllPattern
+from topology import HOST, TopologyRecorder
+from pipeline import run_concurrently
+from link_shards import connect_parallel
+from topology_plan import TopologyPlan
 from level_connector import (
     LevelConnector,
+    BaseConnector,
     FullMeshConnector,
     OneOverGroupConnector,
     OneOverStepConnector,
@@ -15,10 +21,18 @@ It will direct the construction of the whole topology.
 
 The construct method will build the nodes, switches, and links by combining the LevelConnector.
 It also in charge of building the flows via FlowStrategy.
+With concurrent=True, the links and the flows are built at the same time (see pipeline).
+
+The build_topology method runs the same connector chain into an in-memory Topology instead of the output.
+
+PARAMETERS maps the constructor parameters of a builder to the topogen options that set them,
+so topogen creates any registered builder (see registry) the same way.
 """
 
 
 class NetworkBuilder(ABC):
+    PARAMETERS = {}
+
     @abstractmethod
     def construct(self, **kwargs):
         pass
@@ -39,6 +53,129 @@ class NetworkBuilder(ABC):
     def build_flow(self, **kwargs):
         pass
 
+    """
+    This method returns the (name, node count) of every level in node ID order.
+    """
+
+    @abstractmethod
+    def levels(self):
+        pass
+
+    """
+    This method returns the (connector class, group) that connects every level to the one before it,
+    so levels() and chain() are the declarative spec of the topology.
+    """
+
+    @abstractmethod
+    def chain(self):
+        pass
+
+    """
+    This method returns the closed-form degree of the nodes of every level towards every other level,
+    as {(level, other level): links}. Level pairs that are not listed have no links.
+    """
+
+    @abstractmethod
+    def degrees(self):
+        pass
+
+    """
+    This method returns the closed-form number of hosts at every hop distance from the first host,
+    as {distance: hosts}.
+    """
+
+    @abstractmethod
+    def host_distances(self):
+        pass
+
+    """
+    This method runs the connector chain of the topology with the given link strategy.
+    Every level gets the link attributes resolved for it from self.link_attributes.
+    With more than one worker, the levels are generated in parallel (see link_shards).
+    """
+
+    def connect_levels(self, link_strategy, workers=1, **kwargs):
+        levels = self.levels()
+        plan = self.plan()
+        attributes = plan.level_attributes(**kwargs)
+
+        if workers > 1:
+            # every level starts at its offset in the plan, so no level waits for the one before
+            connectors = [BaseConnector(None, levels[0][1])] + [
+                level.connector for level in plan.level_plans
+            ]
+            connect_parallel(link_strategy, connectors, [kwargs] + attributes, workers)
+            return
+
+        connector = LevelConnector.START(
+            link_strategy,
+            levels[0][1],
+            vectorized=True,
+            **kwargs,
+        )
+        for (cls, group), (_, nodes), level_kwargs in zip(
+            self.chain(), levels[1:], attributes
+        ):
+            connector = connector.connectTo(cls, nodes, group, **level_kwargs)
+        connector.END()
+
+    """
+    This method returns the (first, stop) range of the node IDs the flows are generated between.
+    """
+
+    def flow_hosts(self):
+        first = 0
+        for name, count in self.levels():
+            if name == HOST:
+                return first, first + count
+            first += count
+
+    """
+    This method compiles the spec into a TopologyPlan, which sizes the run without generating it.
+    """
+
+    def plan(self):
+        return TopologyPlan(
+            self.levels(),
+            self.chain(),
+            self.flow_hosts(),
+            self.pattern or AllToAllPattern(),
+            self.link_attributes,
+        )
+
+    @log_write
+    def build_links(self, **kwargs):
+        self.connect_levels(self.link_strategy, self.workers, **kwargs)
+
+        return f"Links generated.\n"
+
+    """
+    This method runs the link phase and then the flow phase,
+    or both at once when the builder was created with concurrent=True.
+    """
+
+    def build_links_and_flow(self, **kwargs):
+        if self.concurrent:
+            run_concurrently(self, **kwargs)
+        else:
+            self.build_links(**kwargs)
+            self.build_flow(**kwargs)
+
+    def build_topology(self, **kwargs):
+        recorder = TopologyRecorder()
+        self.connect_levels(recorder, **kwargs)
+
+        return recorder.topology(self.levels())
+
+    """
+    This method writes the flows of self.pattern between the hosts, preceded by the flow count.
+    Without a pattern, every host sends a flow to every other host.
+    """
+
+    def write_flows(self, hosts, **kwargs):
+        pattern = self.pattern or AllToAllPattern()
+        pattern.generate(self.flow_strategy, hosts, self.workers, **kwargs)
+
 
 """
 SpineLeafBuilder will build a Spine-Leaf topology.
@@ -47,8 +184,20 @@ We can specify the number of spine switches, leaf switches, and hosts per leaf t
 
 
 class SpineLeafBuilder(NetworkBuilder):
+    PARAMETERS = {"spine": "spine", "leaf": "leaf", "host_per_leaf": "host"}
+
     def __init__(
-        self, link_strategy, flow_strategy, spine=2, leaf=3, host_per_leaf=3, **kwargs
+        self,
+        link_strategy,
+        flow_strategy,
+        spine=2,
+        leaf=3,
+        host_per_leaf=3,
+        workers=1,
+        pattern=None,
+        concurrent=False,
+        link_attributes=None,
+        **kwargs,
     ):
         self.output = link_strategy.get_output()
         self.link_strategy = link_strategy
@@ -56,6 +205,10 @@ class SpineLeafBuilder(NetworkBuilder):
         self.num_spine_switches = spine
         self.num_leaf_switches = leaf
         self.host_per_leaf = host_per_leaf
+        self.workers = workers
+        self.pattern = pattern
+        self.concurrent = concurrent
+        self.link_attributes = link_attributes
         self.kwargs = kwargs
         self.switch_set = set()
         self.host_set = set()
@@ -64,8 +217,7 @@ class SpineLeafBuilder(NetworkBuilder):
     def construct(self, **kwargs):
         self.build_nodes()
         self.build_switches()
-        self.build_links(**kwargs)
-        self.build_flow(**kwargs)
+        self.build_links_and_flow(**kwargs)
         return f"Spine-Leaf topology generated.\n"
 
     @log_write
@@ -97,28 +249,40 @@ class SpineLeafBuilder(NetworkBuilder):
 
     @log_write
     def build_links(self, **kwargs):
-        LevelConnector.START(
-            self.link_strategy,
-            self.num_spine_switches,
-            **kwargs,
-        ).connectTo(
-            FullMeshConnector,
-            self.num_leaf_switches,
-        ).connectTo(
-            OneOverGroupConnector,
-            self.num_leaf_switches * self.host_per_leaf,
-        ).END()
+        self.connect_levels(self.link_strategy, self.workers, **kwargs)
 
         return f"Spine leaf links generated.\n"
 
-    def build_flow(self, **kwargs):
-        output = self.flow_strategy.get_output()
-        output.write(f"{len(self.host_set) * (len(self.host_set) - 1)}\n")
+    def levels(self):
+        return [
+            ("spine", self.num_spine_switches),
+            ("leaf", self.num_leaf_switches),
+            (HOST, self.num_leaf_switches * self.host_per_leaf),
+        ]
+
+    def chain(self):
+        return [
+            (FullMeshConnector, 1),
+            (OneOverGroupConnector, 1),
+        ]
+
+    def degrees(self):
+        return {
+            ("spine", "leaf"): self.num_leaf_switches,
+            ("leaf", "spine"): self.num_spine_switches,
+            ("leaf", HOST): self.host_per_leaf,
+            (HOST, "leaf"): 1,
+        }
+
+    def host_distances(self):
+        return {
+            0: 1,
+            2: self.host_per_leaf - 1,
+            4: (self.num_leaf_switches - 1) * self.host_per_leaf,
+        }
 
-        for src in self.host_set:
-            for dst in self.host_set:
-                if src != dst:
-                    self.flow_strategy.flow(src, dst, **kwargs)
+    def build_flow(self, **kwargs):
+        self.write_flows(self.host_set, **kwargs)
 
         return f"Flows generated.\n"
 
@@ -131,12 +295,18 @@ and host per edge switches to generate the topology.
 
 
 class FatTreeBuilder(NetworkBuilder):
+    PARAMETERS = {"k": "k", "host_per_edge": "host"}
+
     def __init__(
         self,
         link_strategy,
         flow_strategy,
         k=4,
         host_per_edge=3,
+        workers=1,
+        pattern=None,
+        concurrent=False,
+        link_attributes=None,
         **kwargs,
     ):
         self.output = link_strategy.get_output()
@@ -147,6 +317,10 @@ class FatTreeBuilder(NetworkBuilder):
         self.num_edge_switches = k**2 // 2
         self.host_per_edge = host_per_edge
         self.k = k
+        self.workers = workers
+        self.pattern = pattern
+        self.concurrent = concurrent
+        self.link_attributes = link_attributes
         self.kwargs = kwargs
         self.swtich_set = set()
         self.host_set = set()
@@ -155,8 +329,7 @@ class FatTreeBuilder(NetworkBuilder):
     def construct(self, **kwargs):
         self.build_nodes()
         self.build_switches()
-        self.build_links(**kwargs)
-        self.build_flow(**kwargs)
+        self.build_links_and_flow(**kwargs)
 
         return f"Fat Tree topology generated.\n"
 
@@ -190,36 +363,43 @@ class FatTreeBuilder(NetworkBuilder):
 
         return f"Switches generated.\n"
 
-    @log_write
-    def build_links(self, **kwargs):
-        LevelConnector.START(
-            self.link_strategy,
-            self.num_core_switches,
-            **kwargs,
-        ).connectTo(
-            OneOverStepConnector,
-            self.num_agg_switches,
-            self.k,
-        ).connectTo(
-            GroupOverGroupConnector,
-            self.num_edge_switches,
-            self.k,
-        ).connectTo(
-            OneOverGroupConnector,
-            self.num_edge_switches * self.host_per_edge,
-        ).END()
-
-        return f"Links generated.\n"
+    def levels(self):
+        return [
+            ("core", self.num_core_switches),
+            ("aggregation", self.num_agg_switches),
+            ("edge", self.num_edge_switches),
+            (HOST, self.num_edge_switches * self.host_per_edge),
+        ]
+
+    def chain(self):
+        return [
+            (OneOverStepConnector, self.k),
+            (GroupOverGroupConnector, self.k),
+            (OneOverGroupConnector, 1),
+        ]
+
+    def degrees(self):
+        return {
+            ("core", "aggregation"): self.k,
+            ("aggregation", "core"): self.k // 2,
+            ("aggregation", "edge"): self.k // 2,
+            ("edge", "aggregation"): self.k // 2,
+            ("edge", HOST): self.host_per_edge,
+            (HOST, "edge"): 1,
+        }
+
+    # the first host shares its edge switch, then its pod, with the others
+    def host_distances(self):
+        return {
+            0: 1,
+            2: self.host_per_edge - 1,
+            4: (self.k // 2 - 1) * self.host_per_edge,
+            6: (self.k - 1) * (self.k // 2) * self.host_per_edge,
+        }
 
     @log_write
     def build_flow(self, **kwargs):
-        output = self.flow_strategy.get_output()
-        output.write(f"{len(self.host_set) * (len(self.host_set) - 1)}\n")
-
-        for src in self.host_set:
-            for dst in self.host_set:
-                if src != dst:
-                    self.flow_strategy.flow(src, dst, **kwargs)
+        self.write_flows(self.host_set, **kwargs)
 
 
 """
@@ -230,17 +410,27 @@ to generate the topology.
 
 
 class BCubeBuilder(NetworkBuilder):
+    PARAMETERS = {"n": "n"}
+
     def __init__(
         self,
         link_strategy,
         flow_strategy,
         n=4,
+        workers=1,
+        pattern=None,
+        concurrent=False,
+        link_attributes=None,
         **kwargs,
     ):
         self.output = link_strategy.get_output()
         self.link_strategy = link_strategy
         self.flow_strategy = flow_strategy
         self.n = n
+        self.workers = workers
+        self.pattern = pattern
+        self.concurrent = concurrent
+        self.link_attributes = link_attributes
         self.kwargs = kwargs
         self.one_level_switches = n
         self.total_switches = n * 2
@@ -252,8 +442,7 @@ class BCubeBuilder(NetworkBuilder):
     def construct(self, **kwargs):
         self.build_nodes()
         self.build_switches()
-        self.build_links(**kwargs)
-        self.build_flow(**kwargs)
+        self.build_links_and_flow(**kwargs)
         return f"BCube topology generated.\n"
 
     @log_write
@@ -290,32 +479,37 @@ class BCubeBuilder(NetworkBuilder):
 
         return f"Switches generated.\n"
 
-    @log_write
-    def build_links(self, **kwargs):
-        LevelConnector.START(
-            self.link_strategy,
-            self.one_level_switches,
-            **kwargs,
-        ).connectTo(
-            OneOverStepConnector,
-            self.total_hosts,
-            self.n,
-        ).connectTo(
-            GroupOverOneConnector,
-            self.one_level_switches,
-            self.n,
-        ).END()
-
-        return f"Links generated.\n"
+    def levels(self):
+        return [
+            ("top", self.one_level_switches),
+            (HOST, self.total_hosts),
+            ("bottom", self.one_level_switches),
+        ]
+
+    def chain(self):
+        return [
+            (OneOverStepConnector, self.n),
+            (GroupOverOneConnector, self.n),
+        ]
+
+    def degrees(self):
+        return {
+            ("top", HOST): self.n,
+            (HOST, "top"): 1,
+            (HOST, "bottom"): 1,
+            ("bottom", HOST): self.n,
+        }
+
+    # the first host shares its top switch with n - 1 hosts and its bottom switch with n - 1 others
+    def host_distances(self):
+        return {0: 1, 2: 2 * (self.n - 1), 4: (self.n - 1) ** 2}
+
+    # the flows of a BCube are generated between the first n^2 node IDs
+    def flow_hosts(self):
+        return 0, self.total_hosts
 
     @log_write
     def build_flow(self, **kwargs):
-        output = self.flow_strategy.get_output()
-        output.write(f"{len(self.host_set) * (len(self.host_set) - 1)}\n")
-
-        for src in range(self.total_hosts):
-            for dst in range(self.total_hosts):
-                if src != dst:
-                    self.flow_strategy.flow(src, dst, **kwargs)
+        self.write_flows(range(self.total_hosts), **kwargs)
 
         return f"Flows generated.\n"
@@ -1,4 +1,15 @@
 from abc import ABC, abstractmethod
+import bz2
+import gzip
+import json
+import lzma
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import numpy as np
+import binary_format
 
 """
 OutputStrategy is an abstraction for data output.
@@ -11,23 +22,483 @@ class OutputStrategy(ABC):
     def write(self, data: str):
         pass
 
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    # output strategies can be used in a with block to close them deterministically
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 """
 FileOutputStrategy is for writing data to a file.
+Small writes are collected in memory and joined into one large write
+once buffer_size characters are pending.
 """
 
+DEFAULT_BUFFER_SIZE = 1 << 20
+
 
 class FileOutputStrategy(OutputStrategy):
-    def __init__(self, file_name: str = "output.txt"):
+    def __init__(
+        self, file_name: str = "output.txt", buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
         # open the file in write mode
         self.file = open(file_name, "w")
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.pending = 0
 
     def write(self, data):
-        self.file.write(data)
+        self.buffer.append(data)
+        self.pending += len(data)
+
+        if self.pending >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.buffer.clear()
+            self.pending = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    # close the file when the object is deleted, if it was not closed explicitly
+    def __del__(self):
+        if hasattr(self, "file"):
+            self.close()
+
+
+"""
+CompressedOutputStrategy is for writing data to a compressed file.
+Buffered chunks are handed over a bounded queue to a worker thread,
+which encodes and compresses them, so compression does not block the formatting thread.
+The stdlib codecs release the GIL while compressing.
+Subclasses implement open_stream for a specific codec, which is also used to read the files back.
+"""
+
+
+class CompressedOutputStrategy(FileOutputStrategy):
+    def __init__(
+        self,
+        file_name: str,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        queue_size: int = 4,
+    ):
+        self.file = self.open_stream(file_name, "wb")
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.pending = 0
+        self.error = None
+        self.chunks = queue.Queue(queue_size)
+        self.worker = threading.Thread(target=self.compress, daemon=True)
+        self.worker.start()
+
+    @staticmethod
+    @abstractmethod
+    def open_stream(file_name, mode):
+        pass
+
+    def compress(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                break
+            # keep draining the queue after an error so the writer never blocks
+            if self.error is None:
+                try:
+                    self.file.write(chunk.encode())
+                except Exception as error:
+                    self.error = error
+
+    def flush(self):
+        if self.buffer:
+            self.chunks.put("".join(self.buffer))
+            self.buffer.clear()
+            self.pending = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.chunks.put(None)
+            self.worker.join()
+            self.file.close()
+            if self.error is not None:
+                raise self.error
+
+
+class GzipOutputStrategy(CompressedOutputStrategy):
+    @staticmethod
+    def open_stream(file_name, mode):
+        if "w" in mode:
+            return gzip.open(file_name, mode, compresslevel=6)
+        return gzip.open(file_name, mode)
+
+
+class XzOutputStrategy(CompressedOutputStrategy):
+    @staticmethod
+    def open_stream(file_name, mode):
+        return lzma.open(file_name, mode)
+
+
+class Bz2OutputStrategy(CompressedOutputStrategy):
+    @staticmethod
+    def open_stream(file_name, mode):
+        return bz2.open(file_name, mode)
+
+
+"""
+BinaryOutputStrategy is for writing records in the binary format of binary_format.
+Text written before the first record is kept as the metadata of the file.
+The record type is set by the binary link or flow strategy,
+and the header is rewritten with the final record count on close.
+"""
+
+
+class BinaryOutputStrategy(OutputStrategy):
+    def __init__(
+        self, file_name: str = "output.bin", buffer_size: int = DEFAULT_BUFFER_SIZE
+    ):
+        self.file = open(file_name, "wb", buffering=buffer_size)
+        self.metadata = []
+        self.dtype = None
+        self.count = 0
+        self.started = False
+
+    def set_dtype(self, dtype):
+        if self.started and dtype != self.dtype:
+            raise ValueError("The record type cannot change after records are written.")
+        self.dtype = dtype
+
+    def write(self, data: str):
+        if self.started:
+            raise ValueError("Text can only be written before the first record.")
+        self.metadata.append(data)
+
+    def write_records(self, records):
+        if records.dtype != self.dtype:
+            raise ValueError(f"Expected {self.dtype} records, got {records.dtype}.")
+
+        if not self.started:
+            self.write_header()
+            self.started = True
+
+        self.file.write(records.tobytes())
+        self.count += len(records)
+
+    def write_header(self):
+        metadata = "".join(self.metadata).encode()
+        self.file.seek(0)
+        self.file.write(binary_format.pack_header(self.dtype, self.count, metadata))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            if self.dtype is not None:
+                self.write_header()
+            self.file.close()
+
+    def __del__(self):
+        if hasattr(self, "file"):
+            self.close()
+
+
+"""
+ShardedOutputStrategy splits a flow file into shards by source host or by start time,
+so every reader can load or memory-map only its part of the flows.
+
+bounds are the N + 1 edges of the N shards, host IDs with key="src" or seconds with key="start_time",
+and keys beyond the last edge go to the last shard.
+The first line of a text flow file, the flow count, and the text before the records of a binary file are the header.
+Every row after it is routed to its shard, text rows by parsing their numeric columns,
+and records by their src or start_time field, and spooled to a part file of its shard.
+
+On close, with single_file=False every shard becomes a flow file of its own, e.g. flow.0003.txt,
+with its own flow count line, or its own header for binary records.
+With single_file=True the shards are written one after the other into one flow file,
+which is the same as an unsharded file when the flows were generated in shard order.
+The manifest, e.g. flow.txt.manifest.json, lists the file, flow count, byte offset and size of the rows,
+key range and start time bounds of every shard.
+"""
+
+SOURCE = "src"
+START_TIME = "start_time"
+
+
+def shard_file_name(file_name, shard):
+    base, extension = os.path.splitext(file_name)
+    return f"{base}.{shard:04d}{extension}"
+
+
+def manifest_file_name(file_name):
+    return f"{file_name}.manifest.json"
+
+
+class ShardedOutputStrategy(OutputStrategy):
+    def __init__(
+        self,
+        file_name: str,
+        bounds,
+        key: str = SOURCE,
+        single_file: bool = False,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ):
+        self.file_name = file_name
+        # host IDs stay integers in the manifest
+        self.bounds = np.asarray(
+            bounds, dtype=np.int64 if key == SOURCE else np.float64
+        )
+        self.key = key
+        self.single_file = single_file
+        self.buffer_size = buffer_size
+
+        shards = len(self.bounds) - 1
+        if shards < 1:
+            raise ValueError("A sharded output needs at least one shard.")
+
+        self.directory = tempfile.mkdtemp(
+            dir=os.path.dirname(os.path.abspath(file_name))
+        )
+        self.parts = [
+            open(os.path.join(self.directory, f"{shard:08d}"), "wb", buffer_size)
+            for shard in range(shards)
+        ]
+        self.counts = np.zeros(shards, dtype=np.int64)
+        self.min_time = np.full(shards, np.inf)
+        self.max_time = np.full(shards, -np.inf)
+
+        self.dtype = None
+        self.header = []
+        self.in_header = True
+        self.tail = ""
+
+    def set_dtype(self, dtype):
+        self.dtype = dtype
+
+    def write(self, data: str):
+        if self.dtype is not None:
+            self.header.append(data)
+            return
+
+        data = self.tail + data
+        if self.in_header:
+            end = data.find("\n")
+            if end < 0:
+                self.tail = data
+                return
+            self.header.append(data[: end + 1])
+            self.in_header = False
+            data = data[end + 1 :]
+
+        # a row may be split between two writes
+        end = data.rfind("\n") + 1
+        self.tail = data[end:]
+        if end:
+            self.write_rows(data[:end])
+
+    def write_rows(self, text):
+        raw = text.encode()
+        ends = np.flatnonzero(np.frombuffer(raw, dtype=np.uint8) == ord("\n")) + 1
+        values = np.fromstring(text, dtype=np.float64, sep=" ")
+        if len(values) % len(ends):
+            raise ValueError("Sharded flow files need rows of numeric columns.")
+
+        columns = values.reshape(len(ends), -1)
+        keys = columns[:, 0] if self.key == SOURCE else columns[:, -1]
+        shards = self.shard_of(keys)
+        self.count(shards, columns[:, -1])
+
+        # write every run of rows of the same shard at once
+        starts = np.concatenate(([0], ends[:-1]))
+        runs = np.flatnonzero(np.diff(shards)) + 1
+        for first, stop in zip(
+            np.concatenate(([0], runs)).tolist(), np.append(runs, len(ends)).tolist()
+        ):
+            self.parts[shards[first]].write(raw[starts[first] : ends[stop - 1]])
+
+    def write_records(self, records):
+        shards = self.shard_of(records[self.key])
+        self.count(shards, records[START_TIME])
+
+        order = np.argsort(shards, kind="stable")
+        records, shards = records[order], shards[order]
+        edges = np.searchsorted(shards, np.arange(len(self.parts) + 1))
+        for shard, (first, stop) in enumerate(zip(edges[:-1], edges[1:])):
+            if stop > first:
+                self.parts[shard].write(records[first:stop].tobytes())
+
+    def shard_of(self, keys):
+        shards = np.searchsorted(self.bounds, keys, side="right") - 1
+        return np.clip(shards, 0, len(self.parts) - 1)
+
+    def count(self, shards, times):
+        self.counts += np.bincount(shards, minlength=len(self.parts))
+        np.minimum.at(self.min_time, shards, times)
+        np.maximum.at(self.max_time, shards, times)
+
+    def shard_name(self, shard):
+        return shard_file_name(self.file_name, shard)
+
+    """
+    This method returns the header of a file with count flows, before its rows.
+    """
+
+    def file_header(self, count=None):
+        metadata = "".join(self.header) if count is None else f"{count}\n"
+        if self.dtype is None:
+            return metadata.encode()
+        total = int(self.counts.sum()) if count is None else count
+        return binary_format.pack_header(self.dtype, total, metadata.encode())
+
+    def close(self):
+        if self.directory is None:
+            return
+
+        if self.tail:
+            raise ValueError("The last flow row is not terminated by a newline.")
+
+        for part in self.parts:
+            part.close()
+
+        shards = []
+        offset = 0
+        if self.single_file:
+            with open(self.file_name, "wb") as file:
+                header = self.file_header()
+                file.write(header)
+                offset = len(header)
+                for shard, part in enumerate(self.parts):
+                    with open(part.name, "rb") as rows:
+                        shutil.copyfileobj(rows, file)
+                    size = file.tell() - offset
+                    shards.append(self.shard_info(shard, self.file_name, offset, size))
+                    offset += size
+        else:
+            for shard, part in enumerate(self.parts):
+                name = self.shard_name(shard)
+                with open(name, "wb") as file, open(part.name, "rb") as rows:
+                    header = self.file_header(int(self.counts[shard]))
+                    file.write(header)
+                    shutil.copyfileobj(rows, file)
+                    size = file.tell() - len(header)
+                shards.append(self.shard_info(shard, name, len(header), size))
+
+        with open(manifest_file_name(self.file_name), "w") as file:
+            json.dump(
+                {"key": self.key, "flows": int(self.counts.sum()), "shards": shards},
+                file,
+                indent=2,
+            )
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory = None
+
+    def shard_info(self, shard, file_name, offset, size):
+        empty = self.counts[shard] == 0
+        return {
+            "file": os.path.basename(file_name),
+            "count": int(self.counts[shard]),
+            "offset": offset,
+            "size": size,
+            "first": self.bounds[shard].item(),
+            "stop": self.bounds[shard + 1].item(),
+            "min_time": None if empty else self.min_time[shard].item(),
+            "max_time": None if empty else self.max_time[shard].item(),
+        }
 
-    # close the file when the object is deleted
     def __del__(self):
-        self.file.close()
+        if getattr(self, "directory", None) is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+"""
+MemoryOutputStrategy keeps the written text and records in memory.
+It is used to generate flow shards in worker processes,
+and replay writes them to the real output in order.
+"""
+
+
+class MemoryOutputStrategy(OutputStrategy):
+    def __init__(self):
+        self.items = []
+        self.dtype = None
+
+    def set_dtype(self, dtype):
+        self.dtype = dtype
+
+    def write(self, data: str):
+        self.items.append(data)
+
+    def write_records(self, records):
+        self.items.append(records)
+
+    def replay(self, output):
+        text = []
+        for item in self.items:
+            if isinstance(item, str):
+                text.append(item)
+            else:
+                if text:
+                    output.write("".join(text))
+                    text.clear()
+                output.write_records(item)
+        if text:
+            output.write("".join(text))
+
+
+"""
+This function picks the output strategy from the file name extension.
+Files ending with .gz, .xz or .bz2 are compressed, any other file is written as plain text.
+"""
+
+COMPRESSED_OUTPUTS = {
+    ".gz": GzipOutputStrategy,
+    ".xz": XzOutputStrategy,
+    ".bz2": Bz2OutputStrategy,
+}
+
+
+def output_class(file_name: str):
+    for extension, cls in COMPRESSED_OUTPUTS.items():
+        if file_name.endswith(extension):
+            return cls
+
+    return FileOutputStrategy
+
+
+def open_output(file_name: str, buffer_size: int = DEFAULT_BUFFER_SIZE):
+    return output_class(file_name)(file_name, buffer_size)
+
+
+"""
+This function opens a file for reading in binary mode,
+decompressing it with the codec of its extension, so the readers accept every file the outputs write.
+"""
+
+
+def open_input(file_name: str):
+    cls = output_class(file_name)
+    if issubclass(cls, CompressedOutputStrategy):
+        return cls.open_stream(file_name, "rb")
+
+    return open(file_name, "rb")
+
+
+def is_compressed(file_name: str) -> bool:
+    return issubclass(output_class(file_name), CompressedOutputStrategy)
 
 
 """
@@ -0,0 +1,138 @@
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from output_strategy import OutputStrategy, DEFAULT_BUFFER_SIZE
+
+"""
+This module runs the link phase and the flow phase of a builder concurrently.
+
+The flow phase only needs the host IDs, so once build_switches has run,
+build_flow is forked into its own process while build_links keeps running in the calling process.
+The flow process writes through a QueueOutputStrategy, which sends its buffered chunks over a bounded queue,
+and a writer thread of the calling process writes them to the real flow output in order.
+So the output is byte-identical to running the phases one after the other,
+and the run takes about as long as the longer of the two phases.
+
+Where fork is not available, or other threads are running in the calling process,
+e.g. the writer threads of compressed outputs, the phases run one after the other instead.
+A forked child only gets the forking thread, so locks held by the others at the fork would never be released in it,
+and the phases cannot run in two threads either, as they share the log counters of the logger module.
+"""
+
+QUEUE_SIZE = 8
+POLL_SECONDS = 0.1
+
+
+"""
+QueueOutputStrategy sends the written text in chunks of about buffer_size characters,
+and the records as they are, over a queue. Closing it sends None.
+"""
+
+
+class QueueOutputStrategy(OutputStrategy):
+    def __init__(self, chunks, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.chunks = chunks
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.pending = 0
+        self.dtype = None
+
+    def set_dtype(self, dtype):
+        self.dtype = dtype
+
+    def write(self, data: str):
+        self.buffer.append(data)
+        self.pending += len(data)
+
+        if self.pending >= self.buffer_size:
+            self.flush()
+
+    def write_records(self, records):
+        self.flush()
+        self.chunks.put(records)
+
+    def flush(self):
+        if self.buffer:
+            self.chunks.put("".join(self.buffer))
+            self.buffer.clear()
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.chunks.put(None)
+
+
+def run_flow_phase(builder, chunks, kwargs):
+    output = QueueOutputStrategy(chunks)
+    # the builder is a forked copy, so the parent keeps its own flow output
+    builder.flow_strategy.output = output
+    try:
+        builder.build_flow(**kwargs)
+    finally:
+        output.close()
+
+
+"""
+This function writes the chunks of the flow process to the output until it closes its queue,
+and returns whether it did.
+Once the process is dead, the chunks it put just before it exited are drained from the queue,
+so a process that finished between two polls still gets all of its output written.
+"""
+
+
+def write_chunks(chunks, output, process):
+    while True:
+        try:
+            item = chunks.get(timeout=POLL_SECONDS)
+        except queue.Empty:
+            if process.is_alive():
+                continue
+            try:
+                item = chunks.get_nowait()
+            except queue.Empty:
+                return False
+
+        if item is None:
+            return True
+        if isinstance(item, str):
+            output.write(item)
+        else:
+            output.write_records(item)
+
+
+def can_fork():
+    return (
+        "fork" in multiprocessing.get_all_start_methods()
+        and threading.active_count() == 1
+    )
+
+
+def run_concurrently(builder, **kwargs):
+    if not can_fork():
+        builder.build_links(**kwargs)
+        builder.build_flow(**kwargs)
+        return
+
+    context = multiprocessing.get_context("fork")
+    chunks = context.Queue(QUEUE_SIZE)
+    process = context.Process(target=run_flow_phase, args=(builder, chunks, kwargs))
+    process.start()
+
+    with ThreadPoolExecutor(1) as executor:
+        written = executor.submit(
+            write_chunks, chunks, builder.flow_strategy.get_output(), process
+        )
+        try:
+            builder.build_links(**kwargs)
+            closed = written.result()
+        except BaseException:
+            process.terminate()
+            raise
+        finally:
+            process.join()
+
+    if process.exitcode != 0:
+        raise RuntimeError(f"Flow generation failed with exit code {process.exitcode}.")
+    if not closed:
+        raise RuntimeError("Flow generation ended without closing its output.")
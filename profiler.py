@@ -0,0 +1,145 @@
+import cProfile
+import time
+import tracemalloc
+from functools import wraps
+import network_builder
+import level_connector
+import output_strategy
+
+"""
+This module is the opt-in instrumentation layer of topogen --profile.
+
+enable() wraps the build phases of every NetworkBuilder, the run of every LevelConnector in the chain,
+and the write methods of every OutputStrategy, and disable() restores the original methods.
+Nothing is wrapped unless profiling is enabled, so there is no overhead when it is off.
+
+For every phase it records the call count, wall time, CPU time,
+and for builder phases and connectors the tracemalloc peak above the memory at the start of the call.
+Times and peaks of nested phases are included in the outer phase, e.g. construct includes build_links.
+"""
+
+BUILDER_PHASES = (
+    "construct",
+    "build_nodes",
+    "build_switches",
+    "build_links",
+    "build_flow",
+)
+OUTPUT_METHODS = ("write", "write_records", "flush", "close")
+
+
+class PhaseStats:
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = 0
+
+
+stats = {}
+originals = []
+memory_frames = []
+profile = None
+profile_output = None
+
+
+def all_classes(base):
+    classes = [base]
+    for cls in base.__subclasses__():
+        classes.extend(all_classes(cls))
+    return classes
+
+
+def targets():
+    for cls in all_classes(network_builder.NetworkBuilder):
+        for name in BUILDER_PHASES:
+            if name in cls.__dict__:
+                yield cls, name, name, True
+
+    yield level_connector.LevelConnector, "run", "connect", True
+
+    for cls in all_classes(output_strategy.OutputStrategy):
+        for name in OUTPUT_METHODS:
+            if name in cls.__dict__:
+                yield cls, name, name, False
+
+
+def start_memory():
+    current, peak = tracemalloc.get_traced_memory()
+    if memory_frames:
+        memory_frames[-1][1] = max(memory_frames[-1][1], peak)
+    memory_frames.append([current, current])
+    tracemalloc.reset_peak()
+
+
+def stop_memory():
+    current, peak = tracemalloc.get_traced_memory()
+    start, frame_peak = memory_frames.pop()
+    frame_peak = max(frame_peak, peak)
+    if memory_frames:
+        memory_frames[-1][1] = max(memory_frames[-1][1], frame_peak)
+    tracemalloc.reset_peak()
+    return frame_peak - start
+
+
+def instrument(func, label, track_memory):
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        name = f"{self.__class__.__name__}.{label}"
+        if track_memory:
+            start_memory()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            phase = stats.setdefault(name, PhaseStats())
+            phase.calls += 1
+            phase.wall += time.perf_counter() - wall
+            phase.cpu += time.process_time() - cpu
+            if track_memory:
+                phase.peak = max(phase.peak, stop_memory())
+
+    return wrapper
+
+
+def enable(profile_file=None):
+    global profile, profile_output
+
+    stats.clear()
+    for cls, name, label, track_memory in targets():
+        func = cls.__dict__[name]
+        originals.append((cls, name, func))
+        setattr(cls, name, instrument(func, label, track_memory))
+
+    tracemalloc.start()
+
+    if profile_file:
+        profile = cProfile.Profile()
+        profile_output = profile_file
+        profile.enable()
+
+
+def disable():
+    global profile
+
+    if profile is not None:
+        profile.disable()
+        profile.dump_stats(profile_output)
+        profile = None
+
+    tracemalloc.stop()
+    memory_frames.clear()
+
+    while originals:
+        cls, name, func = originals.pop()
+        setattr(cls, name, func)
+
+
+def print_summary():
+    print(f"{'phase':<44}{'calls':>10}{'wall s':>11}{'cpu s':>11}{'peak MB':>10}")
+    for name, phase in sorted(stats.items(), key=lambda item: -item[1].wall):
+        print(
+            f"{name:<44}{phase.calls:>10}{phase.wall:>11.4f}{phase.cpu:>11.4f}"
+            f"{phase.peak / (1 << 20):>10.2f}"
+        )
@@ -0,0 +1,108 @@
+import importlib
+
+"""
+This module is the registry of the pluggable classes of topogen, by kind and name:
+
+- builder: the NetworkBuilder subclasses selected with --topology, e.g. fat_tree,
+- link, flow: the LinkStrategy and FlowStrategy subclasses of every --format, e.g. binary,
+- output: the OutputStrategy subclass of every --format.
+  Formats written with FileOutputStrategy, like text, pick a compressed output by file extension instead.
+
+Every entry is a "module:attribute" reference, and its module is only imported when the entry is loaded,
+so the modules of unused builders and strategies are never imported.
+
+Other packages add entries without editing topogen through the entry point group of a kind,
+e.g. in their pyproject.toml:
+
+    [project.entry-points."network_builder.builders"]
+    dragonfly = "dragonfly_builder:DragonflyBuilder"
+
+Entry points are only discovered when a name is not built in, or when all names are listed.
+Entries can also be added at run time with register.
+"""
+
+BUILDER = "builder"
+LINK = "link"
+FLOW = "flow"
+OUTPUT = "output"
+
+ENTRY_POINT_GROUPS = {
+    BUILDER: "network_builder.builders",
+    LINK: "network_builder.link_strategies",
+    FLOW: "network_builder.flow_strategies",
+    OUTPUT: "network_builder.output_strategies",
+}
+
+REGISTRY = {
+    BUILDER: {
+        "spine_leaf": "network_builder:SpineLeafBuilder",
+        "fat_tree": "network_builder:FatTreeBuilder",
+        "bcube": "network_builder:BCubeBuilder",
+    },
+    LINK: {
+        "text": "link_strategy:DefaultLinkStrategy",
+        "binary": "link_strategy:BinaryLinkStrategy",
+    },
+    FLOW: {
+        "text": "flow_strategy:DefaultFlowStrategy",
+        "binary": "flow_strategy:BinaryFlowStrategy",
+    },
+    OUTPUT: {
+        "text": "output_strategy:FileOutputStrategy",
+        "binary": "output_strategy:BinaryOutputStrategy",
+    },
+}
+
+discovered = set()
+
+
+"""
+This function adds the entry points of a kind to the registry, once.
+Built-in names are not overridden.
+"""
+
+
+def discover(kind):
+    if kind in discovered:
+        return
+    discovered.add(kind)
+
+    from importlib.metadata import entry_points
+
+    for entry_point in entry_points(group=ENTRY_POINT_GROUPS[kind]):
+        REGISTRY[kind].setdefault(entry_point.name, entry_point.value)
+
+
+"""
+This function registers a class, or a "module:attribute" reference to one, under a name.
+"""
+
+
+def register(kind, name, target):
+    REGISTRY[kind][name] = target
+
+
+def has(kind, name):
+    if name not in REGISTRY[kind]:
+        discover(kind)
+    return name in REGISTRY[kind]
+
+
+def names(kind):
+    discover(kind)
+    return sorted(REGISTRY[kind])
+
+
+def load(kind, name):
+    if not has(kind, name):
+        raise ValueError(
+            f"Unknown {kind} {name}, expected one of {', '.join(names(kind))}."
+        )
+
+    target = REGISTRY[kind][name]
+    if isinstance(target, str):
+        module, _, attribute = target.partition(":")
+        target = getattr(importlib.import_module(module), attribute)
+        REGISTRY[kind][name] = target
+
+    return target
@@ -0,0 +1,188 @@
+import numpy as np
+
+"""
+This module precomputes the ECMP next-hop tables of a Topology,
+so a simulator can load its routes instead of computing them at startup.
+
+Hosts with the same neighbors, e.g. the hosts of one edge or leaf switch, have the same routes,
+so they form one destination group and the routes are computed once per group instead of once per host.
+The shortest-path distances to every group are computed by a BFS over the CSR adjacency,
+vectorized over the frontier of a whole batch of groups at a time.
+The next hops of a router to a group are its neighbors one hop closer to the group.
+
+Routers are the switches, and the hosts with more than one link, which relay traffic, e.g. in a BCube.
+Since groups of consecutive host IDs are usually routed the same way by a router,
+e.g. all hosts of a pod by a core switch, the table of every router is stored as runs of groups.
+
+The routing file has a "routers groups" line, then one line per group with its hosts,
+and one line per router: its ID, its run count, and one "first_group:next_hops" entry per run,
+where next_hops is a comma-separated list of node IDs,
+"*" if the router is a destination of the group or a neighbor of its hosts, and "-" if the group is unreachable.
+"""
+
+BATCH_ENTRIES = 1 << 22
+DIRECT = "*"
+UNREACHABLE = "-"
+
+
+"""
+This function returns the hosts of every destination group, ordered by their first host.
+"""
+
+
+def destination_groups(topology):
+    groups = {}
+    for host in topology.hosts.tolist():
+        key = tuple(sorted(topology.neighbors(host).tolist()))
+        groups.setdefault(key, []).append(host)
+
+    return [np.array(hosts, dtype=np.int64) for hosts in groups.values()]
+
+
+"""
+This function returns the hop distances of every node from each source as a (sources, nodes) array,
+with -1 for unreachable nodes.
+"""
+
+
+def bfs_distances(topology, sources):
+    sources = np.asarray(sources, dtype=np.int64)
+    degree = topology.degree()
+
+    distances = np.full((len(sources), topology.num_nodes), -1, dtype=np.int16)
+    rows = np.arange(len(sources))
+    distances[rows, sources] = 0
+    nodes = sources
+
+    level = 0
+    while len(nodes):
+        level += 1
+
+        # gather the neighbors of every (row, node) pair of the frontier
+        counts = degree[nodes]
+        total = int(counts.sum())
+        starts = np.repeat(topology.indptr[nodes] - np.cumsum(counts) + counts, counts)
+        neighbors = topology.indices[starts + np.arange(total)]
+        rows = np.repeat(rows, counts)
+
+        new = distances[rows, neighbors] < 0
+        rows, neighbors = rows[new], neighbors[new]
+        distances[rows, neighbors] = level
+
+        # every newly reached node once, instead of once per link reaching it
+        rows, nodes = np.nonzero(distances == level)
+
+    return distances
+
+
+class RoutingTable:
+    def __init__(self, topology):
+        self.topology = topology
+        self.groups = destination_groups(topology)
+
+        self.host_group = np.full(topology.num_nodes, -1, dtype=np.int64)
+        for group, hosts in enumerate(self.groups):
+            self.host_group[hosts] = group
+
+        degree = topology.degree()
+        routers = np.zeros(topology.num_nodes, dtype=bool)
+        routers[topology.switches] = True
+        routers[topology.hosts[degree[topology.hosts] > 1]] = True
+        self.routers = np.flatnonzero(routers)
+
+        self.compute()
+
+    """
+    This method computes the runs of every router, a batch of groups at a time.
+    Every next-hop set is hashed as the sum of random weights of its adjacency entries,
+    so the sets of a whole batch are compared as one integer array.
+    """
+
+    def compute(self):
+        topology = self.topology
+        rng = np.random.default_rng(0)
+        weights = rng.integers(1, 1 << 62, len(topology.indices), dtype=np.uint64)
+        direct = rng.integers(1, 1 << 62, len(self.routers), dtype=np.uint64)
+        unreachable = rng.integers(1, 1 << 62, len(self.routers), dtype=np.uint64)
+
+        degree = topology.degree()
+        owners = np.repeat(np.arange(topology.num_nodes), degree)
+        linked = np.flatnonzero(degree > 0)
+
+        batch = max(1, BATCH_ENTRIES // max(len(topology.indices), 1))
+        previous = None
+        runs = []
+
+        for first in range(0, len(self.groups), batch):
+            groups = self.groups[first : first + batch]
+            distances = bfs_distances(topology, [hosts[0] for hosts in groups])
+
+            closer = distances[:, topology.indices] == distances[:, owners] - 1
+            hashes = np.zeros((len(groups), topology.num_nodes), dtype=np.uint64)
+            if len(linked):
+                hashes[:, linked] = np.add.reduceat(
+                    np.where(closer, weights, 0), topology.indptr[linked], axis=1
+                )
+
+            own = distances[:, self.routers]
+            hashes = hashes[:, self.routers]
+            hashes = np.where(own <= 1, direct, hashes)
+            hashes = np.where(own < 0, unreachable, hashes)
+
+            # a run starts where the next hops of a router differ from the group before
+            changed = np.ones(hashes.shape, dtype=bool)
+            changed[1:] = hashes[1:] != hashes[:-1]
+            if previous is not None:
+                changed[0] = hashes[0] != previous
+            previous = hashes[-1]
+
+            for row, column in zip(*np.nonzero(changed)):
+                router = int(self.routers[column])
+                hops = self.hops(router, distances[row], closer[row])
+                runs.append((int(column), first + int(row), hops))
+
+        runs.sort(key=lambda run: run[:2])
+        self.run_routers = np.array([run[0] for run in runs], dtype=np.int64)
+        self.run_groups = np.array([run[1] for run in runs], dtype=np.int64)
+        self.run_hops = [run[2] for run in runs]
+        self.run_bounds = np.searchsorted(
+            self.run_routers, np.arange(len(self.routers) + 1)
+        )
+
+    def hops(self, router, distances, closer):
+        if distances[router] < 0:
+            return UNREACHABLE
+        if distances[router] <= 1:
+            return DIRECT
+
+        start, stop = self.topology.indptr[router], self.topology.indptr[router + 1]
+        hops = self.topology.indices[start:stop][closer[start:stop]]
+        return ",".join(map(str, sorted(hops.tolist())))
+
+    """
+    This method returns the next hops of a router to a host, as written in the routing file.
+    """
+
+    def next_hops(self, router, host):
+        column = int(np.searchsorted(self.routers, router))
+        start, stop = self.run_bounds[column], self.run_bounds[column + 1]
+        run = start + np.searchsorted(
+            self.run_groups[start:stop], self.host_group[host], side="right"
+        )
+        return self.run_hops[run - 1]
+
+    def write(self, output):
+        output.write(f"{len(self.routers)} {len(self.groups)}\n")
+
+        for group, hosts in enumerate(self.groups):
+            output.write(f"{group} {' '.join(map(str, hosts.tolist()))}\n")
+
+        for column, router in enumerate(self.routers.tolist()):
+            start, stop = self.run_bounds[column], self.run_bounds[column + 1]
+            entries = " ".join(
+                f"{group}:{self.run_hops[run]}"
+                for run, group in zip(
+                    range(start, stop), self.run_groups[start:stop].tolist()
+                )
+            )
+            output.write(f"{router} {stop - start} {entries}\n")
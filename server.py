@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+import artifact_cache
+import logger
+import topogen
+
+"""
+This module is the serve subcommand of topogen, a warm generation daemon:
+
+    python3 topogen.py serve --socket /tmp/network-builder.sock --jobs 4
+
+It listens on a Unix domain socket and serves generation requests from processes that are already running,
+so a sweep that launches thousands of generations does not pay the interpreter startup and imports every time.
+client.py sends the topogen command line of a request, e.g.
+
+    python3 client.py -t fat_tree --k 16 -tf topology.txt -ff flow.txt
+
+Every request is one JSON line {"argv": [...], "cwd": "..."}, answered by one JSON line
+{"status": "done" | "failed", "output": ..., "seconds": ..., "cached": ...},
+and a connection may send any number of requests, one after the other.
+
+Requests are parsed with the topogen parser and put on a bounded job queue,
+which makes clients wait once QUEUE_SIZE jobs are pending.
+--jobs workers take jobs from the queue and run them in a pool of forked processes, each in the working directory of its client.
+The output files of recently generated cacheable runs are kept in an in-memory LRU cache of --memory_cache MiB,
+and a request for the same run is answered by writing them out, without queueing a job.
+"""
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "network-builder.sock")
+QUEUE_SIZE = 64
+DEFAULT_MEMORY_CACHE = 1 << 10
+
+
+"""
+MemoryCache keeps the topology and flow files of recent runs, by their cache inputs,
+and evicts the least recently used runs once they hold more than max_bytes.
+"""
+
+
+class MemoryCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        artifacts = self.entries.get(key)
+        if artifacts is not None:
+            self.entries.move_to_end(key)
+        return artifacts
+
+    def put(self, key, artifacts):
+        size = sum(len(data) for data in artifacts.values())
+        if size > self.max_bytes:
+            return
+
+        if key in self.entries:
+            self.size -= sum(len(data) for data in self.entries.pop(key).values())
+        self.entries[key] = artifacts
+        self.size += size
+
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= sum(len(data) for data in evicted.values())
+
+
+"""
+This function parses the topogen command line of a request.
+It returns the arguments, or None and the usage or error text argparse printed.
+"""
+
+
+def parse_request(argv):
+    text = io.StringIO()
+    try:
+        with redirect_stdout(text), redirect_stderr(text):
+            return topogen.parse_args(argv), None
+    except SystemExit as exit:
+        return None, (exit.code or 0, text.getvalue())
+
+
+"""
+This function returns the in-memory cache key of a run, or None if it is not served from the cache.
+Runs with extra steps or outputs are always generated.
+"""
+
+
+def memory_key(args):
+    if args.no_cache or not topogen.cacheable(args):
+        return None
+    if args.clean or args.dry_run or args.profile:
+        return None
+    if args.routing_file or args.verify or args.link_load:
+        return None
+    return json.dumps(topogen.cache_inputs(args), sort_keys=True, default=str)
+
+
+def output_files(args, cwd):
+    return {
+        "topology": os.path.join(cwd, args.topo_file),
+        "flow": os.path.join(cwd, args.flow_file),
+    }
+
+
+def read_files(files):
+    artifacts = {}
+    for name, file_name in files.items():
+        with open(file_name, "rb") as file:
+            artifacts[name] = file.read()
+    return artifacts
+
+
+def write_files(files, artifacts):
+    for name, file_name in files.items():
+        # outputs may be hardlinked to disk cache entries
+        artifact_cache.replace_outputs(file_name)
+        with open(file_name, "wb") as file:
+            file.write(artifacts[name])
+
+
+"""
+This function tells if a server is listening on the socket path, a stale socket file refuses connections.
+"""
+
+
+def socket_in_use(socket_path):
+    if not os.path.exists(socket_path):
+        return False
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+
+"""
+This function runs one request in a worker process, as topogen would from the client's working directory.
+"""
+
+
+def run_job(argv, cwd):
+    os.chdir(cwd)
+    args = topogen.parse_args(argv)
+    logger.set_log_mode(args.log)
+
+    output = io.StringIO()
+    status = "done"
+    with redirect_stdout(output):
+        try:
+            topogen.run(args)
+        except SystemExit as exit:
+            if exit.code:
+                status = "failed"
+
+    return {"status": status, "output": output.getvalue()}
+
+
+class GenerationServer:
+    def __init__(
+        self, jobs=1, queue_size=QUEUE_SIZE, memory_cache=DEFAULT_MEMORY_CACHE
+    ):
+        self.jobs = jobs
+        self.queue_size = queue_size
+        self.cache = MemoryCache(memory_cache << 20)
+
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = None
+        self.executor = ProcessPoolExecutor(jobs, mp_context=context)
+
+    async def serve(self, socket_path):
+        self.queue = asyncio.Queue(self.queue_size)
+        workers = [asyncio.create_task(self.work()) for _ in range(self.jobs)]
+
+        # only a stale socket is removed, socket_in_use was checked before
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+        print(f"Serving on {socket_path} with {self.jobs} jobs.", flush=True)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            print("Server stopped.")
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.executor.shutdown(cancel_futures=True)
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    async def handle(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    response = await self.answer(request["argv"], request["cwd"])
+                except Exception as error:
+                    response = {"status": "failed", "output": repr(error)}
+
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def answer(self, argv, cwd):
+        start = time.perf_counter()
+        args, usage = parse_request(argv)
+        if args is None:
+            code, text = usage
+            return {"status": "failed" if code else "done", "output": text}
+
+        # the default file names have a timestamp, the job must write the same files
+        argv = argv + ["-tf", args.topo_file, "-ff", args.flow_file]
+        loop = asyncio.get_running_loop()
+        key = memory_key(args)
+        files = output_files(args, cwd)
+
+        artifacts = self.cache.get(key) if key else None
+        if artifacts is not None:
+            await loop.run_in_executor(None, write_files, files, artifacts)
+            output = f"Reused {args.topology} topology from memory.\n"
+            response = {"status": "done", "output": output, "cached": True}
+        else:
+            done = loop.create_future()
+            await self.queue.put((argv, cwd, done))
+            response = await done
+
+            # files larger than the whole cache are not read into memory at all
+            if key and response["status"] == "done":
+                size = sum(os.path.getsize(file_name) for file_name in files.values())
+                if size <= self.cache.max_bytes:
+                    artifacts = await loop.run_in_executor(None, read_files, files)
+                    self.cache.put(key, artifacts)
+
+        response["seconds"] = time.perf_counter() - start
+        return response
+
+    async def work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            argv, cwd, done = await self.queue.get()
+            try:
+                result = await loop.run_in_executor(self.executor, run_job, argv, cwd)
+                result["cached"] = False
+            except Exception as error:
+                result = {"status": "failed", "output": repr(error)}
+            finally:
+                self.queue.task_done()
+
+            if not done.cancelled():
+                done.set_result(result)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="topogen.py serve",
+        description="Serve generation requests of client.py over a Unix domain socket.",
+    )
+    parser.add_argument(
+        "-s",
+        "--socket",
+        type=str,
+        default=DEFAULT_SOCKET,
+        help="Path of the Unix domain socket.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of requests generated at the same time.",
+    )
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        default=QUEUE_SIZE,
+        help="Number of pending requests before clients have to wait.",
+    )
+    parser.add_argument(
+        "--memory_cache",
+        type=int,
+        default=DEFAULT_MEMORY_CACHE,
+        help="Size of the in-memory cache of generated files in MiB.",
+    )
+
+    args = parser.parse_args(argv)
+    if socket_in_use(args.socket):
+        print(f"A server is already listening on {args.socket}.")
+        sys.exit(1)
+
+    server = GenerationServer(args.jobs, args.queue_size, args.memory_cache)
+
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
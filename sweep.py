@@ -0,0 +1,248 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import logger
+import output_strategy
+import registry
+import topogen
+
+"""
+This module is the sweep subcommand of topogen:
+
+    python3 topogen.py sweep -t fat_tree --k 4:16:4 --host 1,2 --jobs 4 --pattern permutation --seed 1
+
+Every topology parameter takes a list (4,8,16) or an inclusive range (start:stop[:step]).
+The parameters of a topology are the topogen options in the PARAMETERS of its builder,
+so registered builders are swept like the built-in ones.
+The Cartesian product of the values is expanded into one generation job per configuration,
+and the jobs run in a process pool of --jobs workers.
+Any other option, e.g. --pattern or --format, is passed through to every job,
+which runs like topogen itself, with --routing_file, --verify, --link_load and --profile.
+The options of every job are checked by the topogen parser before any job starts,
+and the routing and profile files get one name per job, like the topology and flow files.
+
+Jobs are submitted largest first, by the host count of their plan, so a giant configuration starts early
+while the small ones keep the remaining workers busy, and results are collected as they complete.
+The manifest lists the output files of every job and is rewritten after each one finishes.
+Sharded flow files are listed by their shard manifest, and sized by all of their shard files.
+"""
+
+
+def parse_values(text):
+    values = []
+    for part in text.split(","):
+        if ":" in part:
+            bounds = [int(value) for value in part.split(":")]
+            start, stop = bounds[0], bounds[1]
+            step = bounds[2] if len(bounds) > 2 else 1
+            values.extend(range(start, stop + 1, step))
+        else:
+            values.append(int(part))
+    return values
+
+
+"""
+This function returns the topogen options that set the builder parameters of the topologies.
+"""
+
+
+def parameter_options(topologies):
+    options = []
+    for topology in topologies:
+        for option in registry.load(registry.BUILDER, topology).PARAMETERS.values():
+            if option not in options:
+                options.append(option)
+    return options
+
+
+def configurations(args):
+    for topology in args.topology:
+        names = parameter_options([topology])
+        values = [getattr(args, name) for name in names]
+        for combination in itertools.product(*values):
+            yield topology, dict(zip(names, combination))
+
+
+def job_file(topology, params, output_dir, kind, extension):
+    name = "_".join(f"{key}{value}" for key, value in params.items())
+    return os.path.join(output_dir, f"{topology}_{name}_{kind}{extension}")
+
+
+def job_argv(topology, params, output_dir, extension, extra):
+    topo_file = job_file(topology, params, output_dir, "topology", extension)
+    flow_file = job_file(topology, params, output_dir, "flow", extension)
+
+    argv = ["-t", topology, "-tf", topo_file, "-ff", flow_file, "--log", logger.QUIET]
+    for key, value in params.items():
+        argv += [f"--{key}", str(value)]
+
+    return argv + extra
+
+
+"""
+This function checks the options of a job with the topogen parser, which exits on an error,
+and returns its argv, with a routing and profile file of its own if they are written, and its options.
+"""
+
+
+def check_job(parser, topology, params, output_dir, extension, extra):
+    argv = job_argv(topology, params, output_dir, extension, extra)
+    args = topogen.parse_args(argv)
+    if args.clean or args.dry_run:
+        parser.error("--clean and --dry_run cannot be swept")
+
+    # the later option wins, so every job writes its own files
+    if args.routing_file:
+        routing_file = job_file(topology, params, output_dir, "routing", extension)
+        argv += ["--routing_file", routing_file]
+    if args.profile_output:
+        profile_file = job_file(topology, params, output_dir, "profile", ".prof")
+        argv += ["--profile_output", profile_file]
+
+    return argv, args
+
+
+"""
+This function returns the size of the flow output of a job,
+the sum of its shard files for a sharded flow file, which are listed in its manifest.
+"""
+
+
+def flow_bytes(args):
+    if args.flow_shards <= 1:
+        return os.path.getsize(args.flow_file)
+
+    manifest = output_strategy.manifest_file_name(args.flow_file)
+    with open(manifest) as file:
+        shards = json.load(file)["shards"]
+
+    directory = os.path.dirname(manifest)
+    files = {shard["file"] for shard in shards}
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+
+
+def run_job(argv):
+    args = topogen.parse_args(argv)
+    logger.set_log_mode(args.log)
+
+    start = time.perf_counter()
+    topogen.run(args)
+    seconds = time.perf_counter() - start
+
+    result = {
+        "topo_file": args.topo_file,
+        "flow_file": args.flow_file,
+        "topo_bytes": os.path.getsize(args.topo_file),
+        "flow_bytes": flow_bytes(args),
+        "seconds": seconds,
+    }
+    if args.flow_shards > 1:
+        result["flow_manifest"] = output_strategy.manifest_file_name(args.flow_file)
+    if args.routing_file:
+        result["routing_file"] = args.routing_file
+    if args.profile_output:
+        result["profile_file"] = args.profile_output
+
+    return result
+
+
+def write_manifest(file_name, entries):
+    with open(file_name, "w") as file:
+        json.dump(entries, file, indent=2)
+
+
+def main(argv):
+    # the parameter options depend on the topologies, so those are parsed first
+    topologies = argparse.ArgumentParser(add_help=False)
+    topologies.add_argument("-t", "--topology", nargs="+", default=["fat_tree"])
+    selected = topologies.parse_known_args(argv)[0].topology
+    known = [name for name in selected if registry.has(registry.BUILDER, name)]
+
+    parser = argparse.ArgumentParser(
+        prog="topogen.py sweep",
+        description="Generate every combination of the topology parameters in parallel.",
+    )
+    parser.add_argument(
+        "-t",
+        "--topology",
+        nargs="+",
+        default=["fat_tree"],
+        choices=registry.names(registry.BUILDER),
+        help="Topologies to sweep.",
+    )
+    defaults = topogen.make_parser()
+    for name in parameter_options(known):
+        parser.add_argument(
+            f"--{name}",
+            type=parse_values,
+            default=[defaults.get_default(name)],
+            help=f"Values of --{name}, as a list (4,8) or an inclusive range (4:16:4).",
+        )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of configurations generated in parallel.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        type=str,
+        default=f"sweep_{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}",
+        help="Directory of the generated files.",
+    )
+    parser.add_argument(
+        "--extension",
+        type=str,
+        default=".txt",
+        help="Extension of the generated files, e.g. .txt.gz to compress them.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Manifest file. Defaults to manifest.json in the output directory.",
+    )
+
+    args, extra = parser.parse_known_args(argv)
+
+    jobs = []
+    for topology, params in configurations(args):
+        argv, job_args = check_job(
+            parser, topology, params, args.output_dir, args.extension, extra
+        )
+        hosts = topogen.offline_builder(job_args).plan().num_hosts
+        jobs.append((hosts, topology, params, argv))
+    jobs.sort(key=lambda job: job[0], reverse=True)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest = args.manifest or os.path.join(args.output_dir, "manifest.json")
+    entries = []
+
+    with ProcessPoolExecutor(args.jobs) as executor:
+        futures = {
+            executor.submit(run_job, argv): (topology, params)
+            for _, topology, params, argv in jobs
+        }
+
+        for future in as_completed(futures):
+            topology, params = futures[future]
+            entry = {"topology": topology, "params": params}
+            try:
+                entry.update(future.result())
+                entry["status"] = "done"
+            # a job that exits, e.g. when --verify finds problems, fails on its own
+            except (Exception, SystemExit) as error:
+                entry["status"] = "failed"
+                entry["error"] = repr(error)
+
+            entries.append(entry)
+            write_manifest(manifest, entries)
+            print(f"{entry['status']}: {topology} {params}")
+
+    print(f"Wrote {len(entries)} configurations to {manifest}.")
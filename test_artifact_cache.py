@@ -0,0 +1,95 @@
+import os
+import stat
+import topogen
+from artifact_cache import ArtifactCache
+
+"""
+Tests of the artifact cache: misses, hits, in-place edits of cached outputs and eviction,
+and topogen runs through the cache against uncached runs.
+"""
+
+
+def write(file_name, text):
+    with open(file_name, "w") as file:
+        file.write(text)
+
+
+def read(file_name):
+    with open(file_name) as file:
+        return file.read()
+
+
+def test_store_then_fetch(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    key = cache.key(topology="fat_tree", k=4)
+    source = str(tmp_path / "topology.txt")
+    target = str(tmp_path / "fetched.txt")
+
+    assert not cache.fetch(key, {"topology": target})
+
+    write(source, "44 20 24\n")
+    cache.store(key, {"topology": source})
+
+    assert cache.fetch(key, {"topology": target})
+    assert read(target) == "44 20 24\n"
+    assert cache.key(topology="fat_tree", k=4) == key
+    assert cache.key(topology="fat_tree", k=6) != key
+
+
+def test_output_changed_in_place_is_a_miss(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    key = cache.key(topology="fat_tree")
+    source = str(tmp_path / "flow.txt")
+    write(source, "552\n")
+    cache.store(key, {"flow": source})
+
+    # e.g. an append by root, who is not stopped by the read-only mode
+    os.chmod(source, 0o644)
+    with open(source, "a") as file:
+        file.write("0 1 1024 100 1 0\n")
+
+    assert not cache.fetch(key, {"flow": str(tmp_path / "fetched.txt")})
+    assert not os.path.exists(cache.entry(key))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_bytes=250)
+    keys = []
+    for i in range(3):
+        source = str(tmp_path / f"flow{i}.txt")
+        write(source, str(i) * 100)
+        keys.append(cache.key(run=i))
+        cache.store(keys[-1], {"flow": source})
+        # older runs are less recently used, whatever the timestamp resolution
+        os.utime(cache.entry(keys[-1]), (i, i))
+
+    target = {"flow": str(tmp_path / "fetched.txt")}
+    assert not cache.fetch(keys[0], target)
+    assert cache.fetch(keys[2], target)
+
+
+def test_cached_run_is_byte_identical(tmp_path, capsys):
+    files = []
+    for run in ("first", "cached", "uncached"):
+        topo_file = str(tmp_path / f"{run}_topology.txt")
+        flow_file = str(tmp_path / f"{run}_flow.txt")
+        argv = ["-t", "fat_tree", "--k", "4", "-tf", topo_file, "-ff", flow_file]
+        argv += ["--cache_dir", str(tmp_path / "cache"), "--log", "quiet"]
+        if run == "uncached":
+            argv.append("--no_cache")
+        topogen.run(topogen.parse_args(argv))
+        files.append((read(topo_file), read(flow_file)))
+        assert ("Reused cached" in capsys.readouterr().out) == (run == "cached")
+
+    assert files[0] == files[1] == files[2]
+
+
+def test_device_outputs_are_neither_removed_nor_cached(tmp_path):
+    cache_dir = tmp_path / "cache"
+    for _ in range(2):
+        argv = ["-t", "fat_tree", "--k", "4", "-tf", os.devnull]
+        argv += ["-ff", str(tmp_path / "flow.txt"), "--cache_dir", str(cache_dir)]
+        topogen.run(topogen.parse_args(argv + ["--log", "quiet"]))
+
+    assert stat.S_ISCHR(os.stat(os.devnull).st_mode)
+    assert os.listdir(cache_dir) == []
@@ -0,0 +1,59 @@
+import os
+import numpy as np
+import pytest
+import flow_strategy
+import topogen
+from flow_strategy import RUN_DTYPE, merge_runs
+
+"""
+Tests of the Poisson flow arrivals: the k-way merge of the spilled runs,
+and flow files in start time order whatever the merge batch.
+"""
+
+
+def save_runs(tmp_path, rng, sizes):
+    files = []
+    for i, size in enumerate(sizes):
+        run = np.zeros(size, dtype=RUN_DTYPE)
+        run["src"] = i
+        run["dst"] = np.arange(size)
+        run["initial_time"] = np.sort(rng.random(size))
+        files.append(str(tmp_path / f"{i:08d}.npy"))
+        np.save(files[-1], run)
+    return files
+
+
+@pytest.mark.parametrize("batch", [1, 3, 1000])
+def test_merge_runs_orders_all_flows_by_time(tmp_path, batch):
+    files = save_runs(tmp_path, np.random.default_rng(1), [40, 0, 17, 25])
+    runs = np.concatenate([np.load(file_name) for file_name in files])
+
+    merged = np.concatenate(list(merge_runs(files, batch)))
+
+    assert np.array_equal(merged, runs[np.argsort(runs["initial_time"])])
+
+
+def generate(tmp_path, name):
+    flow_file = str(tmp_path / name)
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir(exist_ok=True)
+    topo_file = str(tmp_path / "topology.txt")
+    argv = ["-t", "fat_tree", "--k", "6", "-tf", topo_file, "-ff", flow_file]
+    argv += ["--arrivals", "poisson", "--seed", "1", "--spill_dir", str(spill_dir)]
+    topogen.run(topogen.parse_args(argv + ["--no_cache", "--log", "quiet"]))
+
+    assert os.listdir(spill_dir) == []
+    with open(flow_file) as file:
+        return file.read()
+
+
+def test_poisson_flows_are_written_in_start_time_order(tmp_path, monkeypatch):
+    expected = generate(tmp_path, "flow.txt")
+    monkeypatch.setattr(flow_strategy, "MERGE_FLOWS", 7)
+
+    count, *rows = generate(tmp_path, "merged.txt").splitlines()
+    times = [float(row.split()[-1]) for row in rows]
+
+    assert int(count) == len(rows) == 54 * 53
+    assert times == sorted(times)
+    assert "\n".join([count, *rows]) + "\n" == expected
@@ -0,0 +1,45 @@
+import numpy as np
+import link_load
+import topogen
+import topology_loader
+
+"""
+Tests of the ECMP link load estimation against the loads of a fat tree worked out by hand,
+and of its worker pool against a single process.
+"""
+
+PAYLOAD = 1024
+
+
+def generate(tmp_path, k):
+    topo_file = str(tmp_path / "topology.txt")
+    flow_file = str(tmp_path / "flow.txt")
+    argv = ["-t", "fat_tree", "--k", str(k), "-tf", topo_file, "-ff", flow_file]
+    topogen.run(topogen.parse_args(argv + ["--no_cache", "--log", "quiet"]))
+    return topology_loader.load_topology(topo_file), flow_file
+
+
+def test_flow_between_pods_is_split_evenly(tmp_path):
+    topology, _ = generate(tmp_path, 4)
+    src, dst = topology.hosts[0], topology.hosts[-1]
+
+    loads = link_load.link_loads(topology, [src], [dst], [PAYLOAD])
+
+    # host and edge links carry it whole, the 2 aggregation switches half each,
+    # and the 4 core switches a quarter each, on the way up and down
+    sent = np.sort(loads[loads > 0])
+    expected = [PAYLOAD / 4] * 8 + [PAYLOAD / 2] * 4 + [PAYLOAD] * 2
+    assert sent.tolist() == expected
+    assert loads.sum() == 6 * PAYLOAD
+
+
+def test_workers_match_single_process(tmp_path, monkeypatch):
+    topology, flow_file = generate(tmp_path, 6)
+    src, dst, payload, _ = link_load.load_flows(flow_file)
+    # small batches, so the groups are spread over the workers
+    monkeypatch.setattr(link_load, "BATCH_ENTRIES", len(topology.indices))
+
+    single = link_load.link_loads(topology, src, dst, payload)
+    pooled = link_load.link_loads(topology, src, dst, payload, workers=2)
+
+    assert np.allclose(pooled, single)
@@ -0,0 +1,161 @@
+import json
+import pytest
+import output_strategy
+import topogen
+from output_strategy import START_TIME, FileOutputStrategy, ShardedOutputStrategy
+
+"""
+Tests of the output strategies: buffering and closing of plain files,
+compressed files, which are read back with open_input,
+and flow files split into shards, against unsharded ones.
+"""
+
+COMPRESSED = [".gz", ".xz", ".bz2"]
+
+
+def test_file_output_buffers_until_buffer_size(tmp_path):
+    file_name = tmp_path / "out.txt"
+    output = FileOutputStrategy(str(file_name), buffer_size=8)
+
+    output.write("abc")
+    assert file_name.read_text() == ""
+
+    output.write("defgh")
+    assert file_name.read_text() == "abcdefgh"
+
+    output.write("ij")
+    output.close()
+    assert file_name.read_text() == "abcdefghij"
+
+
+def test_file_output_is_byte_identical_for_any_buffer_size(tmp_path):
+    rows = [f"{i} {i + 1} 100Gbps 0.001ms 0\n" for i in range(1000)]
+
+    contents = []
+    for buffer_size in (1, 64, 1 << 20):
+        file_name = tmp_path / f"out_{buffer_size}.txt"
+        with FileOutputStrategy(str(file_name), buffer_size) as output:
+            for row in rows:
+                output.write(row)
+        contents.append(file_name.read_bytes())
+
+    assert contents[0] == "".join(rows).encode()
+    assert contents[0] == contents[1] == contents[2]
+
+
+def test_file_output_closes_on_error(tmp_path):
+    file_name = tmp_path / "out.txt"
+    with pytest.raises(RuntimeError):
+        with FileOutputStrategy(str(file_name)) as output:
+            output.write("partial\n")
+            raise RuntimeError("generation failed")
+
+    assert output.file.closed
+    assert file_name.read_text() == "partial\n"
+
+
+def test_open_output_picks_plain_file(tmp_path):
+    with output_strategy.open_output(str(tmp_path / "out.txt")) as output:
+        assert type(output) is FileOutputStrategy
+
+
+@pytest.mark.parametrize("extension", COMPRESSED)
+def test_compressed_output_round_trips(tmp_path, extension):
+    rows = "".join(f"{i} {i + 1} 1024 100 1 0\n" for i in range(5000))
+    file_name = str(tmp_path / f"flow.txt{extension}")
+
+    with output_strategy.open_output(file_name, buffer_size=1000) as output:
+        assert isinstance(output, output_strategy.CompressedOutputStrategy)
+        for start in range(0, len(rows), 777):
+            output.write(rows[start : start + 777])
+
+    with output_strategy.open_input(file_name) as file:
+        assert file.read() == rows.encode()
+
+
+def test_compressed_output_raises_writer_errors_on_close(tmp_path):
+    output = output_strategy.open_output(str(tmp_path / "flow.txt.gz"), buffer_size=1)
+
+    def fail(data):
+        raise OSError("disk full")
+
+    output.file.write = fail
+    output.write("0 1\n")
+    with pytest.raises(OSError, match="disk full"):
+        output.close()
+
+
+def generate(tmp_path, name, *argv):
+    flow_file = str(tmp_path / name)
+    argv = ["-t", "fat_tree", "--k", "4", "-ff", flow_file, *argv]
+    argv += ["-tf", str(tmp_path / "topology.txt"), "--no_cache", "--log", "quiet"]
+    topogen.run(topogen.parse_args(argv))
+    return flow_file
+
+
+def read_manifest(flow_file):
+    with open(output_strategy.manifest_file_name(flow_file)) as file:
+        return json.load(file)
+
+
+def test_flow_shards_split_the_unsharded_file(tmp_path):
+    unsharded = generate(tmp_path, "flow.txt")
+    sharded = generate(tmp_path, "sharded.txt", "--flow_shards", "3")
+    with open(unsharded) as file:
+        count, *rows = file.readlines()
+
+    manifest = read_manifest(sharded)
+    shard_rows = []
+    for shard in manifest["shards"]:
+        with open(tmp_path / shard["file"]) as file:
+            shard_count, *lines = file.readlines()
+        assert int(shard_count) == shard["count"] == len(lines)
+        assert all(
+            shard["first"] <= int(line.split()[0]) < shard["stop"] for line in lines
+        )
+        shard_rows += lines
+
+    assert len(manifest["shards"]) == 3
+    assert manifest["flows"] == int(count)
+    assert shard_rows == rows
+
+
+@pytest.mark.parametrize("format, extension", [("text", ".txt"), ("binary", ".bin")])
+def test_single_flow_file_is_byte_identical(tmp_path, format, extension):
+    argv = ["--format", format]
+    unsharded = generate(tmp_path, f"flow{extension}", *argv)
+    sharded = generate(
+        tmp_path,
+        f"single{extension}",
+        *argv,
+        "--flow_shards",
+        "3",
+        "--single_flow_file",
+    )
+
+    with open(unsharded, "rb") as expected, open(sharded, "rb") as file:
+        assert file.read() == expected.read()
+    assert sum(shard["count"] for shard in read_manifest(sharded)["shards"]) == 552
+
+
+def test_rows_split_between_writes_are_sharded_by_start_time(tmp_path):
+    file_name = str(tmp_path / "flow.txt")
+    rows = [f"{i} {i + 1} 1024 100 1 {i / 10}\n" for i in range(20)]
+    text = "20\n" + "".join(rows)
+
+    output = ShardedOutputStrategy(file_name, [0, 1, 2], key=START_TIME)
+    for start in range(0, len(text), 7):
+        output.write(text[start : start + 7])
+    output.close()
+
+    with open(output_strategy.shard_file_name(file_name, 0)) as file:
+        assert file.read() == "10\n" + "".join(rows[:10])
+    with open(output_strategy.shard_file_name(file_name, 1)) as file:
+        assert file.read() == "10\n" + "".join(rows[10:])
+
+
+def test_sharded_flow_file_cannot_be_compressed(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        generate(tmp_path, "flow.txt.gz", "--flow_shards", "3")
+
+    assert "cannot be compressed" in capsys.readouterr().err
@@ -0,0 +1,115 @@
+import os
+import queue
+import pytest
+import pipeline
+import topogen
+from flow_strategy import DefaultFlowStrategy
+from link_strategy import DefaultLinkStrategy
+from network_builder import FatTreeBuilder
+from output_strategy import MemoryOutputStrategy, open_input
+from topogen import CONSTRUCT_KWARGS
+
+"""
+Tests of the concurrent link and flow phases: their output against sequential runs,
+the writer of the flow chunks, and flow processes that fail or never close their output.
+"""
+
+needs_fork = pytest.mark.skipif(
+    not pipeline.can_fork(), reason="the flow phase runs in a forked process"
+)
+
+
+def read(file_name):
+    # compressed files are compared by content, their headers hold the file name
+    with open_input(file_name) as file:
+        return file.read()
+
+
+def generate(tmp_path, run, extension, *argv):
+    topo_file = str(tmp_path / f"{run}_topology.txt")
+    flow_file = str(tmp_path / f"{run}_flow.txt{extension}")
+    argv = ["-t", "fat_tree", "--k", "6", "-tf", topo_file, "-ff", flow_file, *argv]
+    topogen.run(topogen.parse_args(argv + ["--no_cache", "--log", "quiet"]))
+    return read(topo_file), read(flow_file)
+
+
+@pytest.mark.parametrize("extension", ["", ".gz"])
+@pytest.mark.parametrize("fork", [True, False])
+def test_concurrent_run_is_byte_identical(tmp_path, monkeypatch, extension, fork):
+    if fork and not pipeline.can_fork():
+        pytest.skip("the flow phase runs in a forked process")
+    if not fork:
+        monkeypatch.setattr(pipeline, "can_fork", lambda: False)
+
+    sequential = generate(tmp_path, "sequential", extension)
+    concurrent = generate(tmp_path, "concurrent", extension, "--concurrent")
+
+    assert concurrent == sequential
+
+
+class DeadProcess:
+    def is_alive(self):
+        return False
+
+
+"""
+RacyQueue times out on every blocking get, as a queue does when the flow process
+puts its last chunks just after the writer stopped waiting for them.
+"""
+
+
+class RacyQueue(queue.Queue):
+    def get(self, block=True, timeout=None):
+        if block:
+            raise queue.Empty
+        return super().get(False)
+
+
+def test_write_chunks_drains_queue_of_dead_process():
+    chunks = RacyQueue()
+    for i in range(50):
+        chunks.put(f"{i} {i + 1}\n")
+    chunks.put(None)
+    output = MemoryOutputStrategy()
+
+    assert pipeline.write_chunks(chunks, output, DeadProcess())
+    assert output.items == [f"{i} {i + 1}\n" for i in range(50)]
+
+
+def test_write_chunks_reports_unclosed_queue():
+    chunks = RacyQueue()
+    chunks.put("0 1\n")
+    output = MemoryOutputStrategy()
+
+    assert not pipeline.write_chunks(chunks, output, DeadProcess())
+    assert output.items == ["0 1\n"]
+
+
+def concurrent_builder():
+    return FatTreeBuilder(
+        DefaultLinkStrategy(MemoryOutputStrategy()),
+        DefaultFlowStrategy(MemoryOutputStrategy()),
+        k=4,
+        concurrent=True,
+    )
+
+
+@needs_fork
+def test_failed_flow_process_raises(monkeypatch):
+    builder = concurrent_builder()
+
+    def fail(**kwargs):
+        raise ValueError("flow generation failed")
+
+    monkeypatch.setattr(builder, "build_flow", fail)
+    with pytest.raises(RuntimeError, match="exit code 1"):
+        builder.construct(**CONSTRUCT_KWARGS)
+
+
+@needs_fork
+def test_flow_process_exiting_without_closing_raises(monkeypatch):
+    builder = concurrent_builder()
+    monkeypatch.setattr(pipeline, "run_flow_phase", lambda *args: os._exit(0))
+
+    with pytest.raises(RuntimeError, match="without closing"):
+        builder.construct(**CONSTRUCT_KWARGS)
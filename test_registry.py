@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import pytest
+import registry
+import topogen
+from network_builder import FatTreeBuilder
+
+"""
+Tests of the registry of pluggable classes, and of --builder_param,
+whose names are checked against the constructor of the selected builder.
+"""
+
+
+def test_topogen_imports_builders_lazily():
+    code = "import sys, topogen; print('network_builder' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "False"
+
+
+def test_unknown_name_raises():
+    with pytest.raises(ValueError, match="Unknown builder dragonfly"):
+        registry.load(registry.BUILDER, "dragonfly")
+
+
+class PodBuilder(FatTreeBuilder):
+    PARAMETERS = {"k": "k"}
+
+
+def test_registered_builder_generates(tmp_path, monkeypatch):
+    monkeypatch.setitem(registry.REGISTRY[registry.BUILDER], "pod", PodBuilder)
+    files = []
+    for topology in ("pod", "fat_tree"):
+        topo_file = tmp_path / f"{topology}_topology.txt"
+        flow_file = tmp_path / f"{topology}_flow.txt"
+        argv = ["-t", topology, "-tf", str(topo_file), "-ff", str(flow_file)]
+        topogen.run(topogen.parse_args(argv + ["--no_cache", "--log", "quiet"]))
+        files.append((topo_file.read_bytes(), flow_file.read_bytes()))
+
+    assert "pod" in registry.names(registry.BUILDER)
+    assert files[0] == files[1]
+
+
+def test_builder_param_sets_constructor_parameter():
+    args = topogen.parse_args(["-t", "fat_tree", "--builder_param", "host_per_edge=2"])
+
+    assert topogen.builder_params(args) == {"k": 4, "host_per_edge": 2}
+
+
+@pytest.mark.parametrize(
+    "item, message",
+    [
+        ("host_per_edge", "Expected NAME=VALUE"),
+        ("kk=3", "unknown --builder_param kk"),
+        ("workers=2", "unknown --builder_param workers"),
+    ],
+)
+def test_bad_builder_param_is_rejected(capsys, item, message):
+    with pytest.raises(SystemExit):
+        topogen.parse_args(["-t", "fat_tree", "--builder_param", item])
+
+    assert message in capsys.readouterr().err
@@ -0,0 +1,92 @@
+import json
+import multiprocessing
+import os
+import sys
+import pytest
+import sweep
+import topogen
+
+"""
+Tests of the sweep subcommand: its outputs against single topogen runs,
+sharded flow files, and jobs or options that fail.
+"""
+
+SEED = ["--seed", "1"]
+
+
+def run_sweep(tmp_path, *argv):
+    output_dir = str(tmp_path / "sweep")
+    sweep.main(["-o", output_dir, "--jobs", "2", "--no_cache", *argv])
+    with open(os.path.join(output_dir, "manifest.json")) as file:
+        entries = json.load(file)
+    return output_dir, sorted(entries, key=lambda entry: str(entry["params"]))
+
+
+def read(file_name):
+    with open(file_name, "rb") as file:
+        return file.read()
+
+
+def test_sweep_matches_single_runs(tmp_path):
+    _, entries = run_sweep(
+        tmp_path, "-t", "fat_tree", "--k", "4,6", "--pattern", "permutation", *SEED
+    )
+    entries += run_sweep(tmp_path, "-t", "bcube", "--n", "3", *SEED)[1]
+    assert [entry["status"] for entry in entries] == ["done"] * 3
+
+    for entry in entries:
+        topo_file = str(tmp_path / "topology.txt")
+        flow_file = str(tmp_path / "flow.txt")
+        argv = ["-t", entry["topology"], "-tf", topo_file, "-ff", flow_file]
+        for name, value in entry["params"].items():
+            argv += [f"--{name}", str(value)]
+        if entry["topology"] == "fat_tree":
+            argv += ["--pattern", "permutation"]
+        topogen.run(topogen.parse_args(argv + [*SEED, "--no_cache", "--log", "quiet"]))
+
+        assert read(entry["topo_file"]) == read(topo_file)
+        assert read(entry["flow_file"]) == read(flow_file)
+        assert entry["flow_bytes"] == os.path.getsize(flow_file)
+
+
+def test_sweep_sizes_sharded_flow_files(tmp_path):
+    output_dir, entries = run_sweep(
+        tmp_path, "-t", "fat_tree", "--k", "4", "--flow_shards", "3"
+    )
+    (entry,) = entries
+
+    assert entry["status"] == "done"
+    with open(entry["flow_manifest"]) as file:
+        shards = json.load(file)["shards"]
+    sizes = [
+        os.path.getsize(os.path.join(output_dir, shard["file"])) for shard in shards
+    ]
+    assert len(shards) == 3
+    assert entry["flow_bytes"] == sum(sizes)
+
+
+def test_bad_option_fails_before_any_job(tmp_path):
+    with pytest.raises(SystemExit) as error:
+        sweep.main(["-o", str(tmp_path / "sweep"), "--k", "4,6", "--shard_by", "time"])
+
+    assert error.value.code == 2
+    assert not os.path.exists(tmp_path / "sweep")
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="the jobs must inherit the patched topogen.run",
+)
+def test_failed_job_does_not_stop_the_others(tmp_path, monkeypatch):
+    run = topogen.run
+
+    def exit_for_k6(args):
+        if args.k == 6:
+            sys.exit(1)
+        run(args)
+
+    monkeypatch.setattr(topogen, "run", exit_for_k6)
+    _, entries = run_sweep(tmp_path, "-t", "fat_tree", "--k", "4,6,8")
+
+    assert [entry["status"] for entry in entries] == ["done", "failed", "done"]
+    assert entries[1]["error"] == "SystemExit(1)"
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import topology_loader
+from flow_strategy import DefaultFlowStrategy
+from link_strategy import DefaultLinkStrategy
+from network_builder import BCubeBuilder, FatTreeBuilder, SpineLeafBuilder
+from output_strategy import FileOutputStrategy, MemoryOutputStrategy
+from topology import HOST
+from topogen import CONSTRUCT_KWARGS
+
+"""
+Tests of the in-memory Topology built by the builders against the topology file they write.
+"""
+
+BUILDERS = [
+    (SpineLeafBuilder, {"spine": 3, "leaf": 4, "host_per_leaf": 2}),
+    (FatTreeBuilder, {"k": 4, "host_per_edge": 3}),
+    (BCubeBuilder, {"n": 3}),
+]
+
+
+def build(tmp_path, cls, params):
+    file_name = str(tmp_path / "topology.txt")
+    with FileOutputStrategy(file_name) as output:
+        builder = cls(
+            DefaultLinkStrategy(output),
+            DefaultFlowStrategy(MemoryOutputStrategy()),
+            **params,
+        )
+        builder.construct(**CONSTRUCT_KWARGS)
+    return builder, file_name
+
+
+@pytest.mark.parametrize("cls, params", BUILDERS)
+def test_topology_matches_topology_file(tmp_path, cls, params):
+    builder, file_name = build(tmp_path, cls, params)
+    topology = builder.build_topology(**CONSTRUCT_KWARGS)
+    loaded = topology_loader.load_topology(file_name)
+
+    assert topology.num_nodes == loaded.num_nodes
+    assert np.array_equal(topology.src, loaded.src)
+    assert np.array_equal(topology.dst, loaded.dst)
+    assert np.array_equal(topology.hosts, loaded.hosts)
+    assert len(topology.hosts) == sum(
+        count for name, count in builder.levels() if name == HOST
+    )
+
+
+@pytest.mark.parametrize("cls, params", BUILDERS)
+def test_adjacency_lists_every_link_both_ways(tmp_path, cls, params):
+    builder, _ = build(tmp_path, cls, params)
+    topology = builder.build_topology(**CONSTRUCT_KWARGS)
+
+    expected = [[] for _ in range(topology.num_nodes)]
+    for link, (src, dst) in enumerate(
+        zip(topology.src.tolist(), topology.dst.tolist())
+    ):
+        expected[src].append((dst, link))
+        expected[dst].append((src, link))
+
+    for node in range(topology.num_nodes):
+        start, stop = topology.indptr[node], topology.indptr[node + 1]
+        entries = zip(
+            topology.indices[start:stop].tolist(),
+            topology.edge_ids[start:stop].tolist(),
+        )
+        assert sorted(entries) == sorted(expected[node])
+
+    assert topology.degree().sum() == 2 * topology.num_links
@@ -1,9 +1,9 @@
 import argparse
-import network_builder
-import link_strategy
 import output_strategy
-import flow_strategy
+import registry
+import logger
 import os
+import sys
 import glob
 from datetime import datetime
 
@@ -13,6 +13,7 @@ File names
 
 TOPO_FILENAME = "topology.txt"
 FLOW_FILENAME = "flow.txt"
+OUTPUT_BUFFER_SIZE = output_strategy.DEFAULT_BUFFER_SIZE
 
 """
 Spine-Leaf topology parameters
@@ -48,61 +49,512 @@ SWITCH_TO_HOST_BANDWIDTH = "100Gbps"
 SWITCH_TO_HOST_DELAY = "0.001ms"
 SWITCH_TO_HOST_ERROR_RATE = "0"
 
+"""
+Link and flow attributes passed to construct()
+"""
+
+CONSTRUCT_KWARGS = {
+    "bandwidth": "100Gbps",
+    "delay": "0.001ms",
+    "error_rate": "0",
+    "payload": 1024,
+    "initial_time": 0,
+    "pfc_priority": 1,
+    "port": 100,
+}
+
+"""
+Version of the generated files, part of the cache key
+"""
+
+GENERATOR_VERSION = "1.0"
+
 
-def generate_spine_leaf(
-    link,
-    flow,
-    spine=SPINE_SWITCHES,
-    leaf=LEAF_SWITCHES,
-    host=HOSTS_PER_LEAF,
-):
+"""
+This function returns the constructor parameters of the selected builder,
+from the topogen options in its PARAMETERS and from --builder_param.
+"""
 
-    network_builder.SpineLeafBuilder(link, flow, spine, leaf, host).construct(
-        bandwidth="100Gbps",
-        delay="0.001ms",
-        error_rate="0",
-        payload=1024,
-        initial_time=0,
-        pfc_priority=1,
-        port=100,
+
+def builder_params(args):
+    cls = registry.load(registry.BUILDER, args.topology)
+    params = {
+        keyword: getattr(args, option) for keyword, option in cls.PARAMETERS.items()
+    }
+
+    for item in args.builder_param:
+        name, value = parse_builder_param(item)
+        params[name] = value
+
+    return params
+
+
+def parse_builder_param(item):
+    name, _, value = item.partition("=")
+    if not name or not value:
+        raise ValueError(f"Expected NAME=VALUE, got {item}.")
+    return name, parse_value(value)
+
+
+"""
+This function returns the constructor parameters of a builder class that --builder_param can set:
+its named parameters and the ones in its PARAMETERS,
+but not the strategies and the options topogen passes itself.
+"""
+
+BUILDER_ARGUMENTS = {
+    "self",
+    "link_strategy",
+    "flow_strategy",
+    "workers",
+    "pattern",
+    "concurrent",
+    "link_attributes",
+}
+
+
+def builder_param_names(cls):
+    import inspect
+
+    names = set(cls.PARAMETERS)
+    for name, parameter in inspect.signature(cls.__init__).parameters.items():
+        if parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY):
+            names.add(name)
+    return names - BUILDER_ARGUMENTS
+
+
+def parse_value(text):
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+"""
+This function creates the builder selected with --topology, writing with the given strategies.
+"""
+
+
+def make_builder(args, link, flow, **kwargs):
+    cls = registry.load(registry.BUILDER, args.topology)
+
+    return cls(
+        link,
+        flow,
+        **builder_params(args),
+        pattern=make_pattern(args),
+        link_attributes=make_link_attributes(args),
+        **kwargs,
     )
 
 
-def generate_fat_tree(
-    link,
-    flow,
-    k=FAT_TREE_K,
-    host=FAT_TREE_HOST_PER_EDGE,
-):
+"""
+This function creates the traffic pattern selected on the command line.
+"""
+
+
+def make_pattern(args):
+    import traffic_pattern
+
+    if args.pattern == "all_to_all":
+        return traffic_pattern.AllToAllPattern()
+    if args.pattern in ("incast", "outcast"):
+        return traffic_pattern.PATTERNS[args.pattern](
+            args.fan_in, args.receivers, seed=args.seed
+        )
+    if args.pattern == "random_k":
+        return traffic_pattern.RandomKPattern(args.flows_per_host, seed=args.seed)
+    if args.pattern == "hotspot":
+        return traffic_pattern.HotspotPattern(
+            args.flows_per_host, args.hot_fraction, args.hot_share, seed=args.seed
+        )
+    return traffic_pattern.PATTERNS[args.pattern](seed=args.seed)
 
-    network_builder.FatTreeBuilder(link, flow, k, host).construct(
-        bandwidth="100Gbps",
-        delay="0.001ms",
-        error_rate="0",
-        payload=1024,
-        initial_time=0,
-        pfc_priority=1,
-        port=100,
+
+"""
+This function creates the link attribute table from the command line,
+e.g. --link_attribute core-aggregation:bandwidth=400Gbps --oversubscription edge=3.
+"""
+
+
+def make_link_attributes(args):
+    if not args.link_attribute and not args.oversubscription:
+        return None
+
+    import link_attributes
+
+    levels = {}
+    roles = {}
+    for item in args.link_attribute:
+        name, _, assignment = item.partition(":")
+        attribute, _, value = assignment.partition("=")
+        if not name or not attribute or not value:
+            raise ValueError(f"Expected LEVEL:ATTRIBUTE=VALUE, got {item}.")
+
+        table = roles if name in link_attributes.ROLES else levels
+        table.setdefault(name, {})[attribute] = value
+
+    oversubscription = {}
+    for item in args.oversubscription:
+        name, _, ratio = item.partition("=")
+        try:
+            oversubscription[name] = float(ratio)
+        except ValueError:
+            raise ValueError(f"Expected LEVEL=RATIO, got {item}.")
+        if not name or oversubscription[name] <= 0:
+            raise ValueError(f"Expected LEVEL=RATIO with a positive ratio, got {item}.")
+
+    return link_attributes.LinkAttributes(levels, roles, oversubscription)
+
+
+"""
+This function creates the flow strategy writing to output,
+with Poisson arrivals and workload flow sizes if selected.
+Their runs are spilled next to the flow file unless --spill_dir is given.
+"""
+
+
+def make_flow_strategy(args, flow_cls, output):
+    flow = flow_cls(output, seed=args.seed)
+    if args.arrivals == "poisson":
+        from flow_strategy import PoissonFlowStrategy
+
+        spill_dir = args.spill_dir or os.path.dirname(os.path.abspath(args.flow_file))
+        flow = PoissonFlowStrategy(
+            flow,
+            args.workload,
+            args.load,
+            args.host_bandwidth,
+            seed=args.seed,
+            spill_dir=spill_dir,
+        )
+    return flow
+
+
+"""
+This function returns the link, flow and output classes of the output format.
+A format written to plain files picks the topology and flow outputs by their file extension.
+"""
+
+
+def strategy_classes(args):
+    link_cls = registry.load(registry.LINK, args.format)
+    flow_cls = registry.load(registry.FLOW, args.format)
+    output_cls = registry.load(registry.OUTPUT, args.format)
+
+    if output_cls is not output_strategy.FileOutputStrategy:
+        return link_cls, flow_cls, output_cls, output_cls
+
+    return (
+        link_cls,
+        flow_cls,
+        output_strategy.output_class(args.topo_file),
+        output_strategy.output_class(args.flow_file),
     )
 
 
-def generate_bcube(
-    link,
-    flow,
-    n=BCUBE_N,
-):
+"""
+This function returns the N + 1 shard bounds and the shard key of --flow_shards N shards,
+ranges of the hosts between the (first, stop) host IDs or --shard_window windows of start time.
+The host range defaults to the flow hosts of the builder.
+"""
+
+
+def shard_bounds(args, hosts=None):
+    shards = range(args.flow_shards + 1)
+    if args.shard_by == "time":
+        bounds = [args.shard_window * shard for shard in shards]
+        return bounds, output_strategy.START_TIME
+
+    first, stop = hosts or offline_builder(args).flow_hosts()
+    bounds = [first + (stop - first) * shard // args.flow_shards for shard in shards]
+    return bounds, output_strategy.SOURCE
+
+
+"""
+This function opens the flow output, split into --flow_shards shards if more than one.
+"""
+
+
+def open_flow_output(args, output_cls, hosts=None):
+    if args.flow_shards <= 1:
+        return output_cls(args.flow_file, args.buffer_size)
 
-    network_builder.BCubeBuilder(link, flow, n).construct(
-        bandwidth="100Gbps",
-        delay="0.001ms",
-        error_rate="0",
-        payload=1024,
-        initial_time=0,
-        pfc_priority=1,
-        port=100,
+    bounds, key = shard_bounds(args, hosts)
+    return output_strategy.ShardedOutputStrategy(
+        args.flow_file, bounds, key, args.single_flow_file, args.buffer_size
     )
 
 
+"""
+This function returns everything that determines the generated files, as the cache key.
+Worker count and buffer size do not change the output and are left out.
+"""
+
+
+def cache_inputs(args):
+    pattern = {
+        "pattern": args.pattern,
+        "seed": args.seed,
+        "flows_per_host": args.flows_per_host,
+        "fan_in": args.fan_in,
+        "receivers": args.receivers,
+        "hot_fraction": args.hot_fraction,
+        "hot_share": args.hot_share,
+        "arrivals": [args.arrivals, args.workload, args.load, args.host_bandwidth],
+    }
+
+    return {
+        "version": GENERATOR_VERSION,
+        "topology": args.topology,
+        "params": builder_params(args),
+        "kwargs": CONSTRUCT_KWARGS,
+        "link_attributes": [args.link_attribute, args.oversubscription],
+        "pattern": pattern,
+        "classes": [
+            f"{cls.__module__}.{cls.__qualname__}" for cls in strategy_classes(args)
+        ],
+    }
+
+
+"""
+Random traffic or Poisson arrivals without a seed differ on every run and are never cached.
+Neither are sharded flow files, which are more than one artifact.
+"""
+
+
+def cacheable(args):
+    if args.from_topology or args.flow_shards > 1:
+        return False
+    if args.arrivals == "poisson" and args.seed is None:
+        return False
+    return args.pattern == "all_to_all" or args.seed is not None
+
+
+"""
+This function only generates the flow file, for the hosts of an existing topology file.
+"""
+
+
+def generate_flows(args):
+    import artifact_cache
+    import topology_loader
+
+    print(f"Generating flows for {args.from_topology}...")
+
+    topology = topology_loader.load_topology(args.from_topology)
+    _, flow_cls, _, flow_output_cls = strategy_classes(args)
+
+    artifact_cache.replace_outputs(args.flow_file)
+
+    hosts = (int(topology.hosts.min()), int(topology.hosts.max()) + 1)
+    with open_flow_output(args, flow_output_cls, hosts) as flow_file:
+        flow = make_flow_strategy(args, flow_cls, flow_file)
+        make_pattern(args).generate(
+            flow, topology.hosts, args.workers, **CONSTRUCT_KWARGS
+        )
+
+
+"""
+This function prints the node, link and flow counts and the file sizes of a run without generating it.
+"""
+
+
+def dry_run(args):
+    builder = offline_builder(args)
+
+    plan = builder.plan()
+
+    print(f"Dry run of {args.topology} topology:")
+    print(plan.report(builder.link_strategy, builder.flow_strategy, **CONSTRUCT_KWARGS))
+
+    if args.flow_shards > 1:
+        bounds, key = shard_bounds(args, plan.flow_hosts)
+        print(
+            plan.shard_report(
+                builder.flow_strategy,
+                args.flow_file,
+                bounds,
+                key,
+                args.single_flow_file,
+                **CONSTRUCT_KWARGS,
+            )
+        )
+
+
+"""
+This function writes the ECMP routing tables of the topology to the routing file.
+"""
+
+
+def generate_routes(args):
+    import artifact_cache
+    import topology_loader
+    from routing import RoutingTable
+
+    print(f"Generating routes to {args.routing_file}...")
+
+    if args.from_topology:
+        topology = topology_loader.load_topology(args.from_topology)
+    else:
+        topology = offline_builder(args).build_topology(**CONSTRUCT_KWARGS)
+
+    artifact_cache.replace_outputs(args.routing_file)
+
+    with output_strategy.open_output(args.routing_file, args.buffer_size) as output:
+        RoutingTable(topology).write(output)
+
+
+"""
+This function checks the generated topology file against the builder spec.
+Compressed text files are decompressed into memory and loaded like the others.
+An existing topology given with --from_topology is only checked for bad links and connectivity.
+"""
+
+
+def verify_topology(args):
+    import topology_loader
+    from verifier import verify
+
+    builder = None
+    if args.from_topology:
+        file_name = args.from_topology
+    else:
+        builder = offline_builder(args)
+        file_name = args.topo_file
+
+    print(f"Verifying {file_name}...")
+    topology = topology_loader.load_topology(file_name)
+
+    problems = verify(topology, builder)
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+
+    print(f"Topology verified: {topology.num_nodes} nodes, {topology.num_links} links.")
+
+
+"""
+This function prints the ECMP load estimate of every link level for the generated flow file.
+The topology is rebuilt in memory, or loaded with its link attributes if given with --from_topology.
+"""
+
+
+def estimate_link_load(args):
+    import link_load
+    import topology_loader
+
+    print(f"Estimating link loads of {args.flow_file}...")
+
+    if args.from_topology:
+        topology = topology_loader.load_topology(args.from_topology, attributes=True)
+    else:
+        topology = offline_builder(args).build_topology(**CONSTRUCT_KWARGS)
+
+    src, dst, payload, start_time = link_load.load_flows(args.flow_file)
+    loads = link_load.link_loads(topology, src, dst, payload, args.workers)
+
+    window = args.load_window
+    if window is None and len(start_time):
+        window = float(start_time.max() - start_time.min()) or None
+
+    over = f" over {window:g}s" if window else ""
+    print(f"Link loads of {len(src)} flows, {int(payload.sum())} bytes{over}:")
+    print(
+        link_load.report(topology, loads, link_load.link_bandwidths(topology), window)
+    )
+
+
+"""
+This function creates a builder that writes nothing, to plan a run or to build its Topology.
+"""
+
+
+def offline_builder(args):
+    link_cls, flow_cls, _, _ = strategy_classes(args)
+    link = link_cls(output_strategy.MemoryOutputStrategy())
+    flow = make_flow_strategy(args, flow_cls, output_strategy.MemoryOutputStrategy())
+
+    return make_builder(args, link, flow)
+
+
+def generate(args):
+    import artifact_cache
+
+    if args.from_topology:
+        generate_flows(args)
+        return
+
+    cache = None
+    if not args.no_cache and cacheable(args):
+        cache = artifact_cache.ArtifactCache(args.cache_dir, args.cache_size << 20)
+        key = cache.key(**cache_inputs(args))
+        artifacts = {"topology": args.topo_file, "flow": args.flow_file}
+
+        if cache.fetch(key, artifacts):
+            print(f"Reused cached {args.topology} topology.")
+            return
+
+    print(f"Generating {args.topology} topology...")
+
+    link_cls, flow_cls, topo_output_cls, flow_output_cls = strategy_classes(args)
+
+    # remove old outputs first, they may be hardlinked to cache entries
+    artifact_cache.replace_outputs(args.topo_file, args.flow_file)
+
+    with topo_output_cls(
+        args.topo_file, args.buffer_size
+    ) as topo_file, open_flow_output(args, flow_output_cls) as flow_file:
+        flow = make_flow_strategy(args, flow_cls, flow_file)
+        builder = make_builder(
+            args,
+            link_cls(topo_file),
+            flow,
+            workers=args.workers,
+            concurrent=args.concurrent,
+        )
+        builder.construct(**CONSTRUCT_KWARGS)
+
+    if cache is not None:
+        cache.store(key, artifacts)
+
+
+"""
+This function runs everything the parsed arguments ask for, as topogen does from the command line.
+"""
+
+
+def run(args):
+    if args.clean:
+        clean_files()
+        return
+
+    if args.profile:
+        import profiler
+
+        profiler.enable(args.profile_output)
+
+    try:
+        if args.dry_run:
+            dry_run(args)
+            return
+
+        generate(args)
+        if args.routing_file:
+            generate_routes(args)
+        if args.verify:
+            verify_topology(args)
+        if args.link_load:
+            estimate_link_load(args)
+    finally:
+        if args.profile:
+            profiler.disable()
+            profiler.print_summary()
+
+
 def clean_files():
     txt_files = glob.glob("*.txt")
     try:
@@ -112,7 +564,15 @@ def clean_files():
         print("Error while deleting files.")
 
 
-if __name__ == "__main__":
+"""
+This function creates the command line parser of topogen.
+"""
+
+
+def make_parser():
+    import artifact_cache
+    import traffic_pattern
+    import workload
 
     current_time = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
     topo_file = f"topology_{current_time}.txt"
@@ -126,30 +586,72 @@ if __name__ == "__main__":
         "--topology",
         type=str,
         default="spine_leaf",
-        choices=["spine_leaf", "fat_tree", "bcube"],
-        help="Topology to generate.",
+        help="Topology to generate: spine_leaf, fat_tree, bcube or a registered builder.",
+    )
+    parser.add_argument(
+        "--builder_param",
+        action="append",
+        default=[],
+        help="Extra NAME=VALUE constructor parameter of the builder, e.g. for a plugin builder.",
     )
     parser.add_argument(
         "-tf",
         "--topo_file",
         type=str,
         default=topo_file,
-        help="Output file for topology.",
+        help="Output file for topology. Use a .gz, .xz or .bz2 extension to compress it.",
     )
     parser.add_argument(
         "-ff",
         "--flow_file",
         type=str,
         default=flow_file,
-        help="Output file for flow.",
+        help="Output file for flow. Use a .gz, .xz or .bz2 extension to compress it.",
     )
 
+    parser.add_argument(
+        "-rf",
+        "--routing_file",
+        type=str,
+        default=None,
+        help="Also write the ECMP next-hop tables of every switch to this file.",
+    )
+    parser.add_argument(
+        "-ft",
+        "--from_topology",
+        type=str,
+        default=None,
+        help="Only generate flows, for the hosts of this existing text or binary topology file.",
+    )
     parser.add_argument(
         "-c",
         "--clean",
         action="store_true",
         help="Clean up output files before generating.",
     )
+    parser.add_argument(
+        "--dry_run",
+        "--dry-run",
+        action="store_true",
+        help="Only print the node, link and flow counts and the output file sizes.",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check the degrees, links and reachability of the generated topology.",
+    )
+    parser.add_argument(
+        "--link_load",
+        action="store_true",
+        help="Print the max and mean ECMP load of every link level for the generated flows.",
+    )
+    parser.add_argument(
+        "--load_window",
+        type=float,
+        default=None,
+        help="Time window of the flows in seconds for --link_load utilizations. "
+        "Defaults to the span of their start times.",
+    )
     parser.add_argument(
         "--spine",
         type=int,
@@ -180,25 +682,250 @@ if __name__ == "__main__":
         default=BCUBE_N,
         help="BCube parameter n.",
     )
+    parser.add_argument(
+        "-p",
+        "--pattern",
+        type=str,
+        default="all_to_all",
+        choices=list(traffic_pattern.PATTERNS),
+        help="Traffic pattern of the generated flows.",
+    )
+    parser.add_argument(
+        "--flows_per_host",
+        type=int,
+        default=1,
+        help="Flows sent by every host for the random_k and hotspot patterns.",
+    )
+    parser.add_argument(
+        "--fan_in",
+        type=int,
+        default=None,
+        help="Senders per receiver for the incast and outcast patterns. Defaults to all other hosts.",
+    )
+    parser.add_argument(
+        "--receivers",
+        type=int,
+        default=1,
+        help="Number of receivers for the incast and outcast patterns.",
+    )
+    parser.add_argument(
+        "--hot_fraction",
+        type=float,
+        default=0.1,
+        help="Fraction of hosts that are hot spots for the hotspot pattern.",
+    )
+    parser.add_argument(
+        "--hot_share",
+        type=float,
+        default=0.8,
+        help="Share of the flows sent to the hot spots for the hotspot pattern.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed of the random traffic patterns and flow attributes.",
+    )
+    parser.add_argument(
+        "--link_attribute",
+        action="append",
+        default=[],
+        help="Link attribute of a level or a role as LEVEL:ATTRIBUTE=VALUE, e.g. core-aggregation:bandwidth=400Gbps or switch-host:delay=0.002ms. Can be repeated.",
+    )
+    parser.add_argument(
+        "--oversubscription",
+        action="append",
+        default=[],
+        help="Downlink to uplink capacity ratio of a level as LEVEL=RATIO, e.g. edge=3. Sets the uplink bandwidth. Can be repeated.",
+    )
+    parser.add_argument(
+        "--arrivals",
+        type=str,
+        default="constant",
+        choices=["constant", "poisson"],
+        help="Start every flow at the same time, or give every host Poisson arrivals with workload flow sizes, written in start time order.",
+    )
+    parser.add_argument(
+        "--workload",
+        type=str,
+        default="web_search",
+        choices=list(workload.WORKLOADS),
+        help="Flow size distribution of the Poisson arrivals.",
+    )
+    parser.add_argument(
+        "--load",
+        type=float,
+        default=0.3,
+        help="Load of every host link by the Poisson arrivals, between 0 and 1.",
+    )
+    parser.add_argument(
+        "--host_bandwidth",
+        type=str,
+        default=CONSTRUCT_KWARGS["bandwidth"],
+        help="Host link bandwidth the Poisson arrival rate is computed for.",
+    )
+    parser.add_argument(
+        "--spill_dir",
+        type=str,
+        default=None,
+        help="Directory of the temporary run files of the Poisson arrivals. Defaults to the directory of the flow file.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes generating the flows.",
+    )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Generate the topology and the flows at the same time in separate processes.",
+    )
+    parser.add_argument(
+        "--flow_shards",
+        type=int,
+        default=1,
+        help="Split the flows into this many shard files, with a manifest of their counts, offsets and time bounds.",
+    )
+    parser.add_argument(
+        "--shard_by",
+        type=str,
+        default="source",
+        choices=["source", "time"],
+        help="Shard the flows by ranges of source hosts, or by windows of start time.",
+    )
+    parser.add_argument(
+        "--shard_window",
+        type=float,
+        default=None,
+        help="Start time window of every shard in seconds, with --shard_by time. Later flows go to the last shard.",
+    )
+    parser.add_argument(
+        "--single_flow_file",
+        action="store_true",
+        help="Write the flow shards one after the other into the flow file instead of one file per shard.",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="text",
+        help="Write text files, fixed-width binary records readable with binary_format.load_binary, or a registered format.",
+    )
+    parser.add_argument(
+        "--buffer_size",
+        type=int,
+        default=OUTPUT_BUFFER_SIZE,
+        help="Number of characters buffered before writing to the output files.",
+    )
+    parser.add_argument(
+        "--no_cache",
+        "--no-cache",
+        action="store_true",
+        help="Always regenerate instead of reusing cached files.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=artifact_cache.DEFAULT_CACHE_DIR,
+        help="Directory of the generated file cache.",
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=int,
+        default=artifact_cache.DEFAULT_CACHE_SIZE >> 20,
+        help="Maximum size of the cache in MiB, least recently used entries are evicted first.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print wall time, CPU time, call counts and memory peak per phase.",
+    )
+    parser.add_argument(
+        "--profile_output",
+        type=str,
+        default=None,
+        help="With --profile, also dump cProfile stats to this file.",
+    )
+    parser.add_argument(
+        "--log",
+        type=str,
+        default=logger.EDGE,
+        choices=logger.LOG_MODES,
+        help="Log one line per link/flow call, a count summary per phase, or nothing.",
+    )
 
-    args = parser.parse_args()
+    return parser
 
-    if args.clean:
-        clean_files()
+
+"""
+This function parses the command line and checks that the topology and the format are registered.
+"""
+
+
+def parse_args(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+
+    if args.shard_by == "time" and args.shard_window is None:
+        parser.error("--shard_by time needs --shard_window")
+    if args.link_load and args.flow_shards > 1 and not args.single_flow_file:
+        parser.error("--link_load needs a single flow file, see --single_flow_file")
+
+    for kind, name in (
+        (registry.BUILDER, args.topology),
+        (registry.LINK, args.format),
+        (registry.FLOW, args.format),
+        (registry.OUTPUT, args.format),
+    ):
+        if not registry.has(kind, name):
+            parser.error(
+                f"unknown {kind} {name}, expected one of {', '.join(registry.names(kind))}"
+            )
+
+    names = builder_param_names(registry.load(registry.BUILDER, args.topology))
+    for item in args.builder_param:
+        try:
+            name, _ = parse_builder_param(item)
+        except ValueError as error:
+            parser.error(str(error))
+        if name not in names:
+            parser.error(
+                f"unknown --builder_param {name} of {args.topology}, expected one of {', '.join(sorted(names))}"
+            )
+
+    if args.flow_shards > 1:
+        flow_output_cls = registry.load(registry.OUTPUT, args.format)
+        if flow_output_cls is output_strategy.FileOutputStrategy:
+            flow_output_cls = output_strategy.output_class(args.flow_file)
+        if issubclass(flow_output_cls, output_strategy.CompressedOutputStrategy):
+            parser.error("sharded flow files cannot be compressed")
+
+    # the link attributes are resolved against the builder spec before any file is opened
+    if args.link_attribute or args.oversubscription:
+        try:
+            offline_builder(args).plan().level_attributes(**CONSTRUCT_KWARGS)
+        except ValueError as error:
+            parser.error(str(error))
+
+    return args
+
+
+if __name__ == "__main__":
+
+    if sys.argv[1:2] == ["sweep"]:
+        import sweep
+
+        sweep.main(sys.argv[2:])
         exit()
 
-    print(f"Generating {args.topology} topology...")
+    if sys.argv[1:2] == ["serve"]:
+        import server
 
-    topo_file = output_strategy.FileOutputStrategy(args.topo_file)
-    flow_file = output_strategy.FileOutputStrategy(args.flow_file)
-    flow = flow_strategy.DefaultFlowStrategy(flow_file)
-    link = link_strategy.DefaultLinkStrategy(topo_file)
-
-    if args.topology == "spine_leaf":
-        generate_spine_leaf(link, flow, args.spine, args.leaf, args.host)
-    elif args.topology == "fat_tree":
-        generate_fat_tree(link, flow, args.k, args.host)
-    elif args.topology == "bcube":
-        generate_bcube(link, flow, args.n)
-    else:
-        print("Invalid topology.")
+        server.main(sys.argv[2:])
+        exit()
+
+    args = parse_args()
+
+    logger.set_log_mode(args.log)
+
+    run(args)
@@ -0,0 +1,181 @@
+import numpy as np
+from link_strategy import LinkStrategy
+from formatter import is_scalar
+
+"""
+Topology is the in-memory form of a generated fabric.
+It is built by NetworkBuilder.build_topology and is fully array-backed:
+
+- levels: the node levels in ID order, e.g. core, aggregation, edge and host for a Fat-Tree,
+  with node_level holding the level of every node and level_offsets the first node ID of every level.
+  Topologies loaded from a file only know the switch and host roles and have no level_offsets.
+- src, dst: the links in the order the connector chain generated them.
+- link_groups: one (start, stop, attributes) entry per link_many call of the chain,
+  so the link attributes are stored once per connector level instead of per link.
+- indptr, indices, edge_ids: the CSR adjacency of the undirected graph.
+  The neighbors of node u are indices[indptr[u]:indptr[u + 1]],
+  and edge_ids holds the link index of every adjacency entry.
+
+The export method writes the topology with any LinkStrategy,
+so a fabric can be generated once and exported many times.
+"""
+
+HOST = "host"
+SWITCH = "switch"
+
+
+class Topology:
+    def __init__(
+        self, level_names, node_level, src, dst, link_groups, level_offsets=None
+    ):
+        self.level_names = level_names
+        self.node_level = np.asarray(node_level, dtype=np.int32)
+        self.level_offsets = level_offsets
+        self.num_nodes = len(self.node_level)
+
+        self.src = np.asarray(src, dtype=np.int64)
+        self.dst = np.asarray(dst, dtype=np.int64)
+        self.link_groups = link_groups
+
+        host_levels = [i for i, name in enumerate(self.level_names) if name == HOST]
+        is_host = np.isin(self.node_level, host_levels)
+        self.switches = np.flatnonzero(~is_host)
+        self.hosts = np.flatnonzero(is_host)
+
+        self.build_adjacency()
+
+    """
+    This method creates a topology from (name, node count) levels in node ID order, as the builders describe them.
+    """
+
+    @classmethod
+    def from_levels(cls, levels, src, dst, link_groups):
+        level_offsets = np.concatenate(
+            ([0], np.cumsum([count for _, count in levels]))
+        ).astype(np.int64)
+        node_level = np.repeat(
+            np.arange(len(levels), dtype=np.int32), np.diff(level_offsets)
+        )
+
+        return cls(
+            [name for name, _ in levels],
+            node_level,
+            src,
+            dst,
+            link_groups,
+            level_offsets,
+        )
+
+    """
+    This method creates a topology that only knows which nodes are switches, e.g. one loaded from a file.
+    """
+
+    @classmethod
+    def from_roles(cls, num_nodes, switches, src, dst, link_groups):
+        node_level = np.ones(num_nodes, dtype=np.int32)
+        node_level[switches] = 0
+
+        return cls([SWITCH, HOST], node_level, src, dst, link_groups)
+
+    @property
+    def num_links(self):
+        return len(self.src)
+
+    def build_adjacency(self):
+        ends = np.concatenate((self.src, self.dst))
+        neighbors = np.concatenate((self.dst, self.src))
+        edge_ids = np.tile(np.arange(self.num_links, dtype=np.int64), 2)
+
+        order = np.argsort(ends, kind="stable")
+        self.indices = neighbors[order]
+        self.edge_ids = edge_ids[order]
+        self.indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ends, minlength=self.num_nodes), out=self.indptr[1:])
+
+    def degree(self, node=None):
+        degrees = np.diff(self.indptr)
+        if node is None:
+            return degrees
+        return int(degrees[node])
+
+    def neighbors(self, node):
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def level_of(self, node):
+        return self.level_names[self.node_level[node]]
+
+    def level_nodes(self, name):
+        return np.flatnonzero(self.node_level == self.level_names.index(name))
+
+    """
+    This method returns the per-link values of a link attribute, e.g. "bandwidth".
+    """
+
+    def attribute(self, name, default=None):
+        columns = []
+        for start, stop, attributes in self.link_groups:
+            value = attributes.get(name, default)
+            if is_scalar(value) or value is None:
+                columns.append(np.full(stop - start, value, dtype=object))
+            else:
+                columns.append(np.asarray(value, dtype=object))
+
+        if not columns:
+            return np.empty(0, dtype=object)
+        return np.concatenate(columns)
+
+    """
+    This method writes the topology like the builders do:
+    the node counts, the switch list and then the links level by level.
+    """
+
+    def export(self, link_strategy):
+        output = link_strategy.get_output()
+        output.write(f"{self.num_nodes} {len(self.switches)} {len(self.hosts)}\n")
+        output.write("".join(f"{switch} " for switch in self.switches.tolist()))
+        output.write("\n")
+
+        self.export_links(link_strategy)
+
+    def export_links(self, link_strategy):
+        for start, stop, attributes in self.link_groups:
+            link_strategy.link_many(
+                self.src[start:stop], self.dst[start:stop], **attributes
+            )
+
+
+"""
+TopologyRecorder is a LinkStrategy that records the links instead of writing them.
+It is used by NetworkBuilder.build_topology to run the connector chain into a Topology.
+"""
+
+
+class TopologyRecorder(LinkStrategy):
+    def __init__(self):
+        super().__init__(None)
+        self.src = []
+        self.dst = []
+        self.link_groups = []
+        self.count = 0
+
+    def link(self, src, dst, **kwargs):
+        self.link_many([src], [dst], **kwargs)
+
+    def link_many(self, src, dst, **kwargs):
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+
+        self.src.append(src)
+        self.dst.append(dst)
+        self.link_groups.append((self.count, self.count + len(src), kwargs))
+        self.count += len(src)
+
+    def topology(self, levels):
+        empty = [np.empty(0, dtype=np.int64)]
+
+        return Topology.from_levels(
+            levels,
+            np.concatenate(self.src or empty),
+            np.concatenate(self.dst or empty),
+            self.link_groups,
+        )
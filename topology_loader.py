@@ -0,0 +1,162 @@
+import mmap
+import numpy as np
+import binary_format
+import output_strategy
+from topology import Topology
+
+"""
+This module loads an existing topology file into a Topology,
+so flows can be generated for a fabric without rebuilding it.
+
+Text files are the ones written by build_nodes, build_switches and DefaultLinkStrategy:
+a "nodes switches hosts" line, a line of switch IDs, and one "src dst bandwidth delay error_rate" line per link.
+The file is memory-mapped and the src and dst columns are parsed with vectorized byte arithmetic,
+without splitting it into Python strings.
+Text files ending with .gz, .xz or .bz2 are decompressed into memory first and parsed the same way.
+With attributes=True, the bandwidth, delay and error rate columns are parsed too, which is slower.
+
+Binary files written by BinaryLinkStrategy are detected by their header and loaded with load_binary.
+"""
+
+CHUNK_LINES = 1 << 20
+SPACE = ord(" ")
+NEWLINE = ord("\n")
+ZERO = ord("0")
+
+
+def is_binary(file_name):
+    with open(file_name, "rb") as file:
+        magic = file.read(binary_format.HEADER_DTYPE["magic"].itemsize)
+    return magic.rstrip(b"\0") in binary_format.RECORD_TYPES
+
+
+"""
+This function parses the unsigned integers buf[starts[i]:ends[i]].
+"""
+
+
+def parse_ints(buf, starts, ends):
+    lengths = ends - starts
+    if len(lengths) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    offsets = np.arange(int(lengths.max()))
+    valid = offsets < lengths[:, None]
+    digits = buf[np.where(valid, starts[:, None] + offsets, 0)].astype(np.int64) - ZERO
+
+    if np.any(valid & ((digits < 0) | (digits > 9))) or np.any(lengths == 0):
+        raise ValueError("Malformed topology file: expected integer node IDs.")
+
+    powers = np.where(valid, lengths[:, None] - 1 - offsets, 0)
+    return np.where(valid, digits * 10**powers, 0).sum(axis=1)
+
+
+def parse_header(data):
+    first = data.find(b"\n")
+    second = data.find(b"\n", first + 1)
+    if first < 0 or second < 0:
+        raise ValueError("Malformed topology file: missing header lines.")
+
+    counts = data[:first].split()
+    if len(counts) != 3:
+        raise ValueError("Malformed topology file: expected 'nodes switches hosts'.")
+
+    num_nodes, num_switches, num_hosts = (int(count) for count in counts)
+    switches = np.array(
+        [int(switch) for switch in data[first + 1 : second].split()], dtype=np.int64
+    )
+    if len(switches) != num_switches:
+        raise ValueError("Malformed topology file: switch count does not match.")
+
+    return num_nodes, switches, second + 1
+
+
+def next_space(spaces, positions):
+    index = np.searchsorted(spaces, positions)
+    if np.any(index >= len(spaces)):
+        raise ValueError("Malformed topology file: expected 'src dst ...' link lines.")
+    return spaces[index]
+
+
+def parse_links(buf, begin):
+    newlines = np.flatnonzero(buf[begin:] == NEWLINE) + begin
+    starts = np.concatenate(([begin], newlines + 1))
+    ends = np.concatenate((newlines, [len(buf)]))
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+
+    spaces = np.flatnonzero(buf[begin:] == SPACE) + begin
+
+    src = []
+    dst = []
+    for first in range(0, len(starts), CHUNK_LINES):
+        line_starts = starts[first : first + CHUNK_LINES]
+        first_space = next_space(spaces, line_starts)
+        second_space = next_space(spaces, first_space + 1)
+
+        src.append(parse_ints(buf, line_starts, first_space))
+        dst.append(parse_ints(buf, first_space + 1, second_space))
+
+    empty = [np.empty(0, dtype=np.int64)]
+    return np.concatenate(src or empty), np.concatenate(dst or empty)
+
+
+def parse_attributes(data):
+    columns = np.array(data.split(), dtype=object).reshape(-1, 5)
+    return {
+        "bandwidth": columns[:, 2].astype(str),
+        "delay": columns[:, 3].astype(str),
+        "error_rate": columns[:, 4].astype(str),
+    }
+
+
+def parse_text(data, attributes=False):
+    num_nodes, switches, begin = parse_header(data)
+    buf = np.frombuffer(data, dtype=np.uint8)
+
+    try:
+        src, dst = parse_links(buf, begin)
+        columns = parse_attributes(data[begin:]) if attributes else {}
+    finally:
+        # release the buffer before a memory map under it is closed
+        del buf
+
+    return Topology.from_roles(num_nodes, switches, src, dst, [(0, len(src), columns)])
+
+
+def load_text(file_name, attributes=False):
+    # compressed files cannot be memory-mapped and are decompressed into memory
+    if output_strategy.is_compressed(file_name):
+        with output_strategy.open_input(file_name) as file:
+            return parse_text(file.read(), attributes)
+
+    with open(file_name, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parse_text(data, attributes)
+
+
+def load_binary(file_name, attributes=False):
+    data = binary_format.load_binary(file_name)
+    num_nodes, switches, _ = parse_header(data.metadata.encode())
+
+    columns = {}
+    if attributes:
+        columns = {
+            "bandwidth": np.asarray(data["bandwidth"]),
+            "delay": np.asarray(data["delay"]),
+            "error_rate": np.asarray(data["error_rate"]),
+        }
+
+    return Topology.from_roles(
+        num_nodes,
+        switches,
+        data["src"],
+        data["dst"],
+        [(0, len(data), columns)],
+    )
+
+
+def load_topology(file_name, attributes=False):
+    if is_binary(file_name):
+        return load_binary(file_name, attributes)
+    return load_text(file_name, attributes)
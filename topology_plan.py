@@ -0,0 +1,237 @@
+from output_strategy import SOURCE, shard_file_name
+from topology import HOST
+
+"""
+TopologyPlan is the compiled form of a builder spec: its levels, the connector chain
+and the traffic pattern, as returned by NetworkBuilder.plan.
+
+Every connector describes its level in closed form (LevelConnector.endpoints),
+so the node, link and flow counts and the output file sizes are computed in O(levels)
+without generating a single link or flow.
+File sizes are exact for the link file and for flow patterns where every host sends and receives
+the same number of flows, e.g. all-to-all and permutation, and expected values for the other patterns.
+Compressed outputs are sized before compression.
+"""
+
+
+"""
+This function returns the total number of decimal digits of the integers in [first, stop).
+"""
+
+
+def digit_count(first, stop):
+    total = 0
+    if first == 0 and stop > 0:
+        total += 1
+        first = 1
+
+    digits = 1
+    low = 1
+    while low < stop:
+        high = low * 10
+        overlap = min(stop, high) - max(first, low)
+        if overlap > 0:
+            total += overlap * digits
+        low = high
+        digits += 1
+
+    return total
+
+
+"""
+This function returns the total number of digits of a list of (first, stop, links) node ranges,
+where every node appears links times.
+"""
+
+
+def range_digits(ranges):
+    return sum(links * digit_count(first, stop) for first, stop, links in ranges)
+
+
+class LevelPlan:
+    def __init__(self, higher, lower, connector):
+        self.higher = higher
+        self.lower = lower
+        self.connector = connector
+        self.links = connector.link_count()
+
+        src, dst = connector.endpoints()
+        self.id_digits = range_digits(src) + range_digits(dst)
+
+
+class TopologyPlan:
+    def __init__(self, levels, chain, flow_hosts, pattern, link_attributes=None):
+        self.levels = levels
+        self.link_attributes = link_attributes
+        self.num_nodes = sum(count for _, count in levels)
+        self.num_hosts = sum(count for name, count in levels if name == HOST)
+        self.num_switches = self.num_nodes - self.num_hosts
+
+        self.level_offsets = []
+        first = 0
+        for _, count in levels:
+            self.level_offsets.append(first)
+            first += count
+
+        # the same connectors as the chain, only asked for their endpoints
+        self.level_plans = []
+        for i, (cls, group) in enumerate(chain):
+            connector = cls(
+                None, levels[i][1], levels[i + 1][1], self.level_offsets[i], group
+            )
+            self.level_plans.append(
+                LevelPlan(levels[i][0], levels[i + 1][0], connector)
+            )
+
+        self.num_links = sum(level.links for level in self.level_plans)
+
+        self.flow_hosts = flow_hosts
+        self.num_flows = pattern.flow_count(flow_hosts[1] - flow_hosts[0])
+
+    """
+    This method returns the link attributes of every connector level, in chain order.
+    """
+
+    def level_attributes(self, **kwargs):
+        if self.link_attributes is None:
+            return [kwargs] * len(self.level_plans)
+        return self.link_attributes.resolve(self.level_plans, **kwargs)
+
+    """
+    This method returns the size of the node count line and the switch list.
+    """
+
+    def header_size(self):
+        size = len(f"{self.num_nodes} {self.num_switches} {self.num_hosts}\n")
+
+        for (name, count), first in zip(self.levels, self.level_offsets):
+            if name != HOST:
+                # every switch is followed by a space
+                size += digit_count(first, first + count) + count
+        return size + 1
+
+    """
+    The size methods return None for strategies that cannot estimate their output size,
+    e.g. registered plugin formats without a rows_size method.
+    """
+
+    def topology_size(self, link_strategy, **kwargs):
+        try:
+            rows = sum(
+                link_strategy.rows_size(level.links, level.id_digits, **attributes)
+                for level, attributes in zip(
+                    self.level_plans, self.level_attributes(**kwargs)
+                )
+            )
+        except NotImplementedError:
+            return None
+        return link_strategy.file_size(self.header_size(), rows)
+
+    def flow_size(self, flow_strategy, **kwargs):
+        first, stop = self.flow_hosts
+        hosts = stop - first
+        # every flow has a src and a dst host, with the mean host digits each
+        id_digits = (
+            round(2 * self.num_flows * digit_count(first, stop) / hosts) if hosts else 0
+        )
+
+        try:
+            rows = flow_strategy.rows_size(self.num_flows, id_digits, **kwargs)
+        except NotImplementedError:
+            return None
+        return flow_strategy.file_size(len(f"{self.num_flows}\n"), rows)
+
+    """
+    This method returns the flow count, rows size and file size of every flow shard, by source host range.
+    Every shard gets the flows of its hosts, with their mean ID digits.
+    The sizes are None if the flow strategy cannot estimate them.
+    """
+
+    def shard_sizes(self, flow_strategy, bounds, **kwargs):
+        first, stop = self.flow_hosts
+        hosts = stop - first
+        mean_digits = digit_count(first, stop) / hosts if hosts else 0
+
+        sizes = []
+        for low, high in zip(bounds[:-1], bounds[1:]):
+            flows = round(self.num_flows * (high - low) / hosts) if hosts else 0
+            src_digits = digit_count(low, high) / (high - low) if high > low else 0
+            id_digits = round(flows * (src_digits + mean_digits))
+
+            try:
+                rows = flow_strategy.rows_size(flows, id_digits, **kwargs)
+            except NotImplementedError:
+                sizes.append((flows, None, None))
+                continue
+            size = flow_strategy.file_size(len(f"{flows}\n"), rows)
+            sizes.append((flows, rows, size))
+
+        return sizes
+
+    """
+    This method returns the shard files of a sharded flow file as a printable report.
+    The flows of time windows depend on the arrivals, so only source shards are sized,
+    by their rows if they are written into one flow file.
+    """
+
+    def shard_report(
+        self, flow_strategy, file_name, bounds, key, single_file=False, **kwargs
+    ):
+        shards = len(bounds) - 1
+        lines = [f"Flow shards: {shards} by {key}"]
+        if key == SOURCE:
+            sizes = self.shard_sizes(flow_strategy, bounds, **kwargs)
+        else:
+            sizes = [None] * shards
+
+        for shard in range(shards):
+            name = file_name if single_file else shard_file_name(file_name, shard)
+            # the last time window also holds all later flows
+            stop = bounds[shard + 1] if key == SOURCE or shard < shards - 1 else "..."
+            line = f"  {name:<24}[{bounds[shard]}, {stop})"
+            if sizes[shard] is not None:
+                flows, rows, size = sizes[shard]
+                size = rows if single_file else size
+                line += f"  {flows} flows  {format_bytes(size)}"
+            lines.append(line)
+
+        return "\n".join(lines)
+
+    """
+    This method returns the counts and sizes of the run as a printable report.
+    """
+
+    def report(self, link_strategy, flow_strategy, **kwargs):
+        lines = [
+            f"Nodes: {self.num_nodes}, Switches: {self.num_switches}, Hosts: {self.num_hosts}"
+        ]
+        for name, count in self.levels:
+            lines.append(f"  {name:<24}{count:>16} nodes")
+
+        lines.append(f"Links: {self.num_links}")
+        attributes = self.level_attributes(**kwargs)
+        for level, level_attributes in zip(self.level_plans, attributes):
+            lines.append(
+                f"  {level.higher + ' - ' + level.lower:<24}{level.links:>16} links"
+                f"  {level_attributes.get('bandwidth', '')}"
+            )
+
+        lines.append(f"Flows: {self.num_flows}")
+        topology_size = self.topology_size(link_strategy, **kwargs)
+        flow_size = self.flow_size(flow_strategy, **kwargs)
+        lines.append(f"Topology file: {format_bytes(topology_size)}")
+        lines.append(f"Flow file: {format_bytes(flow_size)}")
+
+        return "\n".join(lines)
+
+
+def format_bytes(size):
+    if size is None:
+        return "unknown"
+
+    value = float(size)
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if value < 1024 or unit == "TiB":
+            break
+        value /= 1024
+    return f"{size} bytes ({value:.1f} {unit})"
@@ -0,0 +1,246 @@
+from abc import ABC, abstractmethod
+import numpy as np
+
+"""
+TrafficPattern is the abstraction for choosing which hosts talk to each other.
+The builders take a pattern as a parameter and hand it the host IDs,
+and the pattern hands the (src, dst) arrays to a FlowStrategy, which formats them.
+So every pattern works with every flow strategy and output format.
+
+Except for all-to-all, each pattern draws its src and dst arrays in one NumPy pass
+from its own seeded RNG, and scales with the number of flows instead of the square of the hosts.
+"""
+
+BLOCK_FLOWS = 1 << 20
+REDRAW_ROUNDS = 8
+
+
+class TrafficPattern(ABC):
+    def __init__(self, seed=None):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    """
+    This method returns the src and dst host IDs of all flows.
+    """
+
+    @abstractmethod
+    def pairs(self, hosts):
+        pass
+
+    """
+    This method returns the number of flows between count hosts in closed form, without drawing them.
+    """
+
+    @abstractmethod
+    def flow_count(self, count):
+        pass
+
+    """
+    This method writes the flow count and then the flows through the flow strategy.
+    """
+
+    def generate(self, flow_strategy, hosts, workers=1, **kwargs):
+        hosts = np.fromiter(hosts, dtype=np.int64, count=len(hosts))
+        src, dst = self.pairs(hosts)
+
+        flow_strategy.get_output().write(f"{len(src)}\n")
+
+        for first in range(0, len(src), BLOCK_FLOWS):
+            flow_strategy.flow_many(
+                src[first : first + BLOCK_FLOWS],
+                dst[first : first + BLOCK_FLOWS],
+                **kwargs,
+            )
+
+        flow_strategy.finish(**kwargs)
+
+
+"""
+AllToAllPattern makes every host send one flow to every other host.
+It is the default pattern of the builders and is generated in shards by flow_shards.
+"""
+
+
+class AllToAllPattern(TrafficPattern):
+    def pairs(self, hosts):
+        src = np.repeat(hosts, len(hosts))
+        dst = np.tile(hosts, len(hosts))
+        keep = src != dst
+        return src[keep], dst[keep]
+
+    def flow_count(self, count):
+        return count * (count - 1)
+
+    def generate(self, flow_strategy, hosts, workers=1, **kwargs):
+        from flow_shards import generate_all_to_all
+
+        flow_strategy.get_output().write(f"{len(hosts) * (len(hosts) - 1)}\n")
+
+        generate_all_to_all(flow_strategy, hosts, workers, **kwargs)
+        flow_strategy.finish(**kwargs)
+
+
+"""
+PermutationPattern makes every host send one flow and receive one flow.
+The hosts are visited in a random cycle, so no host sends to itself.
+"""
+
+
+class PermutationPattern(TrafficPattern):
+    def pairs(self, hosts):
+        if len(hosts) < 2:
+            return hosts[:0], hosts[:0]
+
+        order = self.rng.permutation(len(hosts))
+        target = np.empty(len(hosts), dtype=np.int64)
+        target[order] = np.roll(order, -1)
+
+        return hosts.copy(), hosts[target]
+
+    def flow_count(self, count):
+        return count if count >= 2 else 0
+
+
+"""
+IncastPattern picks receivers random hosts,
+and makes fan_in random other hosts send a flow to each of them (N -> 1).
+By default, all other hosts send to the receivers.
+"""
+
+
+class IncastPattern(TrafficPattern):
+    def __init__(self, fan_in=None, receivers=1, seed=None):
+        super().__init__(seed)
+        self.fan_in = fan_in
+        self.receivers = receivers
+
+    def pairs(self, hosts):
+        count = len(hosts)
+        receivers = min(self.receivers, count)
+        fan_in = count - 1 if self.fan_in is None else min(self.fan_in, count - 1)
+
+        chosen = self.rng.choice(count, receivers, replace=False)
+
+        # rank the other hosts by a random key, the receiver itself always comes last
+        keys = self.rng.random((receivers, count))
+        keys[np.arange(receivers), chosen] = np.inf
+        senders = np.argsort(keys, axis=1)[:, :fan_in]
+
+        src = hosts[senders].ravel()
+        dst = np.repeat(hosts[chosen], fan_in)
+        return src, dst
+
+    def flow_count(self, count):
+        receivers = min(self.receivers, count)
+        fan_in = count - 1 if self.fan_in is None else min(self.fan_in, count - 1)
+        return max(receivers * fan_in, 0)
+
+
+"""
+OutcastPattern is the reverse of IncastPattern (1 -> N).
+"""
+
+
+class OutcastPattern(IncastPattern):
+    def pairs(self, hosts):
+        src, dst = super().pairs(hosts)
+        return dst, src
+
+
+"""
+RandomKPattern makes every host send flows to k distinct random other hosts.
+"""
+
+
+class RandomKPattern(TrafficPattern):
+    def __init__(self, k=1, seed=None):
+        super().__init__(seed)
+        self.k = k
+
+    def pairs(self, hosts):
+        count = len(hosts)
+        k = min(self.k, count - 1)
+        if k <= 0:
+            return hosts[:0], hosts[:0]
+
+        offsets = self.offsets(count, k)
+        src = np.repeat(hosts, k)
+        dst = hosts[(np.arange(count)[:, None] + offsets) % count].ravel()
+        return src, dst
+
+    def flow_count(self, count):
+        return count * max(min(self.k, count - 1), 0)
+
+    """
+    This method returns k distinct offsets in [1, count) per host.
+    Sparse draws are repaired by redrawing the duplicates,
+    dense draws take the first k of a random ranking.
+    """
+
+    def offsets(self, count, k):
+        if 2 * k > count:
+            keys = self.rng.random((count, count - 1))
+            return np.argsort(keys, axis=1)[:, :k] + 1
+
+        offsets = self.rng.integers(1, count, (count, k))
+        while True:
+            offsets.sort(axis=1)
+            duplicated = np.zeros(offsets.shape, dtype=bool)
+            duplicated[:, 1:] = offsets[:, 1:] == offsets[:, :-1]
+            if not duplicated.any():
+                return self.rng.permuted(offsets, axis=1)
+            offsets[duplicated] = self.rng.integers(1, count, duplicated.sum())
+
+
+"""
+HotspotPattern makes every host send flows_per_host flows to skewed destinations.
+A random hot_fraction of the hosts receives hot_share of the flows.
+"""
+
+
+class HotspotPattern(TrafficPattern):
+    def __init__(self, flows_per_host=1, hot_fraction=0.1, hot_share=0.8, seed=None):
+        super().__init__(seed)
+        self.flows_per_host = flows_per_host
+        self.hot_fraction = hot_fraction
+        self.hot_share = hot_share
+
+    def pairs(self, hosts):
+        count = len(hosts)
+        if count < 2:
+            return hosts[:0], hosts[:0]
+
+        hot = max(1, int(count * self.hot_fraction))
+        weights = np.full(count, (1 - self.hot_share) / max(count - hot, 1))
+        weights[self.rng.choice(count, hot, replace=False)] = self.hot_share / hot
+        weights /= weights.sum()
+
+        src = np.repeat(np.arange(count), self.flows_per_host)
+        dst = self.rng.choice(count, len(src), p=weights)
+
+        # redraw the flows that picked their own source,
+        # and send the few left after some rounds to a uniform other host
+        for _ in range(REDRAW_ROUNDS):
+            own = np.flatnonzero(src == dst)
+            if len(own) == 0:
+                break
+            dst[own] = self.rng.choice(count, len(own), p=weights)
+
+        own = np.flatnonzero(src == dst)
+        dst[own] = (src[own] + self.rng.integers(1, count, len(own))) % count
+
+        return hosts[src], hosts[dst]
+
+    def flow_count(self, count):
+        return count * self.flows_per_host if count >= 2 else 0
+
+
+PATTERNS = {
+    "all_to_all": AllToAllPattern,
+    "permutation": PermutationPattern,
+    "incast": IncastPattern,
+    "outcast": OutcastPattern,
+    "random_k": RandomKPattern,
+    "hotspot": HotspotPattern,
+}
@@ -0,0 +1,149 @@
+import numpy as np
+from topology import HOST
+from routing import bfs_distances
+
+"""
+This module checks that a Topology is wired the way its builder describes it,
+so a wrong group division in a connector is found before a simulation runs on it.
+
+Every check is a vectorized pass over the links or the CSR adjacency:
+
+- self links and duplicate links,
+- the degree of every node towards every level, against the closed-form NetworkBuilder.degrees,
+- connectivity, with a BFS from the first host,
+- host reachability, the number of hosts at every hop distance from the first host,
+  against the closed-form NetworkBuilder.host_distances.
+  A host wired to the wrong pod or group keeps its degree but changes these counts.
+
+Without a builder, e.g. for a topology file of unknown origin, only the self link, duplicate link
+and connectivity checks are run. A loaded topology only knows which nodes are switches,
+so its levels are taken from the builder after checking that the switch IDs match.
+
+verify returns the list of problems found, empty if the topology is right.
+"""
+
+
+"""
+This function returns the level names and the level of every node of the builder,
+or None if the switches of the topology are not the switches of the builder.
+"""
+
+
+def node_levels(topology, builder):
+    levels = builder.levels()
+    counts = [count for _, count in levels]
+    node_level = np.repeat(np.arange(len(levels), dtype=np.int32), counts)
+    if len(node_level) != topology.num_nodes:
+        return None
+
+    names = [name for name, _ in levels]
+    host_levels = [i for i, name in enumerate(names) if name == HOST]
+    switches = np.flatnonzero(~np.isin(node_level, host_levels))
+    if not np.array_equal(switches, topology.switches):
+        return None
+
+    return names, node_level
+
+
+def check_links(topology):
+    problems = []
+
+    loops = np.flatnonzero(topology.src == topology.dst)
+    if len(loops):
+        problems.append(
+            f"{len(loops)} self links, e.g. link {loops[0]} on node {topology.src[loops[0]]}."
+        )
+
+    low = np.minimum(topology.src, topology.dst)
+    high = np.maximum(topology.src, topology.dst)
+    keys = np.sort(low * topology.num_nodes + high)
+    duplicates = keys[1:][keys[1:] == keys[:-1]]
+    if len(duplicates):
+        first = int(duplicates[0])
+        problems.append(
+            f"{len(duplicates)} duplicate links, e.g. {first // topology.num_nodes} - {first % topology.num_nodes}."
+        )
+
+    return problems
+
+
+def check_degrees(topology, names, node_level, degrees):
+    unknown = sorted({name for pair in degrees for name in pair} - set(names))
+    if unknown:
+        raise ValueError(f"Unknown level {', '.join(unknown)} in the expected degrees.")
+
+    expected = np.zeros((len(names), len(names)), dtype=np.int64)
+    for (level, other), links in degrees.items():
+        expected[names.index(level), names.index(other)] = links
+
+    # the links of every node towards every level, one row per node
+    ends = np.repeat(np.arange(topology.num_nodes), topology.degree())
+    actual = np.bincount(
+        ends * len(names) + node_level[topology.indices],
+        minlength=topology.num_nodes * len(names),
+    ).reshape(topology.num_nodes, len(names))
+
+    problems = []
+    wrong = actual != expected[node_level]
+    for other in range(len(names)):
+        nodes = np.flatnonzero(wrong[:, other])
+        for level in np.unique(node_level[nodes]).tolist():
+            level_nodes = nodes[node_level[nodes] == level]
+            node = level_nodes[0]
+            problems.append(
+                f"{len(level_nodes)} {names[level]} nodes have a wrong degree towards {names[other]}, "
+                f"e.g. node {node} has {actual[node, other]} links instead of {expected[level, other]}."
+            )
+
+    return problems
+
+
+def check_reachability(topology, host_distances=None):
+    if len(topology.hosts) == 0:
+        return []
+
+    first = int(topology.hosts[0])
+    distances = bfs_distances(topology, [first])[0]
+
+    problems = []
+    unreachable = np.flatnonzero(distances < 0)
+    if len(unreachable):
+        hosts = np.count_nonzero(distances[topology.hosts] < 0)
+        problems.append(
+            f"{len(unreachable)} nodes, {hosts} of them hosts, are unreachable from host {first}, e.g. node {unreachable[0]}."
+        )
+
+    if host_distances is not None:
+        found, counts = np.unique(distances[topology.hosts], return_counts=True)
+        actual = dict(zip(found.tolist(), counts.tolist()))
+        expected = {hops: hosts for hops, hosts in host_distances.items() if hosts}
+        if actual != expected:
+            problems.append(
+                f"Hosts at every hop distance from host {first} are {format_distances(actual)}, "
+                f"expected {format_distances(expected)}."
+            )
+
+    return problems
+
+
+def format_distances(distances):
+    return ", ".join(
+        f"{hosts} at {'no path' if hops < 0 else hops}"
+        for hops, hosts in sorted(distances.items())
+    )
+
+
+def verify(topology, builder=None):
+    problems = check_links(topology)
+
+    if builder is None:
+        return problems + check_reachability(topology)
+
+    levels = node_levels(topology, builder)
+    if levels is None:
+        return problems + [
+            f"The {topology.num_nodes} nodes and {len(topology.switches)} switches differ from the builder spec."
+        ]
+
+    problems += check_degrees(topology, *levels, builder.degrees())
+    return problems + check_reachability(topology, builder.host_distances())
@@ -0,0 +1,74 @@
+import numpy as np
+
+"""
+This module holds empirical flow size distributions of datacenter workloads.
+
+Every distribution is a piecewise linear CDF given as (flow size in bytes, cumulative probability) points,
+and sizes are drawn by inverse transform sampling, one vectorized interpolation for a whole block of flows.
+
+- web_search: the web search workload of the DCTCP paper, mostly short flows with a long tail up to 30MB.
+- data_mining: the data mining workload of the VL2 paper, more than half of the flows below 1KB,
+  and most bytes in a few flows up to 1GB.
+"""
+
+WEB_SEARCH = [
+    (0, 0.0),
+    (10_000, 0.15),
+    (20_000, 0.2),
+    (30_000, 0.3),
+    (50_000, 0.4),
+    (80_000, 0.53),
+    (200_000, 0.6),
+    (1_000_000, 0.7),
+    (2_000_000, 0.8),
+    (5_000_000, 0.9),
+    (10_000_000, 0.97),
+    (30_000_000, 1.0),
+]
+
+DATA_MINING = [
+    (100, 0.0),
+    (180, 0.1),
+    (216, 0.2),
+    (560, 0.3),
+    (900, 0.4),
+    (1_100, 0.5),
+    (1_870, 0.6),
+    (3_160, 0.7),
+    (10_000, 0.8),
+    (400_000, 0.9),
+    (3_160_000, 0.95),
+    (100_000_000, 0.98),
+    (1_000_000_000, 1.0),
+]
+
+WORKLOADS = {
+    "web_search": WEB_SEARCH,
+    "data_mining": DATA_MINING,
+}
+
+
+class FlowSizeDistribution:
+    def __init__(self, cdf):
+        self.sizes = np.array([size for size, _ in cdf], dtype=np.float64)
+        self.probabilities = np.array([p for _, p in cdf], dtype=np.float64)
+
+        if np.any(np.diff(self.probabilities) < 0) or self.probabilities[-1] != 1:
+            raise ValueError("A flow size CDF must be non-decreasing and end at 1.")
+
+    @classmethod
+    def named(cls, name):
+        return cls(WORKLOADS[name])
+
+    """
+    This method returns the mean flow size in bytes, the mean of every linear segment weighted by its probability.
+    """
+
+    def mean(self):
+        weights = np.diff(self.probabilities)
+        centers = (self.sizes[1:] + self.sizes[:-1]) / 2
+        return float(np.sum(weights * centers))
+
+    def sample(self, rng, count):
+        sizes = np.interp(rng.random(count), self.probabilities, self.sizes)
+        return np.maximum(np.rint(sizes), 1).astype(np.int64)